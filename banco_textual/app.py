@@ -1,21 +1,38 @@
-from fastapi import HTTPException
+import os
+from functools import partial
+
 from textual.app import App, ComposeResult
-from textual.widgets import Header, Footer, Button, Label, Input, Static
+from textual.message import Message
+from textual.reactive import reactive
+from textual.widgets import Header, Footer, Button, Label, Input, DataTable, Select
 from textual.screen import Screen
 from textual.containers import Container
+from textual.worker import WorkerState
+
+
+from tsbanking.erros import ErroBancario
+from tsbanking.eventos import filtro_extrato
 
 
-from tsbanking.services import (
-    consultar_saldo, depositar, sacar, transferir,
-    consultar_extrato, aplicar_investimento, resgatar_investimento, saque_caixa
-)
-from tsbanking.models import TipoInvestimento, TipoCaixa
+def carregar_servicos():
+    # Com TSBANKING_URL definida, a interface opera o banco servido pela API;
+    # sem ela, usa o banco em memória deste processo
+    url = os.environ.get("TSBANKING_URL")
+    if url:
+        from banco_textual.remoto import ServicosRemotos
+        return ServicosRemotos(url)
+    from tsbanking import services
+    return services
 
 
 class BancoApp(App):
     CSS_PATH = "style.tcss"
     BINDINGS = [("q", "quit", "Sair")]
 
+    def __init__(self, servicos=None):
+        super().__init__()
+        self.servicos = servicos if servicos is not None else carregar_servicos()
+
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
         yield Footer()
@@ -27,19 +44,110 @@ class BancoApp(App):
             self.push_screen(LoginScreen())
 
 
-class LoginScreen(Screen):
+class TelaServico(Screen):
+    """Tela que chama os serviços em workers (threads), para um backend
+    lento não congelar a interface. O resultado volta na thread da tela."""
+
+    def __init__(self):
+        super().__init__()
+        self._pedidos = {}
+
+    @property
+    def servicos(self):
+        return self.app.servicos
+
+    def chamar(self, ao_concluir, funcao, *args, indicador=None, grupo="servico"):
+        # Um pedido por grupo de cada vez: cliques repetidos são ignorados
+        if grupo is not None and any(
+                g == grupo for _, _, g in self._pedidos.values()):
+            return None
+        if indicador is not None:
+            indicador.loading = True
+        worker = self.run_worker(partial(funcao, *args), thread=True,
+                                 exit_on_error=False)
+        self._pedidos[worker] = (ao_concluir, indicador, grupo)
+        return worker
+
+    def on_worker_state_changed(self, event) -> None:
+        worker = event.worker
+        if worker not in self._pedidos or not worker.is_finished:
+            return
+        ao_concluir, indicador, _ = self._pedidos.pop(worker)
+        if indicador is not None:
+            indicador.loading = False
+        if worker.state == WorkerState.SUCCESS:
+            ao_concluir(worker.result)
+        elif worker.state == WorkerState.ERROR:
+            erro = worker.error
+            if isinstance(erro, ErroBancario):
+                self.notify(f"Erro: {erro.detail}", severity="error")
+            else:
+                self.notify(f"Erro inesperado: {str(erro)}", severity="error")
+
+    def concluida(self, mensagem, resultado) -> None:
+        # Operação confirmada: avisa e volta para a tela anterior
+        self.notify(mensagem, severity="success")
+        self.app.pop_screen()
+
+
+class TelaConta(TelaServico):
+    """Tela de uma conta. Com ``AO_VIVO``, assina a conta enquanto está
+    montada e recebe cada operação confirmada como ``Atualizada``."""
+
+    AO_VIVO = False
+
+    class Atualizada(Message):
+        def __init__(self, mudanca):
+            super().__init__()
+            self.mudanca = mudanca
+
+    def __init__(self, conta: str):
+        super().__init__()
+        self.conta = conta
+        self._cancelar_assinatura = None
+
+    def on_mount(self) -> None:
+        if not self.AO_VIVO:
+            return
+        try:
+            # O callback roda na thread de quem operou; post_message é
+            # seguro entre threads e entrega a mudança na thread da tela
+            self._cancelar_assinatura = self.servicos.assinar_conta(
+                self.conta, lambda mudanca: self.post_message(self.Atualizada(mudanca)))
+        except ErroBancario as e:
+            self.notify(f"Erro: {e.detail}", severity="error")
+
+    def on_unmount(self) -> None:
+        if self._cancelar_assinatura is not None:
+            self._cancelar_assinatura()
+            self._cancelar_assinatura = None
+
+
+class LoginScreen(TelaServico):
     def compose(self) -> ComposeResult:
         yield Label("Login", classes="titulo")
         yield Input(placeholder="Nome da Conta", id="conta")
         yield Button("Entrar", id="entrar")
+        yield Button("Abrir Nova Conta", id="abrir")
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
+        conta = self.query_one("#conta", Input).value.strip()
         if event.button.id == "entrar":
-            conta = self.query_one("#conta", Input).value
-            if conta in ["principal", "destino"]:  # Validação simples
-                self.app.push_screen(MenuScreen(conta))
-            else:
-                self.notify("Conta inválida!", severity="error")
+            self.chamar(partial(self.entrar, conta),
+                        self.servicos.conta_existe, conta, indicador=event.button)
+        elif event.button.id == "abrir":
+            self.chamar(self.aberta, self.servicos.abrir_conta,
+                        conta or None, indicador=event.button)
+
+    def entrar(self, conta, existe) -> None:
+        if existe:
+            self.app.push_screen(MenuScreen(conta))
+        else:
+            self.notify("Conta inválida!", severity="error")
+
+    def aberta(self, nova) -> None:
+        self.notify(f"Conta '{nova['conta']}' criada!", severity="success")
+        self.app.push_screen(MenuScreen(nova["conta"]))
 
 
 class MenuScreen(Screen):
@@ -74,24 +182,45 @@ class MenuScreen(Screen):
             self.app.pop_screen()
 
 
-class SaldoScreen(Screen):
-    def __init__(self, conta: str):
-        super().__init__()
-        self.conta = conta
+class SaldoScreen(TelaConta):
+    AO_VIVO = True
+    saldo = reactive(None)
+    # Versão da última mudança exibida
+    versao = 0
 
     def compose(self) -> ComposeResult:
-        saldo = consultar_saldo(self.conta)
-        yield Label(f"Saldo: R$ {saldo:.2f}", classes="resultado")
+        yield Label("Saldo: R$ ...", id="saldo", classes="resultado")
         yield Button("Voltar", id="voltar")
 
+    def on_mount(self) -> None:
+        self.chamar(self.saldo_carregado, self.servicos.consultar_saldo,
+                    self.conta, indicador=self.query_one("#saldo"))
+
+    def saldo_carregado(self, saldo) -> None:
+        # Uma atualização ao vivo que já chegou é mais nova que esta leitura
+        if self.saldo is None:
+            self.saldo = saldo
+
+    def on_tela_conta_atualizada(self, event: TelaConta.Atualizada) -> None:
+        mudanca = event.mudanca
+        # Uma mudança mais antiga que a exibida não volta o saldo atrás
+        # (as remotas vêm sem versão e sempre valem)
+        if mudanca.versao and mudanca.versao < self.versao:
+            return
+        self.versao = mudanca.versao
+        self.saldo = mudanca.saldo
+
+    def watch_saldo(self, saldo) -> None:
+        if saldo is not None:
+            self.query_one("#saldo", Label).update(f"Saldo: R$ {saldo:.2f}")
+
     def on_button_pressed(self, event: Button.Pressed) -> None:
         self.app.pop_screen()
 
 
-class OperacaoScreen(Screen):
+class OperacaoScreen(TelaConta):
     def __init__(self, conta: str, operacao: str):
-        super().__init__()
-        self.conta = conta
+        super().__init__(conta)
         self.operacao = operacao
 
     def compose(self) -> ComposeResult:
@@ -112,35 +241,19 @@ class OperacaoScreen(Screen):
 
             valor = float(self.query_one("#valor", Input).value)
             if self.operacao == "deposito":
-                try:
-                    depositar(valor, self.conta)
-                    self.notify(
-                        f"Depósito de R$ {valor:.2f} realizado!", severity="success")
-                    self.app.pop_screen()
-                except HTTPException as e:
-                    self.notify(f"Erro: {e.detail}", severity="error")
-                except Exception as e:
-                    self.notify(f"Erro inesperado: {str(e)}", severity="error")
+                self.chamar(partial(self.concluida, f"Depósito de R$ {valor:.2f} realizado!"),
+                            self.servicos.depositar, valor, self.conta,
+                            indicador=event.button)
             elif self.operacao == "saque":
-                try:
-                    sacar(valor, self.conta)
-                    self.notify(
-                        f"Saque de R$ {valor:.2f} realizado!", severity="success")
-                    self.app.pop_screen()
-                except HTTPException as e:
-                    self.notify(f"Erro: {e.detail}", severity="error")
-                except Exception as e:
-                    self.notify(f"Erro inesperado: {str(e)}", severity="error")
+                self.chamar(partial(self.concluida, f"Saque de R$ {valor:.2f} realizado!"),
+                            self.servicos.sacar, valor, self.conta,
+                            indicador=event.button)
 
         elif event.button.id == "cancelar":
             self.app.pop_screen()
 
 
-class TransferenciaScreen(Screen):
-    def __init__(self, conta: str):
-        super().__init__()
-        self.conta = conta
-
+class TransferenciaScreen(TelaConta):
     def compose(self) -> ComposeResult:
         yield Label("Transferência", classes="titulo")
         yield Input(placeholder="Conta Destino", id="destino")
@@ -159,33 +272,153 @@ class TransferenciaScreen(Screen):
                 self.notify("Valor deve ser maior que zero!", severity="error")
                 return
 
-            try:
-                destino = self.query_one("#destino", Input).value
-                valor = float(self.query_one("#valor", Input).value)
-                transferir(valor, destino, self.conta)
-                self.notify(
-                    f"Transferência de R$ {valor:.2f} para {destino}!", severity="success")
-                self.app.pop_screen()
-            except HTTPException as e:
-                self.notify(f"Erro: {e.detail}", severity="error")
-            except Exception as e:
-                self.notify(f"Erro inesperado: {str(e)}", severity="error")
+            destino = self.query_one("#destino", Input).value
+            valor = float(self.query_one("#valor", Input).value)
+            self.chamar(
+                partial(self.concluida, f"Transferência de R$ {valor:.2f} para {destino}!"),
+                self.servicos.transferir, valor, destino, self.conta,
+                indicador=event.button)
 
         elif event.button.id == "cancelar":
             self.app.pop_screen()
 
 
-class ExtratoScreen(Screen):
+class TabelaExtrato(DataTable):
+    # Pede a próxima página quando a rolagem chega perto do fim
+    def watch_scroll_y(self, old_value: float, new_value: float) -> None:
+        super().watch_scroll_y(old_value, new_value)
+        if self.row_count and new_value >= self.max_scroll_y - self.size.height:
+            self.screen.carregar_pagina()
+
+
+class ExtratoScreen(TelaConta):
+    AO_VIVO = True
+    TAMANHO_PAGINA = 200
+    TIPOS = [
+        ("Todas as operações", ""),
+        ("Depósitos", "deposito"),
+        ("Saques", "saque"),
+        ("Saques em caixa", "saque_caixa"),
+        ("Transferências enviadas", "transferencia_enviada"),
+        ("Transferências recebidas", "transferencia_recebida"),
+        ("Aplicações", "aplicacao"),
+        ("Resgates", "resgate"),
+        ("Estornos", "estorno"),
+    ]
+    # Tamanho da visão do extrato, até onde a tela já sabe
+    total = reactive(None)
+
     def __init__(self, conta: str):
-        super().__init__()
-        self.conta = conta
+        super().__init__(conta)
+        self.proximo = 0
+        self.geracao = 0
+        self.carregando = False
+        # Mudanças que chegam durante o carregamento de uma página
+        self.adiadas = []
 
     def compose(self) -> ComposeResult:
-        extrato = consultar_extrato(self.conta)
-        yield Label("Extrato", classes="titulo")
-        yield Static("\n".join([f"{op['op']}: R$ {op['valor']:.2f}" for op in extrato]), classes="extrato")
+        yield Label("Extrato", id="resumo", classes="titulo")
+        yield Input(placeholder="Buscar no extrato", id="busca")
+        yield Select(self.TIPOS, value="", allow_blank=False, id="tipo")
+        yield TabelaExtrato(id="tabela", classes="extrato", cursor_type="row")
         yield Button("Voltar", id="voltar")
 
+    def on_mount(self) -> None:
+        tabela = self.query_one(TabelaExtrato)
+        tabela.add_columns("#", "Operação", "Valor", "Saldo")
+        self.carregar_pagina()
+
+    def filtros(self):
+        busca = self.query_one("#busca", Input).value.strip() or None
+        tipo = self.query_one("#tipo", Select).value or None
+        return tipo, busca
+
+    def reiniciar(self) -> None:
+        # Páginas pedidas antes daqui são descartadas quando chegarem
+        self.geracao += 1
+        self.carregando = False
+        self.adiadas.clear()
+        self.query_one(TabelaExtrato).clear()
+        self.proximo = 0
+        self.carregar_pagina()
+
+    def carregar_pagina(self) -> None:
+        if self.proximo is None or self.carregando:
+            return
+        self.carregando = True
+        tipo, busca = self.filtros()
+        self.chamar(partial(self.pagina_carregada, self.geracao, tipo, busca),
+                    self.servicos.consultar_extrato_pagina, self.conta,
+                    self.proximo, self.TAMANHO_PAGINA, tipo, busca, grupo=None,
+                    # Só a primeira página cobre a tabela; as demais chegam
+                    # enquanto o usuário rola
+                    indicador=self.query_one(TabelaExtrato) if not self.proximo else None)
+
+    def pagina_carregada(self, geracao, tipo, busca, pagina) -> None:
+        if geracao != self.geracao:
+            return
+        self.carregando = False
+        self.proximo = pagina["proximo"]
+        self.total = pagina["total"]
+        tabela = self.query_one(TabelaExtrato)
+        self.adicionar(pagina["linhas"])
+        if self.proximo is None:
+            casa = filtro_extrato(tipo, busca)
+            for mudanca in self.adiadas:
+                self.anexar_ao_vivo(mudanca, casa)
+        self.adiadas.clear()
+        # Filtro com poucos resultados: continua a varredura aos poucos,
+        # devolvendo o controle à interface entre um trecho e outro
+        if self.proximo is not None and tabela.row_count < self.TAMANHO_PAGINA:
+            self.call_later(self.carregar_pagina)
+
+    def adicionar(self, linhas) -> None:
+        self.query_one(TabelaExtrato).add_rows(
+            (linha["indice"] + 1, linha["op"], f"R$ {linha['valor']:.2f}",
+             f"R$ {linha['saldo']:.2f}")
+            for linha in linhas)
+
+    def anexar_ao_vivo(self, mudanca, casa) -> None:
+        if mudanca.lancamentos and mudanca.inicio > self.total:
+            # Faltam linhas entre a tabela e esta mudança: recarrega
+            self.reiniciar()
+            return
+        novas = []
+        for k, linha in enumerate(mudanca.lancamentos):
+            indice = mudanca.inicio + k
+            # Linhas que a última página já trouxe não entram de novo
+            if indice < self.total:
+                continue
+            self.total = indice + 1
+            if casa(linha["op"]):
+                novas.append(dict(linha, indice=indice))
+        self.adicionar(novas)
+
+    def on_tela_conta_atualizada(self, event: TelaConta.Atualizada) -> None:
+        mudanca = event.mudanca
+        if mudanca.limpo:
+            self.reiniciar()
+        elif self.carregando:
+            self.adiadas.append(mudanca)
+        elif self.proximo is None:
+            self.anexar_ao_vivo(mudanca, filtro_extrato(*self.filtros()))
+        # Ainda há páginas por vir: as linhas novas chegam com elas
+
+    def watch_total(self, total) -> None:
+        if total is not None:
+            self.query_one("#resumo", Label).update(f"Extrato ({total} lançamentos)")
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        if event.input.id == "busca":
+            self.reiniciar()
+
+    def on_select_changed(self, event: Select.Changed) -> None:
+        self.reiniciar()
+
+    def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted) -> None:
+        if event.cursor_row >= event.data_table.row_count - 10:
+            self.carregar_pagina()
+
     def on_button_pressed(self, event: Button.Pressed) -> None:
         self.app.pop_screen()
 
@@ -210,11 +443,7 @@ class InvestimentosScreen(Screen):
             self.app.pop_screen()
 
 
-class AplicarInvestimentoScreen(Screen):
-    def __init__(self, conta: str):
-        super().__init__()
-        self.conta = conta
-
+class AplicarInvestimentoScreen(TelaConta):
     def compose(self) -> ComposeResult:
         yield Label("Aplicar em Investimento", classes="titulo")
         yield Input(placeholder="Valor (R$)", id="valor", restrict=r"^[0-9]*\.?[0-9]*$")
@@ -233,27 +462,17 @@ class AplicarInvestimentoScreen(Screen):
                 self.notify("Valor deve ser maior que zero!", severity="error")
                 return
 
-            try:
-                valor = float(self.query_one("#valor", Input).value)
-                aplicar_investimento(
-                    valor, event.button.id.upper(), self.conta)
-                self.notify(
-                    f"Aplicado R$ {valor:.2f} em {event.button.id}!", severity="success")
-                self.app.pop_screen()
-            except HTTPException as e:
-                self.notify(f"Erro: {e.detail}", severity="error")
-            except Exception as e:
-                self.notify(f"Erro inesperado: {str(e)}", severity="error")
+            valor = float(self.query_one("#valor", Input).value)
+            self.chamar(
+                partial(self.concluida, f"Aplicado R$ {valor:.2f} em {event.button.id}!"),
+                self.servicos.aplicar_investimento, valor,
+                event.button.id.upper(), self.conta, indicador=event.button)
 
         elif event.button.id == "voltar":
             self.app.pop_screen()
 
 
-class ResgatarInvestimentoScreen(Screen):
-    def __init__(self, conta: str):
-        super().__init__()
-        self.conta = conta
-
+class ResgatarInvestimentoScreen(TelaConta):
     def compose(self) -> ComposeResult:
         yield Label("Resgatar Investimento", classes="titulo")
         yield Button("CDB", id="CDB")
@@ -263,15 +482,10 @@ class ResgatarInvestimentoScreen(Screen):
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
         if event.button.id in ["CDB", "POUPANCA", "TESOURO_DIRETO"]:
-            try:
-                resgatar_investimento(event.button.id.upper(), self.conta)
-                self.notify(
-                    f"Resgatado investimento em {event.button.id}!", severity="success")
-                self.app.pop_screen()
-            except HTTPException as e:
-                self.notify(f"Erro: {e.detail}", severity="error")
-            except Exception as e:
-                self.notify(f"Erro inesperado: {str(e)}", severity="error")
+            self.chamar(
+                partial(self.concluida, f"Resgatado investimento em {event.button.id}!"),
+                self.servicos.resgatar_investimento,
+                event.button.id.upper(), self.conta, indicador=event.button)
 
         elif event.button.id == "voltar":
             self.app.pop_screen()
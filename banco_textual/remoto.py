@@ -0,0 +1,180 @@
+import threading
+import time
+
+import httpx
+
+from tsbanking.assinaturas import Mudanca
+from tsbanking.erros import (
+    ContaJaExiste, ErroBancario, NaoEncontrado, OperacaoInvalida
+)
+
+_ERROS = {400: OperacaoInvalida, 404: NaoEncontrado, 409: ContaJaExiste}
+
+
+class _CacheTTL:
+    # Respostas de leitura por alguns segundos. Cada chave começa pela conta,
+    # para a invalidação por conta não depender do formato do resto.
+    def __init__(self, ttl, maximo=256, relogio=time.monotonic):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.relogio = relogio
+        self.itens = {}
+        self.trava = threading.Lock()
+
+    def obter(self, chave):
+        with self.trava:
+            item = self.itens.get(chave)
+            if item is None:
+                return None
+            expira, valor = item
+            if expira < self.relogio():
+                del self.itens[chave]
+                return None
+            return valor
+
+    def guardar(self, chave, valor):
+        with self.trava:
+            self.itens.pop(chave, None)
+            self.itens[chave] = (self.relogio() + self.ttl, valor)
+            if len(self.itens) > self.maximo:
+                # dict mantém a ordem de inserção: sai o mais antigo
+                del self.itens[next(iter(self.itens))]
+
+    def invalidar(self, conta):
+        with self.trava:
+            for chave in [c for c in self.itens if c[0] == conta]:
+                del self.itens[chave]
+
+
+class ServicosRemotos:
+    """Mesma interface de ``tsbanking.services``, mas falando com a API em
+    execução. Um único ``httpx.Client`` reaproveita as conexões entre
+    chamadas; saldo e páginas do extrato ficam num cache curto, descartado
+    a cada escrita feita por este cliente na conta."""
+
+    def __init__(self, url=None, cliente=None, ttl=2.0, timeout=10.0):
+        if cliente is None:
+            cliente = httpx.Client(
+                base_url=url, timeout=timeout,
+                limits=httpx.Limits(max_connections=10,
+                                    max_keepalive_connections=10,
+                                    keepalive_expiry=30.0))
+        self.cliente = cliente
+        self.cache = _CacheTTL(ttl)
+        self._assinantes = {}
+        self._trava = threading.Lock()
+
+    def fechar(self):
+        self.cliente.close()
+
+    def _pedir(self, metodo, rota, **kwargs):
+        resposta = self.cliente.request(metodo, rota, **kwargs)
+        if resposta.status_code >= 400:
+            try:
+                detalhe = resposta.json().get("detail", resposta.text)
+            except ValueError:
+                detalhe = resposta.text
+            erro = _ERROS.get(resposta.status_code, ErroBancario)(detalhe)
+            erro.status_code = resposta.status_code
+            raise erro
+        return resposta.json()
+
+    def _ler(self, chave, rota, params):
+        valor = self.cache.obter(chave)
+        if valor is None:
+            valor = self._pedir("GET", rota, params=params)
+            self.cache.guardar(chave, valor)
+        return valor
+
+    def _escrever(self, rota, corpo, *contas):
+        try:
+            resultado = self._pedir("POST", rota, json=corpo)
+        finally:
+            # Mesmo com erro a escrita pode ter sido aplicada no servidor
+            for conta in contas:
+                self.cache.invalidar(conta)
+        for conta in contas:
+            self._avisar(conta)
+        return resultado
+
+    # Leituras
+
+    def conta_existe(self, conta):
+        try:
+            self._pedir("GET", f"/contas/{conta}")
+        except NaoEncontrado:
+            return False
+        return True
+
+    def consultar_saldo(self, conta="principal"):
+        return self._ler((conta, "saldo"), "/saldo", {"conta": conta})["saldo"]
+
+    def consultar_extrato_pagina(self, conta="principal", inicio=0, limite=100,
+                                 tipo=None, busca=None):
+        params = {"conta": conta, "inicio": inicio, "limite": limite}
+        if tipo:
+            params["tipo"] = tipo
+        if busca:
+            params["busca"] = busca
+        return self._ler((conta, "pagina", inicio, limite, tipo, busca),
+                         "/extrato/pagina", params)
+
+    # Escritas
+
+    def abrir_conta(self, conta=None):
+        return self._pedir("POST", "/contas", json={"conta": conta})
+
+    def depositar(self, valor, conta="principal"):
+        return self._escrever("/depositar", {"valor": valor, "conta": conta}, conta)
+
+    def sacar(self, valor, conta="principal"):
+        return self._escrever("/sacar", {"valor": valor, "conta": conta}, conta)
+
+    def transferir(self, valor, conta_destino, conta_origem):
+        return self._escrever("/transferir", {
+            "valor": valor, "conta_destino": conta_destino,
+            "conta_origem": conta_origem, "tipo_transferencia": "INTERNA"},
+            conta_origem, conta_destino)
+
+    def aplicar_investimento(self, valor, tipo, conta="principal"):
+        return self._escrever("/investir", {
+            "valor": valor, "tipo_investimento": tipo, "conta": conta}, conta)
+
+    def resgatar_investimento(self, tipo, conta="principal"):
+        return self._escrever("/resgatar_investimento", {
+            "tipo_investimento": tipo, "conta": conta}, conta)
+
+    def saque_caixa(self, valor, tipo_caixa, conta="principal", caixa=None):
+        return self._escrever("/saque_caixa", {
+            "valor": valor, "tipo_caixa": tipo_caixa, "conta": conta,
+            "caixa": caixa}, conta)
+
+    # Assinaturas: sem canal de eventos do servidor, só as escritas deste
+    # cliente são avisadas. A mudança vem sem as linhas novas e marcada como
+    # ``limpo``, para a tela recarregar o extrato.
+
+    def assinar_conta(self, conta, callback):
+        with self._trava:
+            self._assinantes[conta] = self._assinantes.get(conta, ()) + (callback,)
+
+        def cancelar():
+            with self._trava:
+                restantes = tuple(c for c in self._assinantes.get(conta, ())
+                                  if c is not callback)
+                if restantes:
+                    self._assinantes[conta] = restantes
+                else:
+                    self._assinantes.pop(conta, None)
+        return cancelar
+
+    def _avisar(self, conta):
+        callbacks = self._assinantes.get(conta)
+        if not callbacks:
+            return
+        try:
+            saldo = self.consultar_saldo(conta)
+        except ErroBancario:
+            return
+        mudanca = Mudanca(conta, saldo, 0, [], limpo=True)
+        for callback in callbacks:
+            callback(mudanca)
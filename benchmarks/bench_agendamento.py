@@ -0,0 +1,41 @@
+import argparse
+import random
+import time
+
+from tsbanking.agendamento import Agendador
+
+
+def medir(agendamentos, semente=1):
+    aleatorio = random.Random(semente)
+    agenda = Agendador(lambda origem, destino, valor: None, lambda: 0.0)
+    inicio = time.perf_counter()
+    itens = [agenda.agendar(f"c{i % 1000}", "destino", 1.0,
+                            aleatorio.uniform(0, 86_400))
+             for i in range(agendamentos)]
+    agendar = time.perf_counter() - inicio
+
+    cancelados = aleatorio.sample(itens, agendamentos // 10)
+    inicio = time.perf_counter()
+    for item in cancelados:
+        agenda.cancelar(item.id)
+    cancelar = time.perf_counter() - inicio
+
+    # Um dia inteiro vencendo em lotes de uma hora
+    inicio = time.perf_counter()
+    executados = 0
+    for hora in range(1, 25):
+        executados += len(agenda.executar_vencidos(hora * 3600.0))
+    executar = time.perf_counter() - inicio
+    return (agendamentos / agendar, len(cancelados) / cancelar,
+            executados / executar)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede agendar, cancelar e executar transferências agendadas")
+    parser.add_argument("--agendamentos", type=int, default=1_000_000)
+    args = parser.parse_args()
+    agendar, cancelar, executar = medir(args.agendamentos)
+    print(f"agendar: {agendar:,.0f}/s")
+    print(f"cancelar: {cancelar:,.0f}/s")
+    print(f"executar vencidos: {executar:,.0f}/s")
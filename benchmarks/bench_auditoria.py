@@ -0,0 +1,43 @@
+import argparse
+import random
+import time
+
+from tsbanking.auditoria import reconciliar
+from tsbanking.services import abrir_conta, depositar, sacar
+
+
+def preparar(contas, operacoes):
+    nomes = [abrir_conta()["conta"] for _ in range(contas)]
+    inicio = time.perf_counter()
+    for i in range(operacoes):
+        nome = nomes[i % contas]
+        depositar(10.0, nome)
+        sacar(5.0, nome)
+    return nomes, 2 * operacoes / (time.perf_counter() - inicio)
+
+
+def medir(processos, completa):
+    inicio = time.perf_counter()
+    resultado = reconciliar(processos, completa)
+    return time.perf_counter() - inicio, resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede a reconciliação completa e a incremental")
+    parser.add_argument("--contas", type=int, default=50_000)
+    parser.add_argument("--operacoes", type=int, default=200_000)
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    nomes, por_segundo = preparar(args.contas, args.operacoes)
+    print(f"operações com trilha: {por_segundo:,.0f}/s")
+    for processos in args.processos:
+        segundos, resultado = medir(processos, True)
+        print(f"completa, {processos} processo(s): {segundos:.2f}s, "
+              f"{resultado['dias_conferidos']} dias")
+    for nome in random.Random(1).sample(nomes, len(nomes) // 100):
+        depositar(1.0, nome)
+    segundos, resultado = medir(args.processos[-1], False)
+    print(f"incremental após mexer em 1% das contas: {segundos:.2f}s, "
+          f"{resultado['dias_conferidos']} dias conferidos, "
+          f"{resultado['dias_pulados']} pulados")
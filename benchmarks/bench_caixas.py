@@ -0,0 +1,49 @@
+import argparse
+import random
+import time
+
+from tsbanking.caixas import DENOMINACOES, _compor, registrar_caixa
+from tsbanking.erros import NotasIndisponiveis
+from tsbanking.services import abrir_conta, depositar, saque_caixa
+
+
+def medir_composicao(saques, semente=1):
+    # Estoques aleatórios e sempre diferentes: só a busca, sem cache
+    aleatorio = random.Random(semente)
+    pedidos = [(aleatorio.randrange(10, 3000, 10),
+                tuple((nota, aleatorio.randrange(0, 200)) for nota in DENOMINACOES))
+               for _ in range(saques)]
+    buscar = _compor.__wrapped__
+    inicio = time.perf_counter()
+    for valor, estoque in pedidos:
+        buscar(valor, tuple((nota, min(q, valor // nota))
+                            for nota, q in estoque if nota <= valor and q))
+    return saques / (time.perf_counter() - inicio)
+
+
+def medir_saques(saques, semente=1):
+    aleatorio = random.Random(semente)
+    conta = abrir_conta()["conta"]
+    depositar(float(saques) * 3000, conta)
+    caixa = registrar_caixa("bench", {nota: saques for nota in DENOMINACOES})
+    _compor.cache_clear()
+    faltas = 0
+    inicio = time.perf_counter()
+    for _ in range(saques):
+        try:
+            saque_caixa(aleatorio.randrange(10, 1000, 10), "CAIXA_10", conta, caixa.id)
+        except NotasIndisponiveis:
+            faltas += 1
+    segundos = time.perf_counter() - inicio
+    return saques / segundos, faltas, _compor.cache_info()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede a composição de notas e o saque em caixa")
+    parser.add_argument("--saques", type=int, default=20_000)
+    args = parser.parse_args()
+    print(f"compor sem cache: {medir_composicao(args.saques):,.0f}/s")
+    por_segundo, faltas, cache = medir_saques(args.saques)
+    print(f"saque_caixa: {por_segundo:,.0f} saques/s, {faltas} sem notas, "
+          f"cache {cache.hits} acertos / {cache.misses} faltas")
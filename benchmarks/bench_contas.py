@@ -0,0 +1,26 @@
+import argparse
+import tracemalloc
+
+from tsbanking.database import criar_conta, total_contas
+
+
+def medir_memoria_por_conta(quantidade):
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    for _ in range(quantidade):
+        criar_conta()
+    depois = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (depois - antes) / quantidade
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede a memória ocupada por conta vazia")
+    parser.add_argument("--contas", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    por_conta = medir_memoria_por_conta(args.contas)
+    print(f"contas criadas: {total_contas()}")
+    print(f"bytes por conta vazia: {por_conta:.1f}")
+    print(f"estimativa para 10M contas: {por_conta * 10_000_000 / 2**30:.2f} GiB")
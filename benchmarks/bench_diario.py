@@ -0,0 +1,56 @@
+import argparse
+import os
+import tempfile
+import time
+
+from tsbanking.diario import Diario, iniciar_diario, parar_diario
+from tsbanking.services import abrir_conta, depositar
+
+
+def medir_registro(diario, chamadas):
+    # Custo de quem opera (pôr o registro na fila) e, à parte, o da thread
+    # do diário (formatar e escrever o lote), lote a lote como ela faria
+    operacao = ("depositar", ("valor", "conta"))
+    registrar = escrever = 0.0
+    for _ in range(chamadas // diario.tamanho_lote):
+        inicio = time.perf_counter()
+        for _ in range(diario.tamanho_lote):
+            diario.registrar(operacao, (10.0, "principal"), {})
+        meio = time.perf_counter()
+        diario.descarregar()
+        registrar += meio - inicio
+        escrever += time.perf_counter() - meio
+    return registrar / chamadas, escrever / chamadas
+
+
+def medir_depositos(operacoes):
+    conta = abrir_conta()["conta"]
+    inicio = time.perf_counter()
+    for _ in range(operacoes):
+        depositar(1.0, conta)
+    return (time.perf_counter() - inicio) / operacoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede o custo do diário de auditoria para quem opera")
+    parser.add_argument("--chamadas", type=int, default=1_000_000)
+    parser.add_argument("--operacoes", type=int, default=100_000)
+    parser.add_argument("--comprimir", action="store_true")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "auditoria.jsonl")
+
+        diario = Diario(caminho, comprimir=args.comprimir, tamanho_arquivo=16 << 20)
+        por_chamada, escrita = medir_registro(diario, args.chamadas)
+        diario.parar()
+        print(f"registrar: {por_chamada * 1e9:,.0f} ns por chamada; "
+              f"escrita em lotes na thread do diário: {escrita * 1e9:,.0f} ns por registro")
+
+        sem = medir_depositos(args.operacoes)
+        iniciar_diario(caminho + ".2", comprimir=args.comprimir,
+                       tamanho_arquivo=16 << 20)
+        com = medir_depositos(args.operacoes)
+        parar_diario()
+        print(f"depósito sem diário: {sem * 1e6:.2f} µs; com diário: {com * 1e6:.2f} µs "
+              f"(+{(com - sem) * 1e9:,.0f} ns)")
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from tsbanking.services import abrir_conta, depositar
+from tsbanking.transmissao import BATIMENTO, Inscricao
+
+
+async def _consumir(inscricao, recebidas):
+    while True:
+        mensagem = await inscricao.proxima(BATIMENTO)
+        if mensagem is not None:
+            recebidas.append(time.perf_counter())
+
+
+async def medir(inscritos, contas, quentes):
+    # ``inscritos`` clientes parados, divididos entre ``contas`` contas; no
+    # fim, ``quentes`` deles seguem a mesma conta e recebem cada depósito
+    nomes = [abrir_conta()["conta"] for _ in range(contas)]
+    quente = abrir_conta()["conta"]
+    recebidas = []
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    inicio = time.perf_counter()
+    tarefas = []
+    for i in range(inscritos):
+        inscricao = Inscricao([quente if i < quentes else nomes[i % contas]])
+        tarefas.append((inscricao, asyncio.ensure_future(_consumir(inscricao, recebidas))))
+    await asyncio.sleep(0)
+    inscrever = time.perf_counter() - inicio
+    por_inscrito = (tracemalloc.get_traced_memory()[0] - antes) / inscritos
+    tracemalloc.stop()
+
+    # Latência de um depósito até o último inscrito da conta quente
+    latencias = []
+    for _ in range(20):
+        recebidas.clear()
+        inicio = time.perf_counter()
+        await asyncio.to_thread(depositar, 1.0, quente)
+        while len(recebidas) < quentes:
+            await asyncio.sleep(0.0005)
+        latencias.append(max(recebidas) - inicio)
+
+    for inscricao, tarefa in tarefas:
+        tarefa.cancel()
+        inscricao.fechar()
+    latencias.sort()
+    return inscrever, por_inscrito, latencias[len(latencias) // 2]
+
+
+async def medir_servidor(url, conexoes):
+    # Contra um servidor rodando (uvicorn tsbanking.main:app): abre as
+    # conexões SSE e espera o evento de abertura de cada uma. A memória
+    # do servidor se acompanha de fora (RSS do processo).
+    import httpx
+
+    async def abrir(cliente, prontas):
+        async with cliente.stream("GET", f"{url}/eventos") as resposta:
+            async for linha in resposta.aiter_lines():
+                if linha.startswith("event: inscrito"):
+                    prontas.append(time.perf_counter())
+                    await asyncio.sleep(3600)
+
+    limites = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(limits=limites, timeout=None) as cliente:
+        prontas = []
+        inicio = time.perf_counter()
+        tarefas = [asyncio.ensure_future(abrir(cliente, prontas)) for _ in range(conexoes)]
+        while len(prontas) < conexoes and not any(t.done() for t in tarefas):
+            await asyncio.sleep(0.1)
+        abertas = len(prontas)
+        tempo = time.perf_counter() - inicio
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+    return abertas, tempo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede o custo de inscritos parados e a entrega das mudanças")
+    parser.add_argument("--inscritos", type=int, default=10_000)
+    parser.add_argument("--contas", type=int, default=1_000)
+    parser.add_argument("--quentes", type=int, default=1_000)
+    parser.add_argument("--url", help="servidor já rodando; mede conexões SSE reais")
+    args = parser.parse_args()
+    if args.url:
+        abertas, tempo = asyncio.run(medir_servidor(args.url, args.inscritos))
+        print(f"{abertas:,} conexões SSE abertas em {tempo:.1f} s")
+    else:
+        inscrever, por_inscrito, latencia = asyncio.run(
+            medir(args.inscritos, args.contas, args.quentes))
+        print(f"{args.inscritos:,} inscritos em {inscrever * 1000:.0f} ms, "
+              f"{por_inscrito:,.0f} B por inscrito")
+        print(f"depósito até {args.quentes:,} inscritos da mesma conta: "
+              f"{latencia * 1000:.1f} ms (mediana)")
@@ -0,0 +1,60 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tsbanking.fragmentos import Roteador
+
+
+def medir(fragmentos, contas, operacoes, threads, entre_fragmentos):
+    """Operações por segundo com ``threads`` clientes no roteador: depósitos
+    e transferências entre contas sorteadas. Com ``entre_fragmentos``, as
+    transferências podem cruzar fragmentos (duas fases)."""
+    roteador = Roteador(fragmentos=fragmentos, conexoes=threads)
+    try:
+        nomes = [roteador.abrir_conta()["conta"] for _ in range(contas)]
+        for nome in nomes:
+            roteador.depositar(1_000_000.0, nome)
+        grupos = {}
+        for nome in nomes:
+            grupos.setdefault(roteador.fragmento(nome).indice, []).append(nome)
+
+        def cliente(semente):
+            aleatorio = random.Random(semente)
+            for i in range(operacoes // threads):
+                origem = aleatorio.choice(nomes)
+                if i % 2:
+                    roteador.depositar(1.0, origem)
+                    continue
+                vizinhas = nomes if entre_fragmentos else \
+                    grupos[roteador.fragmento(origem).indice]
+                destino = aleatorio.choice(vizinhas)
+                if destino != origem:
+                    roteador.transferir(1.0, destino, origem)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(cliente, range(threads)))
+        return operacoes / (time.perf_counter() - inicio)
+    finally:
+        roteador.fechar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede a vazão do roteador com 1, 2, 4... fragmentos")
+    parser.add_argument("--fragmentos", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--contas", type=int, default=1_000)
+    parser.add_argument("--operacoes", type=int, default=40_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} núcleo(s); a vazão só cresce com fragmentos "
+          "havendo núcleos para eles")
+    for fragmentos in args.fragmentos:
+        for cruzadas in (False, True):
+            por_segundo = medir(fragmentos, args.contas, args.operacoes,
+                                args.threads, cruzadas)
+            tipo = "transferências entre fragmentos" if cruzadas else \
+                "transferências no mesmo fragmento"
+            print(f"{fragmentos} fragmento(s), {tipo}: {por_segundo:,.0f} op/s")
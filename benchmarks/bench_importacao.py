@@ -0,0 +1,41 @@
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULOS = ["tsbanking.services", "banco_textual.app", "tsbanking.main"]
+
+
+def medir_importacao(modulo, repeticoes):
+    # Tempo acumulado do módulo segundo ``python -X importtime``, num
+    # interpretador novo a cada repetição (sem cache de módulos)
+    tempos = []
+    for _ in range(repeticoes):
+        saida = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+            capture_output=True, text=True, check=True).stderr
+        for linha in saida.splitlines():
+            # "import time: <próprio> | <acumulado> | <módulo>", em us
+            _, acumulado, nome = linha.split("|")
+            if nome.strip() == modulo:
+                tempos.append(int(acumulado) / 1000)
+    return statistics.median(tempos)
+
+
+def carrega_fastapi(modulo):
+    codigo = f"import sys, {modulo}; print('fastapi' in sys.modules)"
+    saida = subprocess.run([sys.executable, "-c", codigo],
+                           capture_output=True, text=True, check=True).stdout
+    return saida.strip() == "True"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede o tempo de importação dos pontos de entrada")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("modulos", nargs="*", default=MODULOS)
+    args = parser.parse_args()
+    for modulo in args.modulos:
+        ms = medir_importacao(modulo, args.repeticoes)
+        fastapi = "carrega fastapi" if carrega_fastapi(modulo) else "sem fastapi"
+        print(f"{modulo}: {ms:.1f} ms ({fastapi})")
@@ -0,0 +1,40 @@
+import argparse
+import tempfile
+import time
+
+from tsbanking import provisao
+from tsbanking.database import get_investimento
+from tsbanking.services import abrir_conta
+
+
+def preparar(contas):
+    # Posições direto na projeção: o que se mede é só a provisão
+    for i in range(contas):
+        conta = abrir_conta()["conta"]
+        for tipo in ("CDB", "POUPANCA", "TESOURO_DIRETO"):
+            posicao = get_investimento(tipo, conta)
+            posicao["valor"] = 100.0 + i % 1000
+            posicao["data_aplicacao"] = "2024-01-01T10:00:00"
+
+
+def medir(processos, particoes):
+    with tempfile.TemporaryDirectory() as pasta:
+        inicio = time.perf_counter()
+        resumo = provisao.provisionar("2025-01-01", pasta, particoes, processos)
+        return time.perf_counter() - inicio, resumo["posicoes"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede a provisão de rendimentos com 1..N processos")
+    parser.add_argument("--contas", type=int, default=300_000)
+    parser.add_argument("--particoes", type=int, default=provisao.PARTICOES)
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    preparar(args.contas)
+    base = None
+    for processos in args.processos:
+        segundos, posicoes = medir(processos, args.particoes)
+        base = base or segundos
+        print(f"{processos} processo(s): {segundos:.2f}s, "
+              f"{posicoes / segundos:,.0f} posições/s, {base / segundos:.1f}x")
@@ -0,0 +1,57 @@
+import argparse
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from tsbanking import main, respostas
+from tsbanking.services import (
+    abrir_conta, consultar_extrato, consultar_extrato_pagina, depositar
+)
+
+
+def preparar(linhas):
+    conta = abrir_conta()["conta"]
+    for i in range(linhas):
+        depositar(1.0 + i % 7, conta)
+    return conta
+
+
+def caminho_padrao(conteudo):
+    # O que o FastAPI faz com um dict devolvido pelo endpoint
+    return JSONResponse(jsonable_encoder(conteudo)).body
+
+
+def medir(funcao, linhas, repeticoes):
+    segundos = min(timeit.repeat(funcao, number=1, repeat=repeticoes))
+    return linhas / segundos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compara a serialização das respostas grandes com o "
+                    "caminho padrão do FastAPI (jsonable_encoder + json)")
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+    conta = preparar(args.linhas)
+    pagina = min(args.linhas, 1000)
+
+    casos = {
+        "/extrato": (
+            lambda: caminho_padrao({"extrato": consultar_extrato(conta)}),
+            lambda: main.extrato(conta, False).body, args.linhas),
+        "/extrato?colunas=true": (
+            lambda: caminho_padrao({"extrato": consultar_extrato(conta)}),
+            lambda: main.extrato(conta, True).body, args.linhas),
+        "/extrato/pagina": (
+            lambda: caminho_padrao(consultar_extrato_pagina(conta, 0, pagina)),
+            lambda: main.extrato_paginado(conta, 0, pagina, None, None).body, pagina),
+    }
+    motor = "orjson" if respostas.orjson is not None else "TypeAdapter"
+    print(f"serializador rápido: {motor}")
+    for rota, (antes, depois, linhas) in casos.items():
+        padrao = medir(antes, linhas, args.repeticoes)
+        rapido = medir(depois, linhas, args.repeticoes)
+        print(f"{rota}: {padrao:,.0f} -> {rapido:,.0f} linhas/s "
+              f"({rapido / padrao:.1f}x)")
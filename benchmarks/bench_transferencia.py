@@ -0,0 +1,27 @@
+import argparse
+import timeit
+
+from tsbanking import risco
+from tsbanking.database import atualizar_saldo, limpar_extrato
+from tsbanking.services import transferir
+
+
+def medir_transferencia(repeticoes):
+    atualizar_saldo(float(repeticoes) * 10, "principal")
+    limpar_extrato("principal")
+    limpar_extrato("destino")
+    segundos = timeit.timeit(
+        lambda: transferir(1.0, "destino", "principal"), number=repeticoes)
+    return segundos / repeticoes * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede o custo de uma transferência no serviço")
+    parser.add_argument("--repeticoes", type=int, default=200_000)
+    args = parser.parse_args()
+    print(f"transferir: {medir_transferencia(args.repeticoes):.2f} us/transferência")
+    # Mesma medida com a triagem de risco ligada
+    risco.configurar_avaliador(risco.regras_basicas)
+    print(f"transferir com triagem: {medir_transferencia(args.repeticoes):.2f} "
+          "us/transferência")
@@ -0,0 +1,24 @@
+import pytest
+
+from tsbanking.banco import criar_banco, trocar_padrao
+
+
+@pytest.fixture(autouse=True)
+def banco():
+    # Cada teste num banco novo: nada vaza de um teste para outro
+    novo = criar_banco()
+    anterior = trocar_padrao(novo)
+    try:
+        yield novo
+    finally:
+        trocar_padrao(anterior)
+
+
+async def esperar_workers(app, pilot):
+    # Telas textual: as páginas chegam por workers, que podem encadear
+    # novos pedidos; espera até não sobrar nenhum rodando
+    await pilot.pause()
+    while any(not worker.is_finished for worker in app.workers):
+        await app.workers.wait_for_complete()
+        await pilot.pause()
+    await pilot.pause()
@@ -0,0 +1,195 @@
+import random
+import time
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking.agendamento import (
+    Agendador, Agendamento, FilaAgendada, ocorrencia, DIARIA, MENSAL
+)
+from tsbanking.erros import OperacaoInvalida, SaldoInsuficiente
+from tsbanking.main import app
+from tsbanking.services import (
+    abrir_conta, agendar_transferencia, consultar_saldo, depositar
+)
+
+
+class Relogio:
+    def __init__(self, agora=1_000.0):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_fila_remove_do_meio():
+    aleatorio = random.Random(3)
+    fila = FilaAgendada()
+    vivos = {}
+    for id in range(1, 2001):
+        item = Agendamento(id, aleatorio.random(), "a", "b", 1.0)
+        fila.inserir(item)
+        vivos[id] = item
+    for id in aleatorio.sample(sorted(vivos), 800):
+        fila.remover(vivos.pop(id))
+    esperado = sorted(vivos.values(), key=lambda item: (item.momento, item.id))
+    assert [fila.retirar() for _ in range(len(fila))] == esperado
+
+
+def test_mensal_mantem_o_dia():
+    inicio = datetime(2024, 1, 31, 9, 0).timestamp()
+    datas = [datetime.fromtimestamp(ocorrencia(inicio, MENSAL, n)).date().isoformat()
+             for n in range(4)]
+    assert datas == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"]
+
+
+def test_executa_vencidos_em_lote():
+    feitas = []
+    relogio = Relogio()
+    agenda = Agendador(lambda origem, destino, valor: feitas.append(
+        (origem, destino, valor)), relogio)
+    agenda.agendar("a", "b", 10.0, 1_010.0)
+    agenda.agendar("a", "c", 20.0, 1_005.0)
+    agenda.agendar("a", "d", 30.0, 2_000.0)
+    assert agenda.executar_vencidos() == []
+
+    relogio.agora = 1_020.0
+    agenda.executar_vencidos()
+    assert feitas == [("a", "c", 20.0), ("a", "b", 10.0)]
+    assert [item.destino for item in agenda.listar("a")] == ["d"]
+
+
+def test_recorrente_volta_para_a_fila_e_falha_nao_para():
+    def executar(origem, destino, valor):
+        raise SaldoInsuficiente("Saldo insuficiente para transferência")
+
+    inicio = datetime(2024, 5, 1, 8, 0).timestamp()
+    agenda = Agendador(executar, Relogio(inicio))
+    item = agenda.agendar("a", "b", 10.0, inicio, DIARIA)
+    resultados = agenda.executar_vencidos()
+    assert isinstance(resultados[0][1], SaldoInsuficiente)
+    assert agenda.falhas == 1
+    assert item.execucoes == 1
+    assert item.momento == datetime(2024, 5, 2, 8, 0).timestamp()
+
+    # Parado por três dias: executa uma vez e segue para o próximo dia
+    agenda.executar_vencidos(datetime(2024, 5, 5, 9, 0).timestamp())
+    assert agenda.falhas == 2
+    assert item.momento == datetime(2024, 5, 6, 8, 0).timestamp()
+
+
+def test_diario_sobrevive_ao_reinicio(tmp_path):
+    caminho = str(tmp_path / "agenda.jsonl")
+    relogio = Relogio()
+    agenda = Agendador(lambda *args: None, relogio)
+    agenda.abrir_diario(caminho)
+    unico = agenda.agendar("a", "b", 1.0, 1_010.0)
+    cancelado = agenda.agendar("a", "b", 2.0, 1_020.0)
+    recorrente = agenda.agendar("a", "c", 3.0, 1_005.0, DIARIA)
+    agenda.agendar("x", "y", 4.0, 5_000.0)
+    agenda.cancelar(cancelado.id)
+    relogio.agora = 1_015.0
+    agenda.executar_vencidos()
+    agenda.fechar()
+
+    reaberta = Agendador(lambda *args: None, relogio)
+    reaberta.abrir_diario(caminho)
+    assert sorted(reaberta.agendamentos) == [recorrente.id, 4]
+    assert reaberta.obter(recorrente.id).momento == recorrente.momento
+    assert reaberta.obter(recorrente.id).execucoes == 1
+    assert unico.id not in reaberta.agendamentos
+    assert reaberta.agendar("a", "b", 1.0, 9_000.0).id == 5
+    reaberta.fechar()
+
+
+def test_thread_acorda_no_vencimento():
+    conta = abrir_conta()["conta"]
+    destino = abrir_conta()["conta"]
+    depositar(50.0, conta)
+    agenda = Agendador()
+    agenda.iniciar()
+    try:
+        # Um agendamento distante não atrasa o que vence antes
+        agenda.agendar(conta, destino, 1.0, time.time() + 3600)
+        agenda.agendar(conta, destino, 20.0, time.time() + 0.05)
+        limite = time.time() + 5
+        while agenda.executados == 0 and time.time() < limite:
+            time.sleep(0.01)
+    finally:
+        agenda.parar()
+    assert consultar_saldo(destino) == 20.0
+    assert len(agenda) == 1
+
+
+def test_erro_inesperado_nao_para_a_thread():
+    feitas = []
+
+    def executar(origem, destino, valor):
+        if valor == 1.0:
+            raise RuntimeError("defeito")
+        feitas.append(valor)
+
+    agenda = Agendador(executar)
+    agenda.iniciar()
+    try:
+        agenda.agendar("a", "b", 1.0, time.time())
+        agenda.agendar("a", "b", 2.0, time.time() + 0.05)
+        limite = time.time() + 5
+        while not feitas and time.time() < limite:
+            time.sleep(0.01)
+        assert agenda._thread.is_alive()
+    finally:
+        agenda.parar()
+    assert feitas == [2.0]
+    assert agenda.falhas == 1
+
+
+def test_agendar_sem_momento():
+    with pytest.raises(OperacaoInvalida):
+        agendar_transferencia(10.0, "destino", "principal")
+
+
+def test_endpoints_de_agendamento(client):
+    conta = abrir_conta()["conta"]
+    resposta = client.post("/agendamentos", json={
+        "valor": 100.0, "conta_destino": "destino", "conta_origem": conta,
+        "executar_em": "2099-01-10T09:00:00", "recorrencia": "mensal"})
+    assert resposta.status_code == 201
+    id = resposta.json()["agendamento"]["id"]
+
+    lista = client.get("/agendamentos", params={"conta": conta}).json()["agendamentos"]
+    assert [item["id"] for item in lista] == [id]
+    assert lista[0]["recorrencia"] == "mensal"
+    assert client.get(f"/agendamentos/{id}").json()["executar_em"] == "2099-01-10T09:00:00"
+
+    assert client.delete(f"/agendamentos/{id}").status_code == 200
+    assert client.delete(f"/agendamentos/{id}").status_code == 404
+    assert client.get("/agendamentos", params={"conta": conta}).json()["agendamentos"] == []
+
+    resposta = client.post("/agendamentos", json={
+        "valor": 10.0, "conta_destino": "nao_existe", "conta_origem": conta,
+        "executar_em": "2099-01-10T09:00:00"})
+    assert resposta.status_code == 404
+
+
+def test_ted_fora_do_horario_pode_ser_agendada(client, monkeypatch):
+    class Noite(datetime):
+        @classmethod
+        def now(cls):
+            return cls(2024, 1, 1, 18, 0)
+
+    monkeypatch.setattr("tsbanking.main.datetime", Noite)
+    conta = abrir_conta()["conta"]
+    resposta = client.post("/transferir", json={
+        "valor": 1000, "conta_destino": "destino", "conta_origem": conta,
+        "tipo_transferencia": "TED", "agendar_fora_do_horario": True})
+    assert resposta.status_code == 202
+    agendamento = resposta.json()["agendamento"]
+    assert agendamento["executar_em"] == "2024-01-02T06:00:00"
+    client.delete(f"/agendamentos/{agendamento['id']}")
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+from tests.conftest import esperar_workers
+from tsbanking.services import (
+    abrir_conta, assinar_conta, depositar, sacar, transferir, limpar
+)
+
+
+def test_mudanca_apos_operacao():
+    nome = abrir_conta()["conta"]
+    recebidas = []
+    cancelar = assinar_conta(nome, recebidas.append)
+    depositar(100.0, nome)
+    sacar(30.0, nome)
+    assert [m.saldo for m in recebidas] == [100.0, 70.0]
+    assert recebidas[1].inicio == 1
+    assert recebidas[1].lancamentos == [{"op": "saque", "valor": 30.0, "saldo": 70.0}]
+
+    cancelar()
+    depositar(1.0, nome)
+    assert len(recebidas) == 2
+
+
+def test_transferencia_avisa_as_duas_contas():
+    origem, destino = abrir_conta()["conta"], abrir_conta()["conta"]
+    depositar(50.0, origem)
+    recebidas = []
+    assinar_conta(origem, recebidas.append)
+    assinar_conta(destino, recebidas.append)
+    transferir(20.0, destino, origem)
+    assert {(m.conta, m.saldo) for m in recebidas} == {(origem, 30.0), (destino, 20.0)}
+
+
+def test_limpeza_marca_mudanca():
+    nome = abrir_conta()["conta"]
+    depositar(5.0, nome)
+    recebidas = []
+    assinar_conta(nome, recebidas.append)
+    limpar(nome)
+    depositar(1.0, nome)
+    assert recebidas[0].limpo and recebidas[0].lancamentos == []
+    assert not recebidas[1].limpo and recebidas[1].inicio == 0
+
+
+def test_assinante_com_erro_nao_afeta_operacao():
+    nome = abrir_conta()["conta"]
+
+    def quebrado(mudanca):
+        raise RuntimeError("falhou")
+    assinar_conta(nome, quebrado)
+    assert depositar(10.0, nome)["novo_saldo"] == 10.0
+
+
+def test_telas_atualizam_ao_vivo():
+    from banco_textual.app import BancoApp, ExtratoScreen, SaldoScreen, TabelaExtrato
+    nome = abrir_conta()["conta"]
+    depositar(10.0, nome)
+
+    async def cenario():
+        app = BancoApp()
+        async with app.run_test() as pilot:
+            extrato = ExtratoScreen(nome)
+            await app.push_screen(extrato)
+            await esperar_workers(app, pilot)
+            tabela = extrato.query_one(TabelaExtrato)
+            assert tabela.row_count == 1
+
+            saldo = SaldoScreen(nome)
+            await app.push_screen(saldo)
+            await esperar_workers(app, pilot)
+            assert saldo.saldo == 10.0
+
+            # Operação feita fora da interface, em outra thread
+            outra = threading.Thread(target=depositar, args=(5.0, nome))
+            outra.start()
+            outra.join()
+            await pilot.pause()
+            assert saldo.saldo == 15.0
+            assert str(saldo.query_one("#saldo").render()) == "Saldo: R$ 15.00"
+            assert tabela.row_count == 2 and extrato.total == 2
+
+            app.pop_screen()
+            await pilot.pause()
+            depositar(1.0, nome)
+            await pilot.pause()
+            assert saldo.saldo == 15.0
+            assert tabela.row_count == 3
+
+    asyncio.run(cenario())
+
+
+def test_operacao_roda_em_worker():
+    from banco_textual.app import BancoApp, OperacaoScreen
+    nome = abrir_conta()["conta"]
+
+    async def cenario():
+        app = BancoApp()
+        async with app.run_test() as pilot:
+            tela = OperacaoScreen(nome, "saque")
+            await app.push_screen(tela)
+            tela.query_one("#valor").value = "50"
+            tela.query_one("#confirmar").press()
+            await esperar_workers(app, pilot)
+            # Saldo insuficiente: o erro volta como aviso e a tela continua
+            assert app.screen is tela
+            assert not tela.query_one("#confirmar").loading
+
+            tela.operacao = "deposito"
+            tela.query_one("#confirmar").press()
+            await esperar_workers(app, pilot)
+            assert app.screen is not tela
+
+    asyncio.run(cenario())
+    assert depositar(0.5, nome)["novo_saldo"] == 50.5
+
+
+def test_mudancas_chegam_na_ordem_das_gravacoes(banco, monkeypatch):
+    # A grava a v4 e solta a trava, mas demora a publicar; B grava e
+    # publica a v5 nesse meio tempo. A v4 sai antes, pela thread de B
+    from tsbanking import transacao
+    nome = abrir_conta()["conta"]
+    recebidas = []
+    assinar_conta(nome, lambda mudanca: recebidas.append(mudanca.saldo))
+    atrasar = threading.Event()
+    original = transacao.assinaturas.publicar
+
+    def publicar():
+        if threading.current_thread().name == "A":
+            atrasar.wait()
+        original()
+    monkeypatch.setattr(transacao.assinaturas, "publicar", publicar)
+
+    a = threading.Thread(target=depositar, args=(10.0, nome), name="A")
+    a.start()
+    while not banco.publicacoes:
+        pass
+    depositar(5.0, nome)
+    assert recebidas == [10.0, 15.0]
+    atrasar.set()
+    a.join()
+    assert recebidas == [10.0, 15.0]
+
+
+def test_callback_que_opera_nao_trava():
+    nome = abrir_conta()["conta"]
+    recebidas = []
+
+    def callback(mudanca):
+        recebidas.append(mudanca.saldo)
+        if mudanca.saldo == 10.0:
+            depositar(1.0, nome)
+    assinar_conta(nome, callback)
+    depositar(10.0, nome)
+    assert recebidas == [10.0, 11.0]
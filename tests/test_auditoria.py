@@ -0,0 +1,150 @@
+from datetime import datetime
+
+import pytest
+
+from tsbanking import database
+from tsbanking.auditoria import reconciliar
+from tsbanking.database import get_conta, reconstruir_projecoes
+from tsbanking.registros import dias_auditados
+from tsbanking.services import abrir_conta, depositar, sacar, transferir
+
+
+@pytest.fixture
+def dias(monkeypatch):
+    # Relógio do log controlado pelo teste
+    agora = [datetime(2024, 3, 1, 10, 0).timestamp()]
+    monkeypatch.setattr(database, "_relogio", lambda: agora[0])
+
+    def ir_para(dia, hora=10):
+        agora[0] = datetime(2024, 3, dia, hora, 0).timestamp()
+    return ir_para
+
+
+def da_conta(resultado, conta):
+    return [d for d in resultado["divergencias"] if d["conta"] == conta]
+
+
+def movimentar(dias):
+    conta = abrir_conta()["conta"]
+    outra = abrir_conta()["conta"]
+    depositar(100.0, conta)
+    dias(2)
+    sacar(30.0, conta)
+    transferir(20.0, outra, conta)
+    dias(3)
+    depositar(5.5, conta)
+    return conta, outra
+
+
+def test_trilha_por_dia(dias):
+    conta, outra = movimentar(dias)
+    auditados = dias_auditados(get_conta(conta).trilha, get_conta(conta).saldo)
+    # Conta aberta vazia: o primeiro dia só tem o depósito
+    assert [d.folhas for d in auditados] == [1, 2, 1]
+    assert [d.saldo_final for d in auditados] == [100.0, 50.0, 55.5]
+    # Cada dia continua a cadeia do anterior
+    for anterior, dia in zip(auditados, auditados[1:]):
+        assert dia.cabeca_inicial == anterior.cabeca
+    # Conta vazia não tem trilha; com um só evento, só o primeiro elo
+    nova = abrir_conta()["conta"]
+    assert get_conta(nova).trilha is None
+    depositar(1.0, nova)
+    assert isinstance(get_conta(nova).trilha, bytes)
+
+
+def test_reconstrucao_refaz_a_mesma_trilha(dias):
+    conta, _ = movimentar(dias)
+    antes = dias_auditados(get_conta(conta).trilha, get_conta(conta).saldo)
+    reconstruir_projecoes()
+    assert dias_auditados(get_conta(conta).trilha, get_conta(conta).saldo) == antes
+
+
+def test_reconciliacao_incremental(dias):
+    conta, outra = movimentar(dias)
+    primeira = reconciliar(completa=True)
+    assert da_conta(primeira, conta) == []
+
+    # Nada mudou: todos os dias das duas contas são pulados
+    segunda = reconciliar()
+    assert segunda["dias_conferidos"] == 0
+
+    # Só o dia corrente da conta movimentada volta a ser conferido
+    depositar(1.0, conta)
+    terceira = reconciliar()
+    assert terceira["dias_conferidos"] == 1
+    assert da_conta(terceira, conta) == []
+
+
+def test_aponta_lancamento_divergente(dias):
+    conta, _ = movimentar(dias)
+    reconciliar()
+    registro = get_conta(conta)
+    saldos = registro.extrato.quente.saldos
+    original = saldos[1]
+    saldos[1] = 999.0
+    try:
+        # O dia adulterado não mudou de raiz: só a conferência completa vê
+        assert da_conta(reconciliar(), conta) == []
+        divergencias = da_conta(reconciliar(completa=True), conta)
+    finally:
+        saldos[1] = original
+    assert [(d["motivo"], d["dia"], d["esperado"], d["encontrado"])
+            for d in divergencias] == [("extrato", "2024-03-02", 70.0, 999.0)]
+    assert divergencias[0]["seq"] == registro.extrato.quente.seqs[1]
+
+
+def test_aponta_saldo_e_evento_adulterados(dias):
+    conta, _ = movimentar(dias)
+    registro = get_conta(conta)
+    registro.saldo += 1.0
+    try:
+        divergencias = da_conta(reconciliar(), conta)
+    finally:
+        registro.saldo -= 1.0
+    assert [(d["motivo"], d["dia"]) for d in divergencias] == [
+        ("saldo_do_dia", "2024-03-03")]
+
+    eventos = database._db["eventos"]
+    i = next(i for i, e in enumerate(eventos)
+             if e.conta == conta and e.op == "saque")
+    original = eventos[i]
+    eventos[i] = original._replace(valor=10.0)
+    try:
+        motivos = {d["motivo"] for d in da_conta(reconciliar(completa=True), conta)}
+    finally:
+        eventos[i] = original
+    assert motivos == {"extrato", "raiz", "cadeia", "saldo_do_dia"}
+
+
+def test_processos_dao_o_mesmo_resultado(dias):
+    conta, outra = movimentar(dias)
+    saldos = get_conta(outra).extrato.quente.saldos
+    original = saldos[0]
+    saldos[0] = -1.0
+    try:
+        um = da_conta(reconciliar(processos=1, completa=True), outra)
+        dois = da_conta(reconciliar(processos=2, completa=True), outra)
+    finally:
+        saldos[0] = original
+    assert um == dois
+    assert [d["motivo"] for d in um] == ["extrato"]
+
+
+def test_acha_eventos_fora_de_ordem_no_log(dias):
+    # Escritas concorrentes de contas diferentes podem trocar a ordem do log
+    conta, outra = movimentar(dias)
+    eventos = database._db["eventos"]
+    eventos[-2], eventos[-4] = eventos[-4], eventos[-2]
+    try:
+        assert da_conta(reconciliar(completa=True), conta) == []
+        assert da_conta(reconciliar(completa=True), outra) == []
+    finally:
+        eventos[-2], eventos[-4] = eventos[-4], eventos[-2]
+
+    i = next(i for i, e in enumerate(eventos) if e.conta == conta and e.op == "saque")
+    removido = eventos.pop(i)
+    try:
+        motivos = {d["motivo"] for d in da_conta(reconciliar(completa=True), conta)}
+    finally:
+        eventos.insert(i, removido)
+    assert "raiz" in motivos
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking.banco import banco_atual, criar_banco, remover_banco
+from tsbanking.main import app
+from tsbanking.services import (
+    abrir_conta, consultar_saldo, depositar, transferir
+)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def filiais():
+    a = criar_banco("filial-a")
+    b = criar_banco("filial-b", contas=(("principal", 50.0),))
+    yield a, b
+    remover_banco("filial-a")
+    remover_banco("filial-b")
+
+
+def test_bancos_nao_dividem_estado(banco):
+    outro = criar_banco()
+    with outro.ativo():
+        assert banco_atual() is outro
+        conta = abrir_conta()["conta"]
+        depositar(10.0, conta)
+        transferir(100.0, "destino", "principal")
+        assert consultar_saldo("principal") == 900.0
+    assert banco_atual() is banco
+    assert consultar_saldo("principal") == 1000.0
+    assert conta not in banco.dados["contas"]
+    assert len(outro.dados["eventos"]) == len(banco.dados["eventos"]) + 3
+    assert conta in outro.dados["aberturas"]
+
+
+def test_threads_em_bancos_diferentes():
+    bancos = [criar_banco() for _ in range(4)]
+    erros = []
+
+    def movimentar(banco):
+        try:
+            with banco.ativo():
+                for _ in range(200):
+                    transferir(1.0, "destino", "principal")
+        except Exception as erro:
+            erros.append(erro)
+
+    threads = [threading.Thread(target=movimentar, args=(b,)) for b in bancos]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert erros == []
+    for banco in bancos:
+        with banco.ativo():
+            assert consultar_saldo("principal") == 800.0
+            assert consultar_saldo("destino") == 700.0
+
+
+def test_agenda_executa_no_banco_dela(banco):
+    outro = criar_banco()
+    with outro.ativo():
+        agenda = banco_atual().agenda
+        agenda.agendar("principal", "destino", 30.0, 0.0)
+    assert agenda is not banco.agenda
+    # Executada de fora (como na thread da agenda), debita o banco certo
+    agenda.executar_vencidos(1.0)
+    with outro.ativo():
+        assert consultar_saldo("principal") == 970.0
+    assert consultar_saldo("principal") == 1000.0
+
+
+def test_cabecalho_escolhe_o_banco(client, filiais):
+    a, b = filiais
+    resposta = client.post("/transferir", headers={"X-Banco": "filial-a"},
+                           json={"valor": 25.0, "conta_destino": "destino",
+                                 "tipo_transferencia": "PIX"})
+    assert resposta.status_code == 200
+    assert client.get("/saldo", headers={"X-Banco": "filial-a"}).json() == {
+        "saldo": 975.0}
+    assert client.get("/saldo", headers={"X-Banco": "filial-b"}).json() == {
+        "saldo": 50.0}
+    assert client.get("/saldo").json() == {"saldo": 1000.0}
+    assert client.get("/contas/destino",
+                      headers={"X-Banco": "filial-b"}).status_code == 404
+
+
+def test_banco_desconhecido(client):
+    resposta = client.get("/saldo", headers={"X-Banco": "nenhum"})
+    assert resposta.status_code == 404
+    assert resposta.json() == {"detail": "Banco 'nenhum' não encontrado"}
+
+
+def test_nome_repetido(filiais):
+    with pytest.raises(KeyError):
+        criar_banco("filial-a")
@@ -0,0 +1,108 @@
+import itertools
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking.caixas import compor, registrar_caixa
+from tsbanking.erros import NotasIndisponiveis
+from tsbanking.main import app
+from tsbanking.services import (
+    abrir_conta, consultar_caixa, depositar, saque_caixa, caixas_com_estoque_baixo
+)
+
+
+def minimo_por_forca_bruta(valor, estoque):
+    melhor = None
+    faixas = [range(quantidade + 1) for _, quantidade in estoque]
+    for escolha in itertools.product(*faixas):
+        if sum(k * nota for k, (nota, _) in zip(escolha, estoque)) == valor:
+            if melhor is None or sum(escolha) < melhor:
+                melhor = sum(escolha)
+    return melhor
+
+
+def test_compor_usa_menos_notas():
+    estoque = ((200, 10), (100, 10), (50, 10), (20, 10), (10, 10))
+    assert compor(380, estoque) == ((200, 1), (100, 1), (50, 1), (20, 1), (10, 1))
+    # Sem notas de 10, 60 só sai com três de 20
+    assert compor(60, ((50, 5), (20, 5))) == ((20, 3),)
+    assert compor(30, ((50, 5), (20, 5))) is None
+
+
+def test_compor_respeita_estoque():
+    estoque = ((100, 1), (50, 1), (20, 10))
+    # A nota de 50 sobraria com resto ímpar: o ótimo é 100 + 5 x 20
+    assert compor(200, estoque) == ((100, 1), (20, 5))
+    for valor in range(10, 400, 10):
+        pequeno = ((100, 2), (50, 1), (20, 3), (10, 1))
+        notas = compor(valor, pequeno)
+        esperado = minimo_por_forca_bruta(valor, pequeno)
+        assert (notas is None) == (esperado is None)
+        if notas:
+            assert sum(n * q for n, q in notas) == valor
+            assert sum(q for _, q in notas) == esperado
+
+
+def test_saque_retira_notas_do_caixa():
+    nome = abrir_conta()["conta"]
+    depositar(1000.0, nome)
+    registrar_caixa("teste_estoque", {50: 2, 20: 5})
+    resposta = saque_caixa(160, "CAIXA_20", nome, caixa="teste_estoque")
+    assert resposta["notas"] == [{"nota": 50, "quantidade": 2}, {"nota": 20, "quantidade": 3}]
+    assert consultar_caixa("teste_estoque")["total"] == 40
+    with pytest.raises(NotasIndisponiveis):
+        saque_caixa(60, "CAIXA_20", nome, caixa="teste_estoque")
+    # Saque recusado não debita a conta
+    assert resposta["novo_saldo"] == 840.0
+    assert depositar(1.0, nome)["novo_saldo"] == 841.0
+
+
+def test_abastecimento_e_estoque_baixo():
+    client = TestClient(app)
+    registrar_caixa("teste_baixo", {100: 5}, minimo=10)
+    assert "teste_baixo" in [c["caixa"] for c in caixas_com_estoque_baixo()]
+    resposta = client.post("/caixas/teste_baixo/abastecer", json={"notas": {"100": 10}})
+    assert resposta.status_code == 200
+    assert resposta.json()["notas"] == [{"nota": 100, "quantidade": 15}]
+    assert resposta.json()["estoque_baixo"] == []
+    relatorio = client.get("/caixas/estoque_baixo").json()["caixas"]
+    assert "teste_baixo" not in [c["caixa"] for c in relatorio]
+    assert client.post("/caixas/teste_baixo/abastecer",
+                       json={"notas": {"3": 1}}).status_code == 400
+    assert client.get("/caixas/nao_existe").status_code == 404
+
+
+def test_falha_na_entrega_estorna_o_saque():
+    from tsbanking.caixas import configurar_dispensador
+    from tsbanking.erros import FalhaDispensa
+    from tsbanking.services import consultar_extrato_pagina
+
+    def travado(caixa, notas):
+        raise IOError("cassete travado")
+
+    nome = abrir_conta()["conta"]
+    depositar(500.0, nome)
+    registrar_caixa("teste_falha", {100: 3})
+    configurar_dispensador(travado)
+    try:
+        with pytest.raises(FalhaDispensa):
+            saque_caixa(200, "CAIXA_100", nome, caixa="teste_falha")
+    finally:
+        configurar_dispensador(None)
+    situacao = consultar_caixa("teste_falha")
+    assert situacao["total"] == 300 and situacao["reservado"] == 0
+    assert depositar(1.0, nome)["novo_saldo"] == 501.0
+    estorno = consultar_extrato_pagina(nome, tipo="estorno")["linhas"]
+    assert [linha["op"] for linha in estorno] == ["estorno_saque_caixa_100"]
+
+
+def test_simulacao_concorrente_fecha_as_contas():
+    from tsbanking.simulacao import simular
+    relatorio = simular(caixas=20, contas=50, saques=3000, threads=8,
+                        saldo_inicial=5000.0, notas_por_cassete=60,
+                        taxa_falha=0.05, semente=7)
+    resultados = relatorio["resultados"]
+    assert sum(resultados.values()) == 3000
+    assert resultados["ok"] and resultados["falha_dispensa"] and resultados["sem_notas"]
+    assert relatorio["reservado"] == 0
+    assert relatorio["valor_entregue"] == relatorio["valor_debitado"] == relatorio["valor_sacado"]
@@ -0,0 +1,75 @@
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+from tsbanking.main import app
+from tsbanking.database import Conta, criar_conta, get_conta
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_criar_conta_com_nome(client):
+    response = client.post("/contas", json={"conta": "poupador"})
+    assert response.status_code == 201
+    assert response.json()["conta"] == "poupador"
+    assert client.get("/saldo?conta=poupador").json()["saldo"] == 0.0
+
+
+def test_criar_conta_gera_id(client):
+    r1 = client.post("/contas", json={})
+    r2 = client.post("/contas", json={})
+    assert r1.status_code == 201 and r2.status_code == 201
+    assert r1.json()["conta"] != r2.json()["conta"]
+
+
+def test_criar_conta_duplicada(client):
+    client.post("/contas", json={"conta": "duplicada"})
+    response = client.post("/contas", json={"conta": "duplicada"})
+    assert response.status_code == 409
+
+
+def test_consultar_conta(client):
+    client.post("/contas", json={"conta": "consulta"})
+    client.post("/depositar", json={"valor": 75, "conta": "consulta"})
+    response = client.get("/contas/consulta")
+    assert response.status_code == 200
+    assert response.json() == {"conta": "consulta", "saldo": 75.0}
+    assert client.get("/contas/nao_existe").status_code == 404
+
+
+def test_encerrar_conta(client):
+    client.post("/contas", json={"conta": "encerrada"})
+    response = client.delete("/contas/encerrada")
+    assert response.status_code == 200
+    assert client.get("/saldo?conta=encerrada").status_code == 404
+    # O id continua reservado após o encerramento
+    assert client.post("/contas", json={"conta": "encerrada"}).status_code == 409
+
+
+def test_encerrar_conta_com_saldo(client):
+    client.post("/contas", json={"conta": "com_saldo"})
+    client.post("/depositar", json={"valor": 10, "conta": "com_saldo"})
+    response = client.delete("/contas/com_saldo")
+    assert response.status_code == 400
+    assert get_conta("com_saldo").saldo == 10
+
+
+def test_conta_sem_dict():
+    conta = Conta("x")
+    assert not hasattr(conta, "__dict__")
+    assert conta.extrato is None
+
+
+def test_memoria_por_conta_vazia():
+    quantidade = 20000
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    for _ in range(quantidade):
+        criar_conta()
+    depois = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Conta vazia não grava evento: 10M contas cabem em poucos GiB
+    assert (depois - antes) / quantidade < 256
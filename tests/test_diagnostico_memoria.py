@@ -0,0 +1,90 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking import memoria
+from tsbanking.main import app
+from tsbanking.memoria import Coletor, medir_banco
+from tsbanking.services import (
+    abrir_conta, aplicar_investimento, consultar_extrato, depositar, sacar
+)
+
+
+@pytest.fixture
+def habilitado(monkeypatch):
+    monkeypatch.setitem(memoria._config, "habilitado", True)
+    yield
+    memoria.parar_rastreio()
+
+
+def test_desabilitado_por_padrao():
+    client = TestClient(app)
+    assert client.get("/debug/memoria").status_code == 404
+    assert client.post("/debug/memoria/fotos").status_code == 404
+
+
+def test_medicao_por_estrutura(banco):
+    antes = medir_banco(banco)
+    conta = abrir_conta()["conta"]
+    for _ in range(100):
+        depositar(10.0, conta)
+    sacar(1.0, conta)
+    aplicar_investimento(100.0, "CDB", conta)
+    consultar_extrato(conta, tipo="saque")
+    depois = medir_banco(banco)
+    assert depois["contas"]["quantidade"] == antes["contas"]["quantidade"] + 1
+    assert (depois["extratos"]["linhas_em_memoria"]
+            - antes["extratos"]["linhas_em_memoria"]) == 102
+    assert depois["indices"]["entradas"] == antes["indices"]["entradas"] + 102
+    assert depois["indices"]["bytes"] > 0
+    assert depois["carteiras"]["posicoes"] == antes["carteiras"]["posicoes"] + 1
+    assert depois["eventos"]["quantidade"] == antes["eventos"]["quantidade"] + 102
+    # 100 linhas custam pelo menos as 5 colunas de 8 bytes
+    assert depois["extratos"]["bytes"] - antes["extratos"]["bytes"] >= 100 * 40
+
+
+def test_relatorio_vem_do_coletor(habilitado, monkeypatch):
+    coletor = Coletor(intervalo=3600)
+    monkeypatch.setattr(memoria, "coletor", coletor)
+    with TestClient(app) as client:
+        fim = time.time() + 5
+        while (resposta := client.get("/debug/memoria")).status_code == 202 \
+                and time.time() < fim:
+            time.sleep(0.01)
+        primeira = resposta.json()
+        assert primeira["banco"]["contas"]["quantidade"] == 2
+        assert "segmentos" in primeira["processo"]["caches"]
+
+        # Nova conta só aparece depois de uma coleta pedida
+        abrir_conta()
+        assert client.get("/debug/memoria").json() == primeira
+        assert client.post("/debug/memoria/coletar").status_code == 202
+        while client.get("/debug/memoria").json()["coletado_em"] == primeira["coletado_em"] \
+                and time.time() < fim:
+            time.sleep(0.01)
+        assert client.get("/debug/memoria").json()["banco"]["contas"]["quantidade"] == 3
+    assert coletor._thread is None
+
+
+def test_diferenca_entre_fotos(habilitado):
+    client = TestClient(app)
+    de = client.post("/debug/memoria/fotos").json()["foto"]
+    retidos = [bytearray(10_000) for _ in range(200)]  # alocação esperada
+    ate = client.post("/debug/memoria/fotos").json()["foto"]
+    resposta = client.get(f"/debug/memoria/fotos/{de}/diferenca",
+                          params={"ate": ate, "top": 5})
+    assert resposta.status_code == 200
+    maior = resposta.json()["locais"][0]
+    assert maior["local"][0].endswith("test_diagnostico_memoria.py:"
+                                      f"{test_diferenca_entre_fotos.__code__.co_firstlineno + 3}")
+    assert maior["diferenca_bytes"] >= 200 * 10_000
+    del retidos
+
+    # Sem ``ate``, compara com uma foto nova
+    assert client.get(f"/debug/memoria/fotos/{de}/diferenca").json()["ate"] == ate + 1
+    assert client.get("/debug/memoria/fotos/99/diferenca").status_code == 404
+    assert client.get(f"/debug/memoria/fotos/{de}/diferenca",
+                      params={"agrupar": "xyz"}).status_code == 400
+    assert client.delete("/debug/memoria/fotos").status_code == 200
+    assert not memoria._fotos
@@ -0,0 +1,131 @@
+import gzip
+import os
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking import diario as modulo
+from tsbanking.diario import Diario, iniciar_diario, parar_diario
+from tsbanking.main import app
+from tsbanking.services import abrir_conta, depositar, sacar, transferir
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    yield str(tmp_path / "auditoria.jsonl")
+    parar_diario()
+
+
+def _linhas(caminho):
+    with open(caminho, "rb") as arquivo:
+        return [json.loads(linha) for linha in arquivo]
+
+
+def test_uma_linha_por_operacao(caminho, banco):
+    iniciar_diario(caminho)
+    conta = abrir_conta()["conta"]
+    depositar(100.0, conta)
+    transferir(30.0, "principal", conta_origem=conta)
+    with pytest.raises(Exception):
+        sacar(1000.0, conta)
+    parar_diario()
+
+    linhas = _linhas(caminho)
+    assert [linha["operacao"] for linha in linhas] == [
+        "abrir_conta", "depositar", "transferir", "sacar"]
+    assert linhas[1]["parametros"] == {"valor": 100.0, "conta": conta}
+    assert linhas[2]["parametros"] == {"valor": 30.0, "conta_destino": "principal",
+                                       "conta_origem": conta}
+    assert linhas[2]["erro"] is None
+    assert linhas[3]["erro"] == "SaldoInsuficiente"
+    assert {linha["banco"] for linha in linhas} == {banco.nome}
+
+
+def test_sem_diario_nada_e_registrado(caminho):
+    depositar(1.0)
+    assert modulo.diario_ativo() is None
+
+
+def test_escreve_em_lotes_na_thread_do_diario(caminho):
+    diario = Diario(caminho, tamanho_lote=10, intervalo=3600)
+    for i in range(25):
+        diario.registrar(("op", ("i",)), (i,), {})
+    assert diario.escritos == 0 and len(diario.fila) == 25
+    diario.iniciar()
+    # A fila passou do lote: a thread acorda sem esperar o intervalo
+    diario._cheia.set()
+    diario.parar()
+    assert diario.escritos == 25
+    assert [linha["parametros"]["i"] for linha in _linhas(caminho)] == list(range(25))
+
+
+def test_descarta_com_fila_cheia(caminho):
+    diario = Diario(caminho, politica="descartar", limite=5)
+    for i in range(8):
+        diario.registrar(("op", ("i",)), (i,), {})
+    assert len(diario.fila) == 5 and diario.descartados == 3
+    diario.parar()
+    assert len(_linhas(caminho)) == 5
+
+
+def test_bloqueia_com_fila_cheia(caminho):
+    diario = Diario(caminho, limite=5, intervalo=3600)
+    diario.iniciar()
+    # Segura a escrita para a fila encher
+    porta = threading.Event()
+    original = diario.descarregar
+    diario.descarregar = lambda: porta.wait() and original()
+    for i in range(5):
+        diario.registrar(("op", ("i",)), (i,), {})
+    sexto = threading.Thread(target=diario.registrar, args=(("op", ("i",)), (5,), {}))
+    sexto.start()
+    sexto.join(0.1)
+    assert sexto.is_alive() and diario.bloqueios == 1
+    porta.set()
+    sexto.join(5)
+    assert not sexto.is_alive()
+    diario.parar()
+    assert diario.descartados == 0
+    assert [linha["parametros"]["i"] for linha in _linhas(caminho)] == list(range(6))
+
+
+@pytest.mark.parametrize("comprimir", [False, True])
+def test_rotacao(caminho, comprimir):
+    diario = Diario(caminho, tamanho_lote=10, tamanho_arquivo=500, arquivos=2,
+                    comprimir=comprimir)
+    for i in range(100):
+        diario.registrar(("op", ("i",)), (i,), {})
+        if i % 10 == 9:
+            diario.descarregar()
+    diario.parar()
+    sufixo = ".gz" if comprimir else ""
+    abrir = gzip.open if comprimir else open
+    assert diario.rotacoes > 2
+    with abrir(f"{caminho}.1{sufixo}", "rb") as arquivo:
+        recente = [json.loads(linha)["parametros"]["i"] for linha in arquivo]
+    with abrir(f"{caminho}.2{sufixo}", "rb") as arquivo:
+        anterior = [json.loads(linha)["parametros"]["i"] for linha in arquivo]
+    # Só os dois mais recentes ficam, em sequência
+    assert anterior[-1] + 1 == recente[0]
+    assert not os.path.exists(f"{caminho}.3{sufixo}")
+
+
+def test_politica_invalida(caminho):
+    with pytest.raises(ValueError):
+        Diario(caminho, politica="ignorar")
+
+
+def test_situacao_na_api(caminho, monkeypatch):
+    client = TestClient(app)
+    assert client.get("/auditoria/diario").status_code == 404
+    monkeypatch.setenv("TSBANKING_AUDITORIA", caminho)
+    monkeypatch.setenv("TSBANKING_AUDITORIA_POLITICA", "descartar")
+    with TestClient(app) as client:
+        assert client.post("/depositar", json={"valor": 10.0}).status_code == 200
+        situacao = client.get("/auditoria/diario").json()
+        assert situacao["politica"] == "descartar"
+        assert situacao["escritos"] + situacao["pendentes"] == 1
+    assert modulo.diario_ativo() is None
+    assert [linha["operacao"] for linha in _linhas(caminho)] == ["depositar"]
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking.erros import (
+    ContaJaExiste, ContaNaoEncontrada, ErroBancario, SaldoInsuficiente
+)
+from tsbanking.main import app
+from tsbanking.services import abrir_conta, consultar_saldo, sacar
+
+
+def test_servicos_lancam_erros_de_dominio():
+    with pytest.raises(ContaNaoEncontrada) as excinfo:
+        consultar_saldo("nao_existe")
+    assert excinfo.value.status_code == 404
+    nome = abrir_conta()["conta"]
+    with pytest.raises(SaldoInsuficiente):
+        sacar(10.0, nome)
+    with pytest.raises(ContaJaExiste):
+        abrir_conta(nome)
+    assert issubclass(ContaJaExiste, ErroBancario)
+
+
+def test_api_traduz_erros_de_dominio():
+    client = TestClient(app)
+    nome = abrir_conta()["conta"]
+    response = client.post("/sacar", json={"valor": 10, "conta": nome})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Saldo insuficiente"}
+    assert client.post("/contas", json={"conta": nome}).status_code == 409
+    assert client.get("/saldo?conta=nao_existe").status_code == 404
+
+
+def test_servicos_nao_carregam_fastapi():
+    codigo = "import sys, tsbanking.services; print('fastapi' in sys.modules)"
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True,
+                           text=True, check=True).stdout
+    assert saida.strip() == "False"
@@ -0,0 +1,78 @@
+import pytest
+from tsbanking import database
+from tsbanking.database import (
+    atualizar_saldo, limpar_extrato, get_saldo, get_extrato, get_eventos,
+    get_investimento, reconstruir_projecoes
+)
+from tsbanking.eventos import TRANSFERENCIA_ENVIADA, TRANSFERENCIA_RECEBIDA
+from tsbanking.services import (
+    depositar, transferir, aplicar_investimento, limpar, abrir_conta
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    atualizar_saldo(1000.0, "principal")
+    atualizar_saldo(500.0, "destino")
+    limpar_extrato("principal")
+    limpar_extrato("destino")
+
+
+def _estado():
+    return {
+        nome: (conta.saldo, conta.ativa, get_extrato(nome, completo=True)
+               if conta.ativa else None, get_extrato(nome) if conta.ativa else None,
+               {k: v["valor"] for k, v in (conta.carteira or {}).items()})
+        for nome, conta in database._db["contas"].items()
+    }
+
+
+def test_transferencia_gera_evento_por_conta():
+    transferir(200.0, "destino", "principal")
+    enviado, recebido = get_eventos()[-2:]
+    assert (enviado.conta, enviado.tipo, enviado.valor) == (
+        "principal", TRANSFERENCIA_ENVIADA, 200.0)
+    assert (recebido.conta, recebido.tipo) == ("destino", TRANSFERENCIA_RECEBIDA)
+    assert enviado.seq < recebido.seq
+    with pytest.raises(AttributeError):
+        enviado.valor = 1.0
+
+
+def test_limpar_so_esconde_extrato():
+    depositar(100.0, "principal")
+    limpar("principal")
+    assert get_extrato("principal") == []
+    completo = get_extrato("principal", completo=True)
+    assert completo[-1] == {"op": "deposito", "valor": 100.0, "saldo": 1100.0}
+
+
+def test_reconstrucao_sequencial_reproduz_projecoes():
+    abrir_conta("evento_seq")
+    depositar(300.0, "evento_seq")
+    transferir(50.0, "destino", "evento_seq")
+    aplicar_investimento(100.0, "CDB", "evento_seq")
+    limpar("destino")
+    antes = _estado()
+    reconstruir_projecoes()
+    assert _estado() == antes
+    assert get_saldo("evento_seq") == 150.0
+    assert get_investimento("CDB", "evento_seq")["valor"] == 100.0
+
+
+def test_reconstrucao_paralela_reproduz_projecoes():
+    for i in range(20):
+        abrir_conta(f"evento_par_{i}")
+        depositar(10.0 + i, f"evento_par_{i}")
+        transferir(5.0, "principal", f"evento_par_{i}")
+    antes = _estado()
+    reconstruir_projecoes(processos=2)
+    assert _estado() == antes
+
+
+def test_conta_vazia_nao_grava_evento_e_sobrevive_a_reconstrucao():
+    total = len(get_eventos())
+    abrir_conta("evento_vazia")
+    assert len(get_eventos()) == total
+    reconstruir_projecoes()
+    assert database.conta_existe("evento_vazia")
+    assert get_saldo("evento_vazia") == 0.0
@@ -0,0 +1,102 @@
+import csv
+import gzip
+import io
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from tsbanking.main import app
+from tsbanking.colunar import decodificar_blocos
+from tsbanking.exportacao import exportar, main
+from tsbanking.services import abrir_conta, depositar, sacar
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def contas(monkeypatch):
+    agora = {"momento": datetime(2024, 3, 1, 10, 0).timestamp()}
+    monkeypatch.setattr("tsbanking.database._relogio", lambda: agora["momento"])
+    a = abrir_conta()["conta"]
+    b = abrir_conta()["conta"]
+    for dia in range(1, 11):
+        agora["momento"] = datetime(2024, 3, dia, 10, 0).timestamp()
+        depositar(float(dia), a)
+        depositar(float(dia * 10), b)
+    agora["momento"] = datetime(2024, 3, 11, 10, 0).timestamp()
+    sacar(5.0, a)
+    return a, b
+
+
+def _linhas_csv(dados):
+    return list(csv.DictReader(io.StringIO(dados.decode())))
+
+
+def test_exporta_csv_em_blocos(contas):
+    a, _ = contas
+    saida = io.BytesIO()
+    exportar(saida, [a], "csv", tamanho_bloco=3)
+    linhas = _linhas_csv(saida.getvalue())
+    assert len(linhas) == 11
+    assert linhas[0]["op"] == "deposito" and float(linhas[0]["valor"]) == 1.0
+    assert linhas[-1]["op"] == "saque" and float(linhas[-1]["saldo"]) == 50.0
+
+
+def test_endpoint_csv_intervalo_varias_contas(contas, client):
+    a, b = contas
+    response = client.get(
+        f"/extrato/exportar?conta={a}&conta={b}&inicio=2024-03-03&fim=2024-03-04")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    linhas = _linhas_csv(response.content)
+    assert [(l["conta"], float(l["valor"])) for l in linhas] == [
+        (a, 3.0), (a, 4.0), (b, 30.0), (b, 40.0)]
+
+
+def test_endpoint_csv_gz(contas, client):
+    a, _ = contas
+    comprimido = client.get(f"/extrato/exportar?conta={a}&formato=csv.gz").content
+    simples = client.get(f"/extrato/exportar?conta={a}&formato=csv").content
+    assert gzip.decompress(comprimido) == simples
+
+
+def test_colunar_ida_e_volta(contas):
+    a, b = contas
+    saida = io.BytesIO()
+    exportar(saida, [a, b], "colunar", tamanho_bloco=4)
+    blocos = list(decodificar_blocos(saida.getvalue()))
+    assert [bloco.conta for bloco in blocos] == [a] * 3 + [b] * 3
+    valores = [v for bloco in blocos if bloco.conta == b for v in bloco.valores]
+    assert valores == [float(d * 10) for d in range(1, 11)]
+    assert blocos[0].ops[0] == "deposito"
+
+
+def test_formato_invalido(client):
+    response = client.get("/extrato/exportar?formato=xlsx")
+    assert response.status_code == 400
+
+
+def test_conta_inexistente(client):
+    response = client.get("/extrato/exportar?conta=nao_existe")
+    assert response.status_code == 404
+
+
+def test_cli(contas, tmp_path):
+    a, _ = contas
+    arquivo = tmp_path / "extrato.csv"
+    main(["--conta", a, "--inicio", "2024-03-10", "--saida", str(arquivo)])
+    linhas = _linhas_csv(arquivo.read_bytes())
+    assert [l["op"] for l in linhas] == ["deposito", "saque"]
+
+
+def test_parquet(contas):
+    pq = pytest.importorskip("pyarrow.parquet")
+    a, _ = contas
+    saida = io.BytesIO()
+    exportar(saida, [a], "parquet", tamanho_bloco=4)
+    tabela = pq.read_table(io.BytesIO(saida.getvalue()))
+    assert tabela.num_rows == 11
+    assert tabela.column("saldo").to_pylist()[-1] == 50.0
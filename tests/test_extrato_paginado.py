@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from tests.conftest import esperar_workers
+from tsbanking.banco import criar_banco, trocar_padrao
+from tsbanking.main import app
+from tsbanking.services import (
+    abrir_conta, depositar, sacar, transferir, limpar, consultar_extrato_pagina
+)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def banco_do_modulo():
+    # A conta com 3000 lançamentos é montada uma vez para o módulo todo
+    return criar_banco()
+
+
+@pytest.fixture(autouse=True)
+def banco(banco_do_modulo):
+    anterior = trocar_padrao(banco_do_modulo)
+    try:
+        yield banco_do_modulo
+    finally:
+        trocar_padrao(anterior)
+
+
+@pytest.fixture(scope="module")
+def conta(banco_do_modulo):
+    with banco_do_modulo.ativo():
+        nome = abrir_conta()["conta"]
+        for i in range(1, 3001):
+            depositar(10.0, nome)
+            if i % 100 == 0:
+                sacar(1.0, nome)
+        transferir(5.0, "destino", nome)
+    return nome
+
+
+def test_pagina_sem_filtro(conta):
+    pagina = consultar_extrato_pagina(conta, 0, 50)
+    assert pagina["total"] == 3031
+    assert len(pagina["linhas"]) == 50
+    assert pagina["proximo"] == 50
+    ultima = consultar_extrato_pagina(conta, 3000, 50)
+    assert [linha["indice"] for linha in ultima["linhas"]] == list(range(3000, 3031))
+    assert ultima["proximo"] is None
+
+
+def test_pagina_filtrada_por_tipo(conta):
+    pagina = consultar_extrato_pagina(conta, 0, 20, tipo="saque")
+    assert len(pagina["linhas"]) == 20
+    assert all(linha["op"] == "saque" for linha in pagina["linhas"])
+    seguinte = consultar_extrato_pagina(conta, pagina["proximo"], 20, tipo="saque")
+    assert len(seguinte["linhas"]) == 10 and seguinte["proximo"] is None
+
+
+def test_busca_limita_varredura(conta):
+    pagina = consultar_extrato_pagina(conta, 0, 10, busca="TRANSFERENCIA",
+                                      max_varredura=1000)
+    assert pagina["linhas"] == [] and pagina["proximo"] == 1000
+    pagina = consultar_extrato_pagina(conta, 0, 10, busca="transferencia")
+    assert [linha["op"] for linha in pagina["linhas"]] == ["transferencia para destino"]
+
+
+def test_endpoint_paginado(conta, client):
+    response = client.get(f"/extrato/pagina?conta={conta}&inicio=10&limite=5&tipo=deposito")
+    assert response.status_code == 200
+    assert [linha["indice"] for linha in response.json()["linhas"]] == [10, 11, 12, 13, 14]
+    assert client.get(f"/extrato/pagina?conta={conta}&tipo=xyz").status_code == 400
+
+
+def test_pagina_respeita_limpeza():
+    nome = abrir_conta()["conta"]
+    depositar(1.0, nome)
+    limpar(nome)
+    depositar(2.0, nome)
+    pagina = consultar_extrato_pagina(nome)
+    assert pagina["total"] == 1
+    assert pagina["linhas"] == [{"indice": 0, "op": "deposito", "valor": 2.0, "saldo": 3.0}]
+
+
+def test_tela_extrato_carrega_sob_demanda(conta):
+    from banco_textual.app import BancoApp, ExtratoScreen, TabelaExtrato
+
+    async def cenario():
+        app = BancoApp()
+        async with app.run_test() as pilot:
+            tela = ExtratoScreen(conta)
+            await app.push_screen(tela)
+            await esperar_workers(app, pilot)
+            tabela = tela.query_one(TabelaExtrato)
+            assert tabela.row_count == ExtratoScreen.TAMANHO_PAGINA
+            tabela.move_cursor(row=tabela.row_count - 1)
+            await pilot.pause()
+            await esperar_workers(app, pilot)
+            assert tabela.row_count == 2 * ExtratoScreen.TAMANHO_PAGINA
+
+            tela.query_one("#tipo").value = "transferencia_enviada"
+            await pilot.pause()
+            await esperar_workers(app, pilot)
+            assert tabela.row_count == 1
+
+    asyncio.run(cenario())
@@ -0,0 +1,151 @@
+import json
+
+import pytest
+
+from tsbanking.erros import ContaNaoEncontrada, OperacaoInvalida, SaldoInsuficiente
+from tsbanking.fragmentos import Roteador, fragmento_da_conta
+
+
+@pytest.fixture(scope="module")
+def roteador(tmp_path_factory):
+    roteador = Roteador(fragmentos=2, diario=str(tmp_path_factory.mktemp("2pc") / "decisoes"))
+    yield roteador
+    roteador.fechar()
+
+
+def _contas(roteador, fragmento, saldo=100.0):
+    # Uma conta nova com saldo no fragmento pedido
+    while True:
+        conta = roteador.abrir_conta()["conta"]
+        if fragmento_da_conta(conta, 2) == fragmento:
+            if saldo:
+                roteador.depositar(saldo, conta)
+            return conta
+
+
+def _falhar_uma_vez(fragmento, monkeypatch, operacao):
+    original = fragmento.chamar
+
+    def chamar(op, *args, **kwargs):
+        if op == operacao:
+            monkeypatch.setattr(fragmento, "chamar", original)
+            raise ConnectionError("fragmento fora do ar")
+        return original(op, *args, **kwargs)
+    monkeypatch.setattr(fragmento, "chamar", chamar)
+
+
+def test_hash_estavel_e_espalhado():
+    assert fragmento_da_conta("principal", 4) == fragmento_da_conta("principal", 4)
+    assert {fragmento_da_conta(str(i), 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_cada_conta_vive_so_no_seu_fragmento(roteador):
+    for conta in ("principal", "destino"):
+        dono = roteador.fragmento(conta)
+        assert dono.chamar("conta_existe", conta)
+        outros = [f for f in roteador.fragmentos if f is not dono]
+        assert not any(f.chamar("conta_existe", conta) for f in outros)
+    assert roteador.consultar_saldo("principal") == 1000.0
+
+    contas = [roteador.abrir_conta()["conta"] for _ in range(10)]
+    assert len(set(contas)) == 10
+    assert {fragmento_da_conta(conta, 2) for conta in contas} == {0, 1}
+
+
+def test_operacoes_de_uma_conta(roteador):
+    conta = _contas(roteador, 1)
+    roteador.sacar(30.0, conta)
+    roteador.aplicar_investimento(20.0, "CDB", conta)
+    assert roteador.consultar_saldo(conta) == 50.0
+    pagina = roteador.consultar_extrato_pagina(conta, tipo="saque")
+    assert [linha["op"] for linha in pagina["linhas"]] == ["saque"]
+    with pytest.raises(SaldoInsuficiente):
+        roteador.sacar(1000.0, conta)
+    with pytest.raises(ContaNaoEncontrada):
+        roteador.consultar_saldo("nao_existe")
+
+
+def test_transferencia_no_mesmo_fragmento(roteador):
+    origem, destino = _contas(roteador, 0), _contas(roteador, 0)
+    roteador.transferir(40.0, destino, origem)
+    assert roteador.consultar_saldo(origem) == 60.0
+    assert roteador.consultar_saldo(destino) == 140.0
+
+
+def test_transferencia_entre_fragmentos(roteador):
+    origem, destino = _contas(roteador, 0), _contas(roteador, 1)
+    resultado = roteador.transferir(40.0, destino, origem)
+    assert resultado["mensagem"] == f"Transferido R$ 40.00 para {destino}"
+    assert roteador.consultar_saldo(origem) == 60.0
+    assert roteador.consultar_saldo(destino) == 140.0
+    assert [l["op"] for l in roteador.consultar_extrato(destino)][-1] == \
+        f"transferencia de {origem}"
+    assert [l["op"] for l in roteador.consultar_extrato(origem, contraparte=destino)] == \
+        [f"transferencia para {destino}"]
+    assert all(not f.chamar("em_duvida") for f in roteador.fragmentos)
+    assert not roteador.decisoes
+
+
+def test_falha_antes_de_preparar_nao_deixa_rastro(roteador):
+    origem, destino = _contas(roteador, 0), _contas(roteador, 1)
+    with pytest.raises(SaldoInsuficiente):
+        roteador.transferir(500.0, destino, origem)
+    with pytest.raises(ContaNaoEncontrada):
+        roteador.transferir(10.0, "nao_existe_" + destino, origem)
+    assert roteador.consultar_saldo(origem) == 100.0
+    assert roteador.consultar_saldo(destino) == 100.0
+    assert all(not f.chamar("em_duvida") for f in roteador.fragmentos)
+
+
+def test_em_duvida_depois_da_decisao_e_confirmada(roteador, monkeypatch):
+    origem, destino = _contas(roteador, 0), _contas(roteador, 1)
+    _falhar_uma_vez(roteador.fragmento(destino), monkeypatch, "confirmar")
+    with pytest.raises(ConnectionError):
+        roteador.transferir(25.0, destino, origem)
+    # Debitada na origem, ainda não creditada no destino
+    assert roteador.consultar_saldo(origem) == 75.0
+    assert roteador.consultar_saldo(destino) == 100.0
+    with pytest.raises(OperacaoInvalida):
+        roteador.encerrar_conta(destino)
+
+    assert roteador.recuperar() == 2
+    assert roteador.consultar_saldo(destino) == 125.0
+    assert roteador.consultar_saldo(origem) == 75.0
+    assert not roteador.decisoes
+    assert roteador.recuperar() == 0
+
+
+def test_em_duvida_sem_decisao_e_abortada(roteador, monkeypatch):
+    origem, destino = _contas(roteador, 0), _contas(roteador, 1)
+    original = roteador._anotar
+
+    def anotar(acao, id):
+        if acao == "confirmar":
+            raise OSError("disco cheio")
+        original(acao, id)
+    monkeypatch.setattr(roteador, "_anotar", anotar)
+    with pytest.raises(OSError):
+        roteador.transferir(25.0, destino, origem)
+    monkeypatch.undo()
+
+    assert roteador.consultar_saldo(origem) == 75.0
+    assert roteador.recuperar() == 2
+    assert roteador.consultar_saldo(origem) == 100.0
+    assert roteador.consultar_saldo(destino) == 100.0
+    assert roteador.consultar_extrato(origem)[-1]["op"] == \
+        f"estorno_transferencia para {destino}"
+
+
+def test_decisoes_pendentes_sao_relidas(tmp_path):
+    caminho = tmp_path / "decisoes"
+    caminho.write_text("".join(json.dumps(linha) + "\n" for linha in [
+        ["confirmar", "a"], ["confirmar", "b"], ["concluida", "a"]]))
+    roteador = Roteador(fragmentos=1, diario=str(caminho))
+    try:
+        assert roteador.decisoes == {"b": "confirmar"}
+        # Nenhum fragmento tem "b" preparada: só falta anotar a conclusão
+        assert roteador.recuperar() == 0
+        assert not roteador.decisoes
+    finally:
+        roteador.fechar()
+    assert json.loads(caminho.read_text().splitlines()[-1]) == ["concluida", "b"]
@@ -0,0 +1,94 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from tsbanking.main import app
+from tsbanking.services import abrir_conta, depositar, sacar, limpar
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = {"momento": datetime(2024, 1, 1, 10, 0).timestamp()}
+    monkeypatch.setattr("tsbanking.database._relogio", lambda: agora["momento"])
+
+    def avancar_para(*data):
+        agora["momento"] = datetime(*data).timestamp()
+    return avancar_para
+
+
+@pytest.fixture
+def conta(relogio):
+    nome = abrir_conta()["conta"]
+    depositar(100.0, nome)            # 01/01: 100
+    relogio(2024, 1, 1, 15, 0)
+    sacar(30.0, nome)                 # 01/01: 70 (fecha o dia)
+    relogio(2024, 1, 3, 9, 0)
+    depositar(500.0, nome)            # 03/01: 570
+    relogio(2024, 1, 3, 12, 0)
+    sacar(550.0, nome)                # 03/01: 20
+    relogio(2024, 1, 5, 8, 0)
+    depositar(80.0, nome)             # 05/01: 100
+    return nome
+
+
+def test_extrato_traz_saldo_corrente(conta, client):
+    linhas = client.get(f"/extrato?conta={conta}").json()["extrato"]
+    assert [linha["saldo"] for linha in linhas] == [100.0, 70.0, 570.0, 20.0, 100.0]
+
+
+def test_saldo_em_data(conta, client):
+    def saldo_em(dia):
+        return client.get(f"/saldo?conta={conta}&em={dia}").json()["saldo"]
+    assert saldo_em("2023-12-31") == 0.0
+    assert saldo_em("2024-01-01") == 70.0
+    assert saldo_em("2024-01-02") == 70.0
+    assert saldo_em("2024-01-04") == 20.0
+    assert saldo_em("2024-02-01") == 100.0
+
+
+def test_saldo_em_data_apos_limpar(conta, client):
+    limpar(conta)
+    response = client.get(f"/saldo?conta={conta}&em=2024-01-03")
+    assert response.json() == {"saldo": 20.0, "em": "2024-01-03"}
+
+
+def test_historico_min_max(conta, client):
+    response = client.get(
+        f"/saldo/historico?conta={conta}&inicio=2024-01-02&fim=2024-01-04")
+    assert response.status_code == 200
+    corpo = response.json()
+    # 02/01 herda o fechamento de 01/01 (70); 03/01 chegou a 570 e a 20
+    assert corpo["minimo"] == 20.0
+    assert corpo["maximo"] == 570.0
+    assert corpo["fechamentos"] == [{"data": "2024-01-03", "saldo": 20.0}]
+
+
+def test_historico_dia_corrente(conta, client):
+    corpo = client.get(
+        f"/saldo/historico?conta={conta}&inicio=2024-01-05&fim=2024-01-31").json()
+    assert (corpo["minimo"], corpo["maximo"]) == (20.0, 100.0)
+
+
+def test_historico_muitos_dias():
+    from tsbanking.registros import IndiceSaldos
+    indice = IndiceSaldos()
+    saldo = 0.0
+    for dia in range(1, 400):
+        momento = datetime.fromordinal(date(2023, 1, 1).toordinal() + dia).timestamp()
+        novo = float(dia % 37)
+        indice.registrar(momento, saldo, novo)
+        saldo = novo
+    assert indice.extremos(date(2023, 2, 1), date(2023, 2, 20)) == (0.0, 36.0)
+    # 28/02 fecha em 21; de 01/03 a 05/03 o saldo vai de 22 a 26
+    assert indice.extremos(date(2023, 3, 1), date(2023, 3, 5)) == (21.0, 26.0)
+    assert indice.saldo_em(date(2023, 1, 5)) == 4.0
+
+
+def test_historico_periodo_invertido(client):
+    response = client.get("/saldo/historico?inicio=2024-02-01&fim=2024-01-01")
+    assert response.status_code == 400
@@ -0,0 +1,140 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking import indices
+from tsbanking.compactacao import Compactador
+from tsbanking.database import get_conta, registrar_operacao
+from tsbanking.eventos import codigo_operacao, contraparte_operacao
+from tsbanking.indices import ValoresOrdenados
+from tsbanking.main import app
+from tsbanking.services import (
+    abrir_conta, consultar_extrato, consultar_extrato_pagina, depositar, limpar,
+    sacar, transferir
+)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def movimentar(n, semente=7):
+    aleatorio = random.Random(semente)
+    conta = abrir_conta()["conta"]
+    outras = [abrir_conta()["conta"] for _ in range(3)]
+    for nome in [conta] + outras:
+        depositar(1_000_000.0, nome)
+    for _ in range(n):
+        valor = float(aleatorio.choice([10, 50, 100, 5_000, 7_500]))
+        escolha = aleatorio.random()
+        if escolha < 0.3:
+            depositar(valor, conta)
+        elif escolha < 0.5:
+            sacar(valor, conta)
+        elif escolha < 0.8:
+            transferir(valor, aleatorio.choice(outras), conta)
+        else:
+            transferir(valor, conta, aleatorio.choice(outras))
+    return conta, outras
+
+
+def varrer(conta, tipo=None, contraparte=None, minimo=None, maximo=None):
+    return [linha for linha in consultar_extrato(conta)
+            if (tipo is None or codigo_operacao(linha["op"]) == tipo)
+            and (contraparte is None or contraparte_operacao(linha["op"]) == contraparte)
+            and (minimo is None or linha["valor"] >= minimo)
+            and (maximo is None or linha["valor"] <= maximo)]
+
+
+def test_valores_ordenados(monkeypatch):
+    monkeypatch.setattr(indices, "CARGA", 4)
+    aleatorio = random.Random(3)
+    valores = [float(aleatorio.randint(0, 50)) for _ in range(500)]
+    ordenados = ValoresOrdenados()
+    for posicao, valor in enumerate(valores):
+        ordenados.inserir(valor, posicao)
+    assert len(ordenados) == 500 and len(ordenados.valores) > 50
+    assert [valores[p] for p in ordenados.entre()] == sorted(valores)
+    for minimo, maximo in [(10, 20), (None, 5), (45, None), (20.5, 20.7), (60, 70)]:
+        esperado = sorted(p for p, v in enumerate(valores)
+                          if (minimo is None or v >= minimo)
+                          and (maximo is None or v <= maximo))
+        assert sorted(ordenados.entre(minimo, maximo)) == esperado
+
+
+@pytest.mark.parametrize("filtros", [
+    {"tipo": "saque"},
+    {"tipo": "transferencia_enviada", "minimo": 5_000.0},
+    {"contraparte": "2"},
+    {"contraparte": "3", "tipo": "transferencia_recebida", "maximo": 100.0},
+    {"minimo": 50.0, "maximo": 5_000.0},
+    {"tipo": "estorno"},
+])
+def test_indices_dao_o_mesmo_que_varrer(filtros):
+    conta, _ = movimentar(400)
+    nomes = {"minimo": "valor_min", "maximo": "valor_max"}
+    assert consultar_extrato(conta, **{nomes.get(k, k): v for k, v in filtros.items()}) \
+        == varrer(conta, **filtros)
+
+
+def test_indice_acompanha_operacoes_novas():
+    conta, outras = movimentar(50)
+    consultar_extrato(conta, tipo="saque")
+    assert get_conta(conta).extrato.indice is not None
+    sacar(3.0, conta)
+    transferir(6_000.0, outras[0], conta)
+    registrar_operacao("saque_caixa_20", 40.0, conta)
+    limpar(conta)
+    sacar(4.0, conta)
+    assert consultar_extrato(conta, tipo="saque") == [
+        {"op": "saque", "valor": 4.0, "saldo": get_conta(conta).saldo}]
+    depositar(1.0, conta)
+    antes = len(consultar_extrato(conta))
+    assert [linha["valor"] for linha in consultar_extrato(conta, valor_max=1.0)] == [1.0]
+    assert len(consultar_extrato(conta)) == antes
+
+
+def test_indice_montado_com_linhas_em_segmentos():
+    conta, _ = movimentar(100)
+    Compactador(linhas_quentes=10, minimo_segmento=8,
+                idade_maxima=float("inf")).compactar_conta(get_conta(conta))
+    assert get_conta(conta).extrato.segmentos
+    assert consultar_extrato(conta, tipo="deposito", valor_min=50.0) == varrer(
+        conta, tipo="deposito", minimo=50.0)
+
+
+def test_pagina_indexada():
+    conta, _ = movimentar(300)
+    esperado = [i for i, linha in enumerate(consultar_extrato(conta))
+                if codigo_operacao(linha["op"]) == "transferencia_enviada"
+                and linha["valor"] >= 5_000]
+    vistas, inicio = [], 0
+    while inicio is not None:
+        pagina = consultar_extrato_pagina(conta, inicio, 7, tipo="transferencia_enviada",
+                                          valor_min=5_000.0)
+        vistas += [linha["indice"] for linha in pagina["linhas"]]
+        inicio = pagina["proximo"]
+    assert vistas == esperado
+    # Busca por texto conferida só nas linhas apontadas pelo índice
+    pagina = consultar_extrato_pagina(conta, 0, 100, busca="para 2",
+                                      tipo="transferencia_enviada")
+    assert {linha["op"] for linha in pagina["linhas"]} == {"transferencia para 2"}
+
+
+def test_endpoint_filtrado(client):
+    conta, outras = movimentar(0)
+    transferir(7_500.0, outras[0], conta)
+    transferir(10.0, outras[0], conta)
+    transferir(9_000.0, outras[1], conta)
+    resposta = client.get("/extrato", params={
+        "conta": conta, "tipo": "transferencia_enviada", "valor_min": 5_000,
+        "contraparte": outras[0]})
+    assert resposta.json()["extrato"] == [
+        {"op": f"transferencia para {outras[0]}", "valor": 7_500.0,
+         "saldo": 992_500.0}]
+    pagina = client.get("/extrato/pagina", params={"conta": conta, "valor_min": 9_000})
+    assert [linha["indice"] for linha in pagina.json()["linhas"]] == [0, 3]
+    assert client.get("/extrato", params={
+        "conta": conta, "valor_min": 10, "valor_max": 1}).status_code == 400
@@ -1,4 +1,4 @@
-from fastapi import HTTPException
+from tsbanking.erros import ErroBancario
 import pytest
 from datetime import datetime as real_datetime, datetime, timedelta
 from fastapi.testclient import TestClient
@@ -122,8 +122,7 @@ def test_pix_noturno_acima_limite(client, monkeypatch):
 
 
 def test_doc_valido(client, monkeypatch):
-    monkeypatch.setattr("tsbanking.services.get_saldo",
-                        lambda conta="principal": 100000)
+    atualizar_saldo(100000, "principal")
     response = client.post("/transferir", json={
         "valor": 9000,
         "conta_destino": "destino",
@@ -151,8 +150,7 @@ def test_ted_valido(client, monkeypatch):
         def now(cls):
             return cls(2024, 1, 1, 10, 0)
     monkeypatch.setattr("tsbanking.main.datetime", MockHorarioValido)
-    monkeypatch.setattr("tsbanking.services.get_saldo",
-                        lambda conta="principal": 100000)
+    atualizar_saldo(100000, "principal")
     response = client.post("/transferir", json={
         "valor": 20000,
         "conta_destino": "destino",
@@ -199,8 +197,7 @@ def test_ted_excede_limite(client, monkeypatch):
 
 
 def test_transferencia_interna_valida(client, monkeypatch):
-    monkeypatch.setattr("tsbanking.services.get_saldo",
-                        lambda conta="principal": 200000)
+    atualizar_saldo(200000, "principal")
     response = client.post("/transferir", json={
         "valor": 90000,
         "conta_destino": "destino",
@@ -230,8 +227,7 @@ def test_transferencia_saldo_insuficiente(client, monkeypatch):
             return cls(2024, 1, 1, 10, 0)  # horário normal para PIX
 
     monkeypatch.setattr("tsbanking.main.datetime", MockDia)
-    monkeypatch.setattr("tsbanking.services.get_saldo",
-                        lambda conta="principal": 9998)
+    atualizar_saldo(9998, "principal")
 
     response = client.post("/transferir", json={
         "valor": 9999,
@@ -337,11 +333,11 @@ def test_resgate_data_invalida(client):
     assert response.status_code == 200
     from tsbanking.database import get_investimento
     get_investimento("CDB")["data_aplicacao"] = data_aplic.isoformat()
-    from tsbanking.services import resgatar_investimento, HTTPException
+    from tsbanking.services import resgatar_investimento
     try:
         resgatar_investimento("CDB", data_resgate=data_resg.isoformat())
         assert False, "Deveria lançar exceção de data inválida"
-    except HTTPException as e:
+    except ErroBancario as e:
         assert "anterior à aplicação" in str(e.detail)
 
 
@@ -499,7 +495,7 @@ def test_transferencia_bem_sucedida():
 
 def test_transferencia_conta_origem_invalida():
     # Testa conta de origem inválida
-    with pytest.raises(HTTPException) as excinfo:
+    with pytest.raises(ErroBancario) as excinfo:
         transferir(100.0, "destino", "conta_inexistente")
 
     assert excinfo.value.status_code == 404
@@ -508,7 +504,7 @@ def test_transferencia_conta_origem_invalida():
 
 def test_transferencia_conta_destino_invalida():
     # Testa conta de destino inválida
-    with pytest.raises(HTTPException) as excinfo:
+    with pytest.raises(ErroBancario) as excinfo:
         transferir(100.0, "conta_inexistente", "principal")
 
     assert excinfo.value.status_code == 404
@@ -517,7 +513,7 @@ def test_transferencia_conta_destino_invalida():
 
 def test_transferencia_valor_negativo():
     # Testa valor negativo
-    with pytest.raises(HTTPException) as excinfo:
+    with pytest.raises(ErroBancario) as excinfo:
         transferir(-100.0, "destino", "principal")
 
     assert excinfo.value.status_code == 400
@@ -526,7 +522,7 @@ def test_transferencia_valor_negativo():
 
 def test_transferencia_saldo_insuficiente():
     # Testa saldo insuficiente
-    with pytest.raises(HTTPException) as excinfo:
+    with pytest.raises(ErroBancario) as excinfo:
         transferir(1500.0, "destino", "principal")
 
     assert excinfo.value.status_code == 400
@@ -537,7 +533,7 @@ def test_transferencia_saldo_insuficiente():
 
 def test_transferencia_entre_mesmas_contas():
     # Testa transferência para a mesma conta
-    with pytest.raises(HTTPException) as excinfo:
+    with pytest.raises(ErroBancario) as excinfo:
         transferir(100.0, "principal", "principal")
 
     assert excinfo.value.status_code == 400
@@ -546,7 +542,7 @@ def test_transferencia_entre_mesmas_contas():
 
 def test_transferencia_valor_zero():
     # Testa valor zero
-    with pytest.raises(HTTPException) as excinfo:
+    with pytest.raises(ErroBancario) as excinfo:
         transferir(0.0, "destino", "principal")
 
     assert excinfo.value.status_code == 400
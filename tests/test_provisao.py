@@ -0,0 +1,115 @@
+import csv
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking import provisao
+from tsbanking.main import app
+from tsbanking.services import (
+    abrir_conta, aplicar_investimento, calcular_rendimento, depositar,
+    resgatar_investimento
+)
+
+
+@pytest.fixture
+def carteiras():
+    contas = []
+    for i in range(30):
+        conta = abrir_conta()["conta"]
+        depositar(1000.0, conta)
+        aplicar_investimento(100.0 + i, "CDB", conta, "2024-01-01T10:00:00")
+        aplicar_investimento(50.0, "POUPANCA", conta, "2024-02-01T10:00:00")
+        contas.append(conta)
+    return contas
+
+
+def ler_foto(pasta, contas):
+    linhas = {}
+    for nome in os.listdir(pasta):
+        if nome.startswith("particao-"):
+            with open(os.path.join(pasta, nome), encoding="utf-8") as arquivo:
+                for linha in csv.DictReader(arquivo):
+                    if linha["conta"] in contas:
+                        linhas[(linha["conta"], linha["tipo"])] = linha
+    return linhas
+
+
+def test_rendimento_igual_ao_do_resgate(carteiras):
+    conta = carteiras[0]
+    esperado = calcular_rendimento("CDB", 100.0, 0.015, 31)
+    resultado = resgatar_investimento("CDB", conta, "2024-02-01T10:00:00")
+    assert resultado["juros"] == pytest.approx(esperado)
+
+
+def test_foto_por_particao(carteiras, tmp_path):
+    resumo = provisao.provisionar("2024-03-01", str(tmp_path), particoes=8,
+                                  processos=1)
+    assert resumo["retomadas"] == 0
+    linhas = ler_foto(resumo["diretorio"], set(carteiras))
+    assert len(linhas) == 60
+    cdb = linhas[(carteiras[0], "CDB")]
+    assert int(cdb["dias"]) == 60
+    assert float(cdb["rendimento"]) == pytest.approx(
+        calcular_rendimento("CDB", 100.0, 0.015, 60))
+    poupanca = linhas[(carteiras[0], "POUPANCA")]
+    assert float(poupanca["rendimento"]) == pytest.approx(50.0 * 0.005 * 29)
+
+
+def test_retoma_execucao_interrompida(carteiras, tmp_path, monkeypatch):
+    original = provisao.provisionar_particao
+    feitas = []
+
+    def contando(pasta, numero, *args):
+        if len(feitas) == limite[0]:
+            raise RuntimeError("processo caiu")
+        feitas.append(numero)
+        return original(pasta, numero, *args)
+
+    limite = [3]
+    monkeypatch.setattr(provisao, "provisionar_particao", contando)
+    with pytest.raises(RuntimeError):
+        provisao.provisionar("2024-03-01", str(tmp_path), particoes=8, processos=1)
+
+    # Só as cinco que faltam são refeitas; o número de partições da
+    # primeira execução prevalece
+    feitas.clear()
+    limite[0] = None
+    resumo = provisao.provisionar("2024-03-01", str(tmp_path), particoes=3,
+                                  processos=1)
+    assert resumo["retomadas"] == 3
+    assert resumo["particoes"] == 8
+    assert len(feitas) == 5
+    assert len(ler_foto(resumo["diretorio"], set(carteiras))) == 60
+
+
+def test_processos_dao_o_mesmo_resultado(carteiras, tmp_path):
+    um = provisao.provisionar("2024-03-01", str(tmp_path / "um"), particoes=4,
+                              processos=1)
+    dois = provisao.provisionar("2024-03-01", str(tmp_path / "dois"),
+                                particoes=4, processos=2)
+    assert dois["posicoes"] == um["posicoes"]
+    assert dois["rendimento"] == pytest.approx(um["rendimento"])
+    assert (ler_foto(dois["diretorio"], set(carteiras))
+            == ler_foto(um["diretorio"], set(carteiras)))
+
+
+def test_endpoint_de_provisao(carteiras, tmp_path, monkeypatch):
+    monkeypatch.setitem(provisao._config, "diretorio", str(tmp_path))
+    client = TestClient(app)
+    resposta = client.post("/investimentos/provisao", params={"data": "2024-03-01"})
+    assert resposta.status_code == 202
+    tarefa = resposta.json()
+    assert tarefa["situacao"] == "em_andamento"
+    limite = time.time() + 30
+    while tarefa["situacao"] == "em_andamento" and time.time() < limite:
+        time.sleep(0.01)
+        tarefa = client.get(f"/tarefas/{tarefa['tarefa']}").json()
+    assert tarefa["situacao"] == "concluida"
+    assert tarefa["resultado"]["posicoes"] >= 60
+    assert os.path.exists(tmp_path / "2024-03-01" / "concluidas.jsonl")
+
+
+def test_tarefa_desconhecida():
+    assert TestClient(app).get("/tarefas/999999").status_code == 404
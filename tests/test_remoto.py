@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from banco_textual.remoto import ServicosRemotos
+from tests.conftest import esperar_workers
+from tsbanking.erros import ContaJaExiste, OperacaoInvalida
+from tsbanking.main import app
+from tsbanking.services import depositar
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def remoto():
+    # A própria aplicação ASGI, em processo, faz o papel do servidor
+    cliente = TestClient(app)
+    pedidos = []
+    cliente.event_hooks["request"].append(lambda pedido: pedidos.append(pedido.url.path))
+    servicos = ServicosRemotos(cliente=cliente, ttl=5.0)
+    servicos.cache.relogio = Relogio()
+    servicos.pedidos = pedidos
+    return servicos
+
+
+def test_operacoes_pela_api(remoto):
+    nome = remoto.abrir_conta()["conta"]
+    assert remoto.conta_existe(nome)
+    assert not remoto.conta_existe("nao_existe")
+    remoto.depositar(200.0, nome)
+    remoto.transferir(50.0, "destino", nome)
+    remoto.aplicar_investimento(100.0, "CDB", nome)
+    assert remoto.consultar_saldo(nome) == 50.0
+    pagina = remoto.consultar_extrato_pagina(nome, tipo="aplicacao")
+    assert [linha["op"] for linha in pagina["linhas"]] == ["aplicacao_CDB"]
+
+
+def test_erros_voltam_como_erros_de_dominio(remoto):
+    nome = remoto.abrir_conta()["conta"]
+    with pytest.raises(OperacaoInvalida) as excinfo:
+        remoto.sacar(10.0, nome)
+    assert excinfo.value.detail == "Saldo insuficiente"
+    with pytest.raises(ContaJaExiste):
+        remoto.abrir_conta(nome)
+
+
+def test_cache_de_leitura(remoto):
+    nome = remoto.abrir_conta()["conta"]
+    assert remoto.consultar_saldo(nome) == 0.0
+    remoto.consultar_saldo(nome)
+    remoto.consultar_extrato_pagina(nome)
+    remoto.consultar_extrato_pagina(nome)
+    assert remoto.pedidos.count("/saldo") == 1
+    assert remoto.pedidos.count("/extrato/pagina") == 1
+
+    # Escrita de outro cliente: só aparece depois que o cache expira
+    depositar(10.0, nome)
+    assert remoto.consultar_saldo(nome) == 0.0
+    remoto.cache.relogio.agora += 6.0
+    assert remoto.consultar_saldo(nome) == 10.0
+
+    # Escrita deste cliente descarta o cache da conta na hora
+    remoto.depositar(5.0, nome)
+    assert remoto.consultar_saldo(nome) == 15.0
+    assert remoto.consultar_extrato_pagina(nome)["total"] == 2
+
+
+def test_transferencia_invalida_as_duas_contas(remoto):
+    origem, destino = remoto.abrir_conta()["conta"], remoto.abrir_conta()["conta"]
+    remoto.depositar(30.0, origem)
+    assert remoto.consultar_saldo(destino) == 0.0
+    remoto.transferir(30.0, destino, origem)
+    assert remoto.consultar_saldo(destino) == 30.0
+    assert remoto.consultar_saldo(origem) == 0.0
+
+
+def test_tela_no_modo_remoto(remoto):
+    from banco_textual.app import BancoApp, OperacaoScreen, SaldoScreen
+    nome = remoto.abrir_conta()["conta"]
+
+    async def cenario():
+        banco = BancoApp(servicos=remoto)
+        async with banco.run_test() as pilot:
+            saldo = SaldoScreen(nome)
+            await banco.push_screen(saldo)
+            await esperar_workers(banco, pilot)
+            assert saldo.saldo == 0.0
+
+            tela = OperacaoScreen(nome, "deposito")
+            await banco.push_screen(tela)
+            tela.query_one("#valor").value = "25"
+            tela.query_one("#confirmar").press()
+            await esperar_workers(banco, pilot)
+            assert banco.screen is saldo
+            assert saldo.saldo == 25.0
+
+    asyncio.run(cenario())
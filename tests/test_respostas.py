@@ -0,0 +1,60 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking import respostas
+from tsbanking.main import app
+from tsbanking.models import ADAPTADOR_EXTRATO, ADAPTADOR_PAGINA
+from tsbanking.services import (
+    abrir_conta, consultar_extrato, consultar_extrato_pagina, depositar, sacar
+)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def conta():
+    nome = abrir_conta()["conta"]
+    for i in range(1, 51):
+        depositar(float(i), nome)
+    sacar(0.5, nome)
+    return nome
+
+
+def test_extrato_em_linhas_e_colunas(client, conta):
+    linhas = client.get(f"/extrato?conta={conta}").json()["extrato"]
+    assert linhas == consultar_extrato(conta)
+    colunas = client.get(f"/extrato?conta={conta}&colunas=true").json()["extrato"]
+    assert colunas["op"] == [linha["op"] for linha in linhas]
+    assert colunas["valor"] == [linha["valor"] for linha in linhas]
+    assert colunas["saldo"][-1] == 1274.5
+
+
+def test_extrato_vazio_em_colunas(client):
+    nome = abrir_conta()["conta"]
+    resposta = client.get(f"/extrato?conta={nome}&colunas=true")
+    assert resposta.json() == {"extrato": {"op": [], "valor": [], "saldo": []}}
+    assert resposta.headers["content-type"] == "application/json"
+
+
+@pytest.mark.parametrize("orjson", [True, False])
+@pytest.mark.parametrize("com_adaptador", [True, False])
+def test_serializacao_com_e_sem_orjson(monkeypatch, conta, orjson, com_adaptador):
+    if not orjson:
+        monkeypatch.setattr(respostas, "orjson", None)
+    pagina = consultar_extrato_pagina(conta, 0, 10)
+    extrato = {"extrato": consultar_extrato(conta)}
+    assert json.loads(respostas.serializar(
+        pagina, ADAPTADOR_PAGINA if com_adaptador else None)) == pagina
+    assert json.loads(respostas.serializar(
+        extrato, ADAPTADOR_EXTRATO if com_adaptador else None)) == extrato
+
+
+def test_erros_continuam_em_json(client):
+    resposta = client.get("/extrato?conta=nao_existe")
+    assert resposta.status_code == 404
+    assert resposta.json() == {"detail": "Conta 'nao_existe' não encontrada"}
@@ -0,0 +1,109 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking import database, risco
+from tsbanking.main import app
+from tsbanking.risco import CONTRAPARTES, PerfilRisco, Parecer
+from tsbanking.services import abrir_conta, consultar_saldo, depositar, transferir
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = [1_000_000.0]
+    monkeypatch.setattr(database, "_relogio", lambda: agora[0])
+    return agora
+
+
+def test_media_e_desvio_exponenciais():
+    perfil = PerfilRisco()
+    for valor in (100.0, 100.0, 100.0, 200.0):
+        perfil.registrar("x", valor, 0.0)
+    # Média: 100 + 0.1 * 100; variância: 0.9 * (0 + 100 * 10)
+    assert perfil.media == pytest.approx(110.0)
+    assert perfil.variancia == pytest.approx(900.0)
+
+
+def test_janela_de_velocidade():
+    perfil = PerfilRisco()
+    for minuto in range(5):
+        perfil.registrar("x", 10.0, minuto * 60.0)
+    assert perfil.sinais("x", 1.0, 4 * 60.0).na_janela == 5
+    # Nove minutos depois do último, só ele continua na janela de dez
+    sinais = perfil.sinais("x", 1.0, 13 * 60.0)
+    assert (sinais.na_janela, sinais.valor_na_janela) == (1, 10.0)
+    # Um intervalo longo esvazia a janela em passos limitados
+    assert perfil.sinais("x", 1.0, 10_000 * 60.0).na_janela == 0
+
+
+def test_destinos_em_memoria_fixa():
+    perfil = PerfilRisco()
+    for i in range(100):
+        perfil.registrar(f"d{i}", 1.0, 0.0)
+        if i % 5 == 0:
+            perfil.registrar("frequente", 1.0, 0.0)
+    # Quem passa de 1/CONTRAPARTES do fluxo nunca sai da contagem
+    assert len(perfil.destinos) == CONTRAPARTES
+    assert perfil.destinos["frequente"] >= 20
+    assert not perfil.sinais("frequente", 1.0, 0.0).destino_novo
+    assert not perfil.sinais("d42", 1.0, 0.0).destino_novo
+    assert perfil.sinais("nunca", 1.0, 0.0).destino_novo
+
+
+def test_regras_bloqueiam_e_sinalizam(client, relogio, monkeypatch):
+    monkeypatch.setitem(risco._config, "avaliador", risco.regras_basicas)
+    conta = abrir_conta()["conta"]
+    conhecido = abrir_conta()["conta"]
+    novo = abrir_conta()["conta"]
+    depositar(100_000.0, conta)
+    for _ in range(12):
+        relogio[0] += 120
+        transferir(100.0, conhecido, conta)
+
+    resposta = client.post("/transferir", json={
+        "valor": 5000.0, "conta_destino": novo, "conta_origem": conta,
+        "tipo_transferencia": "INTERNA"})
+    assert resposta.status_code == 403
+    assert "fora do padrão" in resposta.json()["detail"]
+    assert consultar_saldo(novo) == 0.0
+    # Para um destino conhecido o mesmo valor passa
+    assert "alerta" not in transferir(5000.0, conhecido, conta)
+
+    for _ in range(20):
+        resultado = transferir(1.0, conhecido, conta)
+    assert "transferências em" in resultado["alerta"]
+    alertas = client.get("/risco/alertas").json()["alertas"]
+    assert {a["acao"] for a in alertas if a["conta_origem"] == conta} == {
+        risco.BLOQUEAR, risco.SINALIZAR}
+
+
+def test_avaliador_plugavel(relogio, monkeypatch):
+    vistos = []
+
+    def avaliador(sinais, origem, destino):
+        vistos.append(sinais)
+        return Parecer(risco.SINALIZAR, "revisar") if sinais.para_destino else None
+
+    monkeypatch.setitem(risco._config, "avaliador", avaliador)
+    conta = abrir_conta()["conta"]
+    destino = abrir_conta()["conta"]
+    depositar(50.0, conta)
+    assert "alerta" not in transferir(10.0, destino, conta)
+    assert transferir(10.0, destino, conta)["alerta"] == "revisar"
+    assert [s.destino_novo for s in vistos] == [True, False]
+
+
+def test_perfil_pela_api(client, relogio):
+    conta = abrir_conta()["conta"]
+    destino = abrir_conta()["conta"]
+    assert client.get(f"/risco/{conta}").json()["transferencias"] == 0
+    depositar(50.0, conta)
+    transferir(20.0, destino, conta)
+    perfil = client.get(f"/risco/{conta}").json()
+    assert perfil["transferencias"] == 1
+    assert perfil["destinos_frequentes"] == {destino: 1}
+    assert client.get("/risco/nao_existe").status_code == 404
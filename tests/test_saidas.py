@@ -0,0 +1,165 @@
+import json
+import socket
+import threading
+import time
+
+import httpx
+import pytest
+
+from tsbanking.database import _db
+from tsbanking.eventos import DEPOSITO, TRANSFERENCIA_ENVIADA
+from tsbanking.saidas import (
+    Despachante, SaidaArquivo, SaidaHttp, SaidaSocketUnix, saida_de_url
+)
+from tsbanking.services import abrir_conta, depositar, transferir
+
+
+class SaidaMemoria:
+    nome = "memoria"
+
+    def __init__(self, falhas=0, porta=None):
+        self.lotes = []
+        self.falhas = falhas
+        self.porta = porta
+
+    def enviar(self, lote):
+        if self.porta is not None:
+            self.porta.wait()
+        if self.falhas:
+            self.falhas -= 1
+            raise ConnectionError("fora do ar")
+        self.lotes.append(lote)
+
+    def fechar(self):
+        pass
+
+
+def movimentar():
+    conta = abrir_conta()["conta"]
+    destino = abrir_conta()["conta"]
+    depositar(100.0, conta)
+    transferir(40.0, destino, conta)
+    return conta, destino
+
+
+def esperar(condicao, limite=5.0):
+    fim = time.time() + limite
+    while not condicao() and time.time() < fim:
+        time.sleep(0.01)
+    return condicao()
+
+
+def test_lotes_na_ordem_do_log():
+    inicio = len(_db["eventos"])
+    saida = SaidaMemoria()
+    despachante = Despachante(saida, inicio, tamanho_lote=2)
+    conta, destino = movimentar()
+    assert despachante.despachar() == len(_db["eventos"]) - inicio
+    entregues = [item for lote in saida.lotes for item in lote]
+    assert all(len(lote) <= 2 for lote in saida.lotes)
+    assert [item["seq"] for item in entregues] == sorted(item["seq"] for item in entregues)
+    assert [(item["conta"], item["tipo"]) for item in entregues][-3:] == [
+        (conta, DEPOSITO), (conta, TRANSFERENCIA_ENVIADA),
+        (destino, "transferencia_recebida")]
+    assert despachante.pendentes() == 0
+
+
+def test_filtra_tipos():
+    saida = SaidaMemoria()
+    despachante = Despachante(saida, len(_db["eventos"]), tipos=[DEPOSITO])
+    movimentar()
+    despachante.despachar()
+    assert [item["tipo"] for lote in saida.lotes for item in lote] == [DEPOSITO]
+
+
+def test_repete_com_espera_crescente_sem_perder_a_ordem():
+    saida = SaidaMemoria(falhas=3)
+    despachante = Despachante(saida, len(_db["eventos"]), tamanho_lote=1,
+                              espera_inicial=0.001)
+    movimentar()
+    despachante.despachar()
+    assert despachante.falhas == 3
+    assert despachante.ultimo_erro is None
+    seqs = [lote[0]["seq"] for lote in saida.lotes]
+    assert seqs == sorted(seqs) and len(seqs) == len(set(seqs))
+
+
+def test_saida_lenta_nao_atrasa_as_operacoes():
+    porta = threading.Event()
+    saida = SaidaMemoria(porta=porta)
+    despachante = Despachante(saida, len(_db["eventos"]), intervalo=0.001)
+    despachante.iniciar()
+    try:
+        inicio = time.perf_counter()
+        for _ in range(50):
+            movimentar()
+        assert time.perf_counter() - inicio < 2.0
+        assert saida.lotes == []
+        porta.set()
+        assert esperar(lambda: despachante.pendentes() == 0)
+    finally:
+        despachante.parar()
+    assert despachante.entregues == sum(len(lote) for lote in saida.lotes)
+
+
+def test_saida_em_arquivo(tmp_path):
+    caminho = tmp_path / "eventos.jsonl"
+    despachante = Despachante(saida_de_url(f"arquivo:{caminho}"), len(_db["eventos"]))
+    assert isinstance(despachante.saida, SaidaArquivo)
+    conta, _ = movimentar()
+    despachante.despachar()
+    linhas = [json.loads(linha) for linha in caminho.read_text().splitlines()]
+    assert [linha["tipo"] for linha in linhas if linha["conta"] == conta] == [
+        DEPOSITO, TRANSFERENCIA_ENVIADA]
+
+
+def test_saida_em_socket_unix(tmp_path):
+    caminho = str(tmp_path / "eventos.sock")
+    servidor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    servidor.bind(caminho)
+    servidor.listen(1)
+    recebido = []
+
+    def receber():
+        conexao, _ = servidor.accept()
+        with conexao:
+            while True:
+                dados = conexao.recv(65536)
+                if not dados:
+                    break
+                recebido.append(dados)
+
+    leitor = threading.Thread(target=receber)
+    leitor.start()
+    despachante = Despachante(SaidaSocketUnix(caminho), len(_db["eventos"]))
+    movimentar()
+    despachante.despachar()
+    despachante.parar()
+    leitor.join(5)
+    servidor.close()
+    linhas = b"".join(recebido).decode().splitlines()
+    assert [json.loads(linha)["tipo"] for linha in linhas][-2:] == [
+        TRANSFERENCIA_ENVIADA, "transferencia_recebida"]
+
+
+def test_saida_http_repete_status_de_erro():
+    respostas = [503, 200]
+    recebidos = []
+
+    def receptor(pedido):
+        recebidos.append(json.loads(pedido.content))
+        return httpx.Response(respostas.pop(0))
+
+    cliente = httpx.Client(transport=httpx.MockTransport(receptor))
+    saida = SaidaHttp("http://receptor.local/eventos", cliente)
+    despachante = Despachante(saida, len(_db["eventos"]), espera_inicial=0.001)
+    movimentar()
+    despachante.despachar()
+    assert despachante.falhas == 1
+    assert recebidos[0] == recebidos[1]
+    assert recebidos[1][-1]["tipo"] == "transferencia_recebida"
+
+
+def test_url_invalida():
+    with pytest.raises(ValueError):
+        saida_de_url("ftp://x")
@@ -0,0 +1,76 @@
+import io
+import os
+from datetime import datetime
+
+import pytest
+from tsbanking import segmentos
+from tsbanking.compactacao import Compactador
+from tsbanking.database import get_conta
+from tsbanking.exportacao import exportar
+from tsbanking.services import abrir_conta, depositar, consultar_extrato, limpar
+
+
+@pytest.fixture(autouse=True)
+def diretorio(tmp_path, monkeypatch):
+    monkeypatch.setitem(segmentos._config, "diretorio", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def conta(monkeypatch):
+    agora = {"momento": datetime(2024, 1, 1).timestamp()}
+    monkeypatch.setattr("tsbanking.database._relogio", lambda: agora["momento"])
+    nome = abrir_conta()["conta"]
+    for i in range(1, 26):
+        agora["momento"] = datetime(2024, 1, i).timestamp()
+        depositar(float(i), nome)
+    return nome
+
+
+def test_sela_linhas_excedentes(conta, diretorio):
+    antes = consultar_extrato(conta)
+    compactador = Compactador(linhas_quentes=5, minimo_segmento=8,
+                              idade_maxima=float("inf"))
+    assert compactador.compactar_conta(get_conta(conta)) == 20
+    extrato = get_conta(conta).extrato
+    assert extrato.quente.base == 20 and len(extrato.quente.ops) == 5
+    assert len(extrato.segmentos) == 1
+    assert os.listdir(diretorio) == [os.path.basename(extrato.segmentos[0].caminho)]
+    # Leitura atravessa disco e memória de forma transparente
+    assert consultar_extrato(conta) == antes
+    assert extrato.linhas(18, 22) == antes[18:22]
+
+
+def test_sela_por_idade(conta):
+    compactador = Compactador(linhas_quentes=1000, minimo_segmento=2,
+                              idade_maxima=10 * 24 * 3600)
+    agora = datetime(2024, 1, 20).timestamp()
+    # Dias 1 a 9 têm mais de 10 dias em 20/01
+    assert compactador.compactar_conta(get_conta(conta), agora) == 9
+    assert compactador.compactar_conta(get_conta(conta), agora) == 0
+
+
+def test_varios_segmentos_e_busca_por_data(conta):
+    compactador = Compactador(linhas_quentes=5, minimo_segmento=3,
+                              idade_maxima=float("inf"))
+    registro = get_conta(conta)
+    for limite in (20, 12, 5):
+        compactador.linhas_quentes = limite
+        compactador.compactar_conta(registro)
+    extrato = registro.extrato
+    assert [(s.inicio, s.fim) for s in extrato.segmentos] == [(0, 5), (5, 13), (13, 20)]
+    assert extrato.buscar_momento(datetime(2024, 1, 7).timestamp()) == 6
+    assert extrato.buscar_momento(datetime(2024, 1, 23).timestamp()) == 22
+    saida = io.BytesIO()
+    exportar(saida, [conta], "csv", inicio=datetime(2024, 1, 4).date(),
+             fim=datetime(2024, 1, 22).date(), tamanho_bloco=4)
+    assert saida.getvalue().decode().count("\n") == 1 + 19
+
+
+def test_novas_linhas_e_limpeza_apos_selar(conta):
+    Compactador(linhas_quentes=0, minimo_segmento=1).compactar_conta(get_conta(conta))
+    depositar(100.0, conta)
+    assert consultar_extrato(conta)[-1] == {"op": "deposito", "valor": 100.0,
+                                            "saldo": 425.0}
+    limpar(conta)
+    assert consultar_extrato(conta) == []
@@ -0,0 +1,52 @@
+import pytest
+from tsbanking.database import atualizar_saldo, limpar_extrato, get_saldo, get_extrato
+from tsbanking.transacao import UnidadeDeTrabalho
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    atualizar_saldo(1000.0, "principal")
+    atualizar_saldo(500.0, "destino")
+    limpar_extrato("principal")
+    limpar_extrato("destino")
+
+
+def test_confirma_ao_sair_do_bloco():
+    with UnidadeDeTrabalho("principal", "destino") as uow:
+        uow.conta("principal").debitar(100, "transferencia para destino")
+        uow.conta("destino").creditar(100, "transferencia de principal")
+        # Nada é visível antes do fim do bloco
+        assert get_saldo("principal") == 1000.0
+        assert get_extrato("destino") == []
+    assert get_saldo("principal") == 900.0
+    assert get_saldo("destino") == 600.0
+    assert get_extrato("destino") == [
+        {"op": "transferencia de principal", "valor": 100, "saldo": 600.0}]
+
+
+def test_desfaz_em_caso_de_erro():
+    with pytest.raises(RuntimeError):
+        with UnidadeDeTrabalho("principal", "destino") as uow:
+            uow.conta("principal").debitar(100, "transferencia para destino")
+            raise RuntimeError("falha no meio da transferência")
+    assert get_saldo("principal") == 1000.0
+    assert get_saldo("destino") == 500.0
+    assert get_extrato("principal") == []
+
+
+def test_mesma_conta_resolvida_uma_vez():
+    with UnidadeDeTrabalho("principal", "principal") as uow:
+        assert len(uow.contas) == 1
+        uow.conta("principal").creditar(10, "deposito")
+    assert get_saldo("principal") == 1010.0
+
+
+def test_conta_inexistente_libera_travas():
+    from tsbanking.erros import ContaNaoEncontrada
+    with pytest.raises(ContaNaoEncontrada):
+        with UnidadeDeTrabalho("principal", "nao_existe"):
+            pass
+    # As travas foram liberadas: uma nova transação não fica bloqueada
+    with UnidadeDeTrabalho("principal") as uow:
+        uow.conta("principal").creditar(1, "deposito")
+    assert get_saldo("principal") == 1001.0
@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from tsbanking.erros import ContaNaoEncontrada
+from tsbanking.main import app, eventos_sse
+from tsbanking.services import abrir_conta, depositar, sacar, versao_da_conta
+from tsbanking.transmissao import Inscricao
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_mudancas_chegam_na_ordem():
+    conta = abrir_conta()["conta"]
+
+    async def cenario():
+        inscricao = Inscricao([conta])
+        inicial = inscricao.abertura()["versoes"][conta]
+        # Operações em outra thread, como nos endpoints síncronos
+        await asyncio.to_thread(depositar, 10.0, conta)
+        await asyncio.to_thread(sacar, 3.0, conta)
+        primeira = await inscricao.proxima(1)
+        segunda = await inscricao.proxima(1)
+        nada = await inscricao.proxima(0.01)
+        inscricao.fechar()
+        return inicial, primeira, segunda, nada
+
+    inicial, primeira, segunda, nada = asyncio.run(cenario())
+    assert (primeira["tipo"], primeira["saldo"], primeira["lancamentos"]) == (
+        "mudanca", 10.0, [{"op": "deposito", "valor": 10.0, "saldo": 10.0}])
+    assert (segunda["saldo"], segunda["inicio"]) == (7.0, 1)
+    assert inicial < primeira["versao"] < segunda["versao"] == versao_da_conta(conta)
+    assert nada is None
+
+
+def test_fila_cheia_pede_ressincronizacao():
+    conta = abrir_conta()["conta"]
+
+    async def cenario():
+        inscricao = Inscricao([conta], limite=2)
+        inicial = inscricao.versoes[conta]
+        for _ in range(5):
+            depositar(1.0, conta)
+        await asyncio.sleep(0)
+        aviso = await inscricao.proxima(1)
+        await asyncio.to_thread(depositar, 2.0, conta)
+        seguinte = await inscricao.proxima(1)
+        inscricao.fechar()
+        return inscricao, inicial, aviso, seguinte
+
+    inscricao, inicial, aviso, seguinte = asyncio.run(cenario())
+    assert inscricao.descartadas == 5
+    # Última versão entregue: o cliente busca o resto em ?desde=
+    assert aviso == {"tipo": "ressincronizar", "versoes": {conta: inicial}}
+    assert seguinte["saldo"] == 7.0
+
+
+def test_fechar_cancela_assinaturas():
+    conta = abrir_conta()["conta"]
+
+    async def cenario():
+        inscricao = Inscricao([conta])
+        inscricao.fechar()
+        depositar(1.0, conta)
+        await asyncio.sleep(0)
+        return len(inscricao.fila)
+
+    assert asyncio.run(cenario()) == 0
+
+
+def test_conta_inexistente_nao_deixa_assinatura():
+    async def cenario():
+        with pytest.raises(ContaNaoEncontrada):
+            Inscricao(["principal", "nao-existe"])
+
+    asyncio.run(cenario())
+    # A assinatura da primeira conta foi desfeita
+    from tsbanking.banco import banco_atual
+    assert "principal" not in banco_atual().assinantes
+
+
+def test_sse():
+    conta = abrir_conta()["conta"]
+
+    async def cenario():
+        resposta = await eventos_sse([conta])
+        assert resposta.media_type == "text/event-stream"
+        corpo = resposta.body_iterator
+        abertura = await corpo.__anext__()
+        await asyncio.to_thread(depositar, 5.0, conta)
+        mudanca = await corpo.__anext__()
+        await corpo.aclose()
+        return abertura, mudanca
+
+    abertura, mudanca = asyncio.run(cenario())
+    assert abertura.startswith(b"event: inscrito\ndata: ")
+    cabecalho, dados = mudanca.decode().rstrip("\n").split("\n")
+    assert cabecalho == "event: mudanca"
+    assert json.loads(dados[len("data: "):])["saldo"] == 5.0
+
+
+def test_sse_conta_inexistente(client):
+    assert client.get("/eventos", params={"conta": "nao-existe"}).status_code == 404
+
+
+def test_websocket(client):
+    conta = abrir_conta()["conta"]
+    with client.websocket_connect(f"/eventos/ws?conta={conta}&conta=principal") as ws:
+        assert set(ws.receive_json()["versoes"]) == {conta, "principal"}
+        client.post("/transferir", json={"valor": 4.0, "conta_destino": conta,
+                                         "tipo_transferencia": "PIX"})
+        recebidas = {m["conta"]: m["saldo"] for m in (ws.receive_json(), ws.receive_json())}
+    assert recebidas == {"principal": 996.0, conta: 4.0}
+
+
+def test_websocket_conta_inexistente(client):
+    with client.websocket_connect("/eventos/ws?conta=nao-existe") as ws:
+        with pytest.raises(WebSocketDisconnect) as erro:
+            ws.receive_json()
+    assert erro.value.code == 4404
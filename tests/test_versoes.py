@@ -0,0 +1,105 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from tsbanking import main
+from tsbanking.compactacao import Compactador
+from tsbanking.database import get_conta
+from tsbanking.main import app
+from tsbanking.services import (
+    abrir_conta, consultar_extrato_pagina, depositar, sacar, versao_da_conta
+)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_versao_muda_a_cada_operacao():
+    conta = abrir_conta()["conta"]
+    abertura = versao_da_conta(conta)
+    depositar(10.0, conta)
+    deposito = versao_da_conta(conta)
+    assert deposito > abertura
+    # Operação em outra conta não muda a versão desta
+    depositar(10.0, "principal")
+    assert versao_da_conta(conta) == deposito
+
+
+@pytest.mark.parametrize("rota", ["/saldo", "/extrato", "/extrato/pagina"])
+def test_not_modified_enquanto_nada_muda(client, rota):
+    conta = abrir_conta()["conta"]
+    depositar(10.0, conta)
+    primeira = client.get(rota, params={"conta": conta})
+    etag = primeira.headers["ETag"]
+    repetida = client.get(rota, params={"conta": conta},
+                          headers={"If-None-Match": etag})
+    assert repetida.status_code == 304 and repetida.content == b""
+    assert repetida.headers["ETag"] == etag
+
+    sacar(1.0, conta)
+    mudou = client.get(rota, params={"conta": conta},
+                       headers={"If-None-Match": etag})
+    assert mudou.status_code == 200
+    assert mudou.headers["ETag"] != etag
+
+
+def test_not_modified_nao_le_o_extrato(client, monkeypatch):
+    conta = abrir_conta()["conta"]
+    depositar(10.0, conta)
+    etag = client.get("/extrato", params={"conta": conta}).headers["ETag"]
+
+    def proibido(conta):
+        raise AssertionError("extrato lido")
+
+    monkeypatch.setattr(main, "consultar_extrato", proibido)
+    resposta = client.get("/extrato", params={"conta": conta},
+                          headers={"If-None-Match": f'W/"0", {etag}'})
+    assert resposta.status_code == 304
+
+
+def test_conta_inexistente(client):
+    assert client.get("/saldo", params={"conta": "nao-existe"},
+                      headers={"If-None-Match": "*"}).status_code == 404
+
+
+def test_linhas_desde_uma_versao():
+    conta = abrir_conta()["conta"]
+    for _ in range(3):
+        depositar(10.0, conta)
+    pagina = consultar_extrato_pagina(conta)
+    assert pagina["total"] == 3
+    versao = pagina["versao"]
+    assert consultar_extrato_pagina(conta, desde=versao)["linhas"] == []
+
+    sacar(5.0, conta)
+    depositar(1.0, conta)
+    delta = consultar_extrato_pagina(conta, desde=versao)
+    assert [(linha["indice"], linha["op"]) for linha in delta["linhas"]] == [
+        (3, "saque"), (4, "deposito")]
+    assert delta["versao"] == versao_da_conta(conta)
+
+
+def test_linhas_desde_atravessam_segmentos():
+    conta = abrir_conta()["conta"]
+    versoes = []
+    for i in range(30):
+        depositar(1.0 + i, conta)
+        versoes.append(versao_da_conta(conta))
+    Compactador(linhas_quentes=5, minimo_segmento=8,
+                idade_maxima=float("inf")).compactar_conta(get_conta(conta))
+    assert get_conta(conta).extrato.segmentos
+    for k in (0, 9, 24, 29):
+        linhas = consultar_extrato_pagina(conta, desde=versoes[k])["linhas"]
+        assert [linha["valor"] for linha in linhas] == [
+            1.0 + i for i in range(k + 1, 30)]
+
+
+def test_endpoint_incremental(client):
+    conta = abrir_conta()["conta"]
+    depositar(10.0, conta)
+    versao = client.get("/extrato/pagina", params={"conta": conta}).json()["versao"]
+    depositar(20.0, conta)
+    delta = client.get("/extrato/pagina",
+                       params={"conta": conta, "desde": versao}).json()
+    assert [linha["valor"] for linha in delta["linhas"]] == [20.0]
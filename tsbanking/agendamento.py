@@ -0,0 +1,352 @@
+import calendar
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from tsbanking.banco import banco_atual
+from tsbanking.erros import ErroBancario
+
+DIARIA = "diaria"
+SEMANAL = "semanal"
+MENSAL = "mensal"
+RECORRENCIAS = (DIARIA, SEMANAL, MENSAL)
+
+# O diário é reescrito só com os pendentes quando tiver mais que isso de
+# registros por agendamento vivo
+FOLGA_DIARIO = 2
+
+
+def ocorrencia(inicio, recorrencia, n):
+    """Momento (epoch) da n-ésima repetição a partir de ``inicio``. Conta
+    sempre do início, então uma mensal do dia 31 volta ao 31 depois de
+    fevereiro."""
+    if n == 0 or recorrencia is None:
+        return inicio
+    base = datetime.fromtimestamp(inicio)
+    if recorrencia == DIARIA:
+        return (base + timedelta(days=n)).timestamp()
+    if recorrencia == SEMANAL:
+        return (base + timedelta(weeks=n)).timestamp()
+    meses = base.month - 1 + n
+    ano, mes = base.year + meses // 12, meses % 12 + 1
+    dia = min(base.day, calendar.monthrange(ano, mes)[1])
+    return base.replace(year=ano, month=mes, day=dia).timestamp()
+
+
+class Agendamento:
+    # ``posicao`` é o índice no heap, mantido pela fila a cada troca
+    __slots__ = ("id", "momento", "origem", "destino", "valor", "recorrencia",
+                 "inicio", "execucoes", "posicao")
+
+    def __init__(self, id, momento, origem, destino, valor, recorrencia=None,
+                 inicio=None, execucoes=0):
+        self.id = id
+        self.momento = momento
+        self.origem = origem
+        self.destino = destino
+        self.valor = valor
+        self.recorrencia = recorrencia
+        self.inicio = momento if inicio is None else inicio
+        self.execucoes = execucoes
+        self.posicao = -1
+
+    def registro(self):
+        return ["a", self.id, self.momento, self.origem, self.destino,
+                self.valor, self.recorrencia, self.inicio, self.execucoes]
+
+    def situacao(self):
+        return {"id": self.id, "conta_origem": self.origem,
+                "conta_destino": self.destino, "valor": self.valor,
+                "executar_em": datetime.fromtimestamp(self.momento).isoformat(),
+                "recorrencia": self.recorrencia, "execucoes": self.execucoes}
+
+
+class FilaAgendada:
+    """Min-heap por (momento, id) que sabe onde está cada item: remover do
+    meio custa O(log n), sem marcar itens como cancelados."""
+
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def topo(self):
+        return self.heap[0] if self.heap else None
+
+    def inserir(self, item):
+        item.posicao = len(self.heap)
+        self.heap.append(item)
+        self._subir(item.posicao)
+
+    def remover(self, item):
+        i = item.posicao
+        ultimo = self.heap.pop()
+        item.posicao = -1
+        if i < len(self.heap):
+            self.heap[i] = ultimo
+            ultimo.posicao = i
+            self._subir(i)
+            self._descer(ultimo.posicao)
+
+    def retirar(self):
+        item = self.heap[0]
+        self.remover(item)
+        return item
+
+    def _menor(self, a, b):
+        return (a.momento, a.id) < (b.momento, b.id)
+
+    def _trocar(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        heap[i].posicao = i
+        heap[j].posicao = j
+
+    def _subir(self, i):
+        heap = self.heap
+        while i:
+            pai = (i - 1) >> 1
+            if not self._menor(heap[i], heap[pai]):
+                break
+            self._trocar(i, pai)
+            i = pai
+
+    def _descer(self, i):
+        heap = self.heap
+        n = len(heap)
+        while True:
+            menor = i
+            for filho in (2 * i + 1, 2 * i + 2):
+                if filho < n and self._menor(heap[filho], heap[menor]):
+                    menor = filho
+            if menor == i:
+                return
+            self._trocar(i, menor)
+            i = menor
+
+
+def _transferir(origem, destino, valor):
+    # Import tardio: services importa este módulo
+    from tsbanking.services import transferir
+    return transferir(valor, destino, origem)
+
+
+class Agendador:
+    """Transferências futuras e recorrentes. A thread dorme até o primeiro
+    vencimento (ou até chegar um agendamento mais cedo) e executa tudo o que
+    venceu de uma vez, pela camada de serviços."""
+
+    def __init__(self, executar=_transferir, relogio=time.time, banco=None):
+        self.executar = executar
+        # A thread começa no banco padrão; as transferências rodam neste
+        self.banco = banco or banco_atual()
+        self.relogio = relogio
+        self.fila = FilaAgendada()
+        self.agendamentos = {}
+        self.por_conta = {}
+        self.executados = self.falhas = 0
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._parar = False
+        self._thread = None
+        self._diario = None
+        self._caminho = None
+        self._registros = 0
+
+    # Diário: cada mudança vira uma linha JSON; ao abrir, as linhas são
+    # reaplicadas e os pendentes voltam para a fila
+
+    def abrir_diario(self, caminho):
+        with self._cond:
+            maior = max(self.agendamentos, default=0)
+            if os.path.exists(caminho):
+                with open(caminho, encoding="utf-8") as arquivo:
+                    for linha in arquivo:
+                        try:
+                            registro = json.loads(linha)
+                        except ValueError:
+                            break  # última linha pela metade
+                        maior = max(maior, registro[1])
+                        self._reaplicar(registro)
+            self._ids = itertools.count(maior + 1)
+            self._caminho = caminho
+            self._reescrever_diario()
+            self._cond.notify()
+
+    def _reaplicar(self, registro):
+        if registro[0] == "a":
+            if registro[1] not in self.agendamentos:
+                self._incluir(Agendamento(*registro[1:]))
+            return
+        item = self.agendamentos.get(registro[1])
+        if item is None:
+            return
+        if registro[0] == "r":
+            self._excluir(item)
+        else:
+            self.fila.remover(item)
+            item.momento, item.execucoes = registro[2], registro[3]
+            self.fila.inserir(item)
+
+    def _anotar(self, registro):
+        if self._diario is None:
+            return
+        self._diario.write(json.dumps(registro) + "\n")
+        self._diario.flush()
+        self._registros += 1
+        if self._registros > FOLGA_DIARIO * len(self.agendamentos) + 1000:
+            self._reescrever_diario()
+
+    def _reescrever_diario(self):
+        if self._diario is not None:
+            self._diario.close()
+        temporario = self._caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            for item in self.agendamentos.values():
+                arquivo.write(json.dumps(item.registro()) + "\n")
+        os.replace(temporario, self._caminho)
+        self._registros = len(self.agendamentos)
+        self._diario = open(self._caminho, "a", encoding="utf-8")
+
+    # Fila e índices
+
+    def _incluir(self, item):
+        self.agendamentos[item.id] = item
+        self.por_conta.setdefault(item.origem, set()).add(item.id)
+        self.fila.inserir(item)
+
+    def _excluir(self, item):
+        del self.agendamentos[item.id]
+        ids = self.por_conta[item.origem]
+        ids.discard(item.id)
+        if not ids:
+            del self.por_conta[item.origem]
+        self.fila.remover(item)
+
+    def agendar(self, origem, destino, valor, momento, recorrencia=None):
+        if recorrencia not in (None,) + RECORRENCIAS:
+            raise ValueError(f"Recorrência inválida: {recorrencia}")
+        with self._cond:
+            item = Agendamento(next(self._ids), momento, origem, destino,
+                               valor, recorrencia)
+            self._incluir(item)
+            self._anotar(item.registro())
+            if self.fila.topo() is item:
+                # Vence antes do que a thread está esperando
+                self._cond.notify()
+            return item
+
+    def cancelar(self, id):
+        with self._cond:
+            item = self.agendamentos.get(id)
+            if item is None:
+                return None
+            self._excluir(item)
+            self._anotar(["r", id])
+            return item
+
+    def obter(self, id):
+        return self.agendamentos.get(id)
+
+    def listar(self, conta):
+        with self._cond:
+            itens = [self.agendamentos[id] for id in self.por_conta.get(conta, ())]
+        return sorted(itens, key=lambda item: (item.momento, item.id))
+
+    def __len__(self):
+        return len(self.agendamentos)
+
+    # Execução
+
+    def _retirar_vencidos(self, agora):
+        # Sai do diário antes de executar: se o processo cair no meio do
+        # lote, a transferência se perde em vez de sair em dobro
+        lote = []
+        while self.fila.heap and self.fila.heap[0].momento <= agora:
+            item = self.fila.topo()
+            lote.append((item, item.origem, item.destino, item.valor))
+            if item.recorrencia is None:
+                self._excluir(item)
+                self._anotar(["r", item.id])
+                continue
+            self.fila.remover(item)
+            item.execucoes += 1
+            # Repetições perdidas com o sistema parado não são compensadas
+            while True:
+                item.momento = ocorrencia(item.inicio, item.recorrencia,
+                                          item.execucoes)
+                if item.momento > agora:
+                    break
+                item.execucoes += 1
+            self.fila.inserir(item)
+            self._anotar(["m", item.id, item.momento, item.execucoes])
+        return lote
+
+    def _executar_lote(self, lote):
+        resultados = []
+        with self.banco.ativo():
+            for item, origem, destino, valor in lote:
+                try:
+                    resultados.append((item.id, self.executar(origem, destino, valor)))
+                    self.executados += 1
+                except ErroBancario as erro:
+                    # Sem saldo, conta encerrada...: a vez é perdida, a
+                    # recorrência continua
+                    resultados.append((item.id, erro))
+                    self.falhas += 1
+                except Exception as erro:
+                    # Erro inesperado numa transferência não pode parar a
+                    # thread: as próximas continuam saindo
+                    import logging
+                    logging.getLogger(__name__).exception(
+                        "Agendamento %s falhou", item.id)
+                    resultados.append((item.id, erro))
+                    self.falhas += 1
+        return resultados
+
+    def executar_vencidos(self, agora=None):
+        with self._cond:
+            lote = self._retirar_vencidos(
+                self.relogio() if agora is None else agora)
+        return self._executar_lote(lote)
+
+    def _rodar(self):
+        while True:
+            with self._cond:
+                while not self._parar:
+                    topo = self.fila.topo()
+                    espera = None if topo is None else topo.momento - self.relogio()
+                    if espera is not None and espera <= 0:
+                        break
+                    self._cond.wait(espera)
+                if self._parar:
+                    return
+                lote = self._retirar_vencidos(self.relogio())
+            self._executar_lote(lote)
+
+    def iniciar(self):
+        if self._thread is None:
+            self._parar = False
+            self._thread = threading.Thread(
+                target=self._rodar, name="agendador", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        with self._cond:
+            self._parar = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def fechar(self):
+        self.parar()
+        with self._cond:
+            if self._diario is not None:
+                self._diario.close()
+                self._diario = None
+
@@ -0,0 +1,83 @@
+from typing import NamedTuple
+
+from tsbanking.banco import banco_atual
+
+# Banco.assinantes: conta -> tupla de callbacks. A tupla é trocada inteira a
+# cada inscrição, então quem publica lê sem trava.
+
+
+class Mudanca(NamedTuple):
+    conta: str
+    saldo: float
+    # Posição, na visão atual do extrato, do primeiro lançamento novo
+    inicio: int
+    lancamentos: list
+    # O extrato foi limpo nesta operação; quem exibe deve recarregar
+    limpo: bool = False
+    # Versão da conta depois da operação (ver Conta.versao)
+    versao: int = 0
+
+
+def assinar(conta, callback):
+    banco = banco_atual()
+    assinantes = banco.assinantes
+    with banco.trava_assinantes:
+        assinantes[conta] = assinantes.get(conta, ()) + (callback,)
+
+    def cancelar():
+        with banco.trava_assinantes:
+            restantes = tuple(c for c in assinantes.get(conta, ())
+                              if c is not callback)
+            if restantes:
+                assinantes[conta] = restantes
+            else:
+                assinantes.pop(conta, None)
+
+    return cancelar
+
+
+def tem_assinantes(conta):
+    return conta in banco_atual().assinantes
+
+
+def mudanca(registro, linhas_antes, inicio_antes):
+    extrato = registro.extrato
+    if extrato is None:
+        return Mudanca(registro.id, registro.saldo, 0, [], versao=registro.versao)
+    primeira = max(linhas_antes, extrato.inicio)
+    return Mudanca(registro.id, registro.saldo, primeira - extrato.inicio,
+                   extrato.linhas(primeira), extrato.inicio != inicio_antes,
+                   registro.versao)
+
+
+def enfileirar(mudancas):
+    # Chamado com as travas das contas: a fila fica na ordem das gravações
+    banco_atual().publicacoes.extend(mudancas)
+
+
+def publicar():
+    """Entrega as mudanças enfileiradas, na ordem em que foram gravadas.
+    Chamado depois de liberar as travas das contas, então um assinante
+    lento não segura operações. Uma thread entrega por vez; quem chega
+    com a entrega ocupada só deixa as suas na fila, e quem entrega as leva
+    junto. Assim a v4 de uma conta nunca chega depois da v5, mesmo que a
+    thread da v4 perca a vez ao soltar a trava, e um callback que opera
+    numa conta não espera a si mesmo."""
+    banco = banco_atual()
+    fila, trava, assinantes = banco.publicacoes, banco.trava_publicacao, banco.assinantes
+    # Confere a fila de novo depois de soltar a trava: o que chegou no fim
+    # da entrega anterior não fica esquecido
+    while fila and trava.acquire(blocking=False):
+        try:
+            while fila:
+                mudanca = fila.popleft()
+                for callback in assinantes.get(mudanca.conta, ()):
+                    try:
+                        callback(mudanca)
+                    except Exception:
+                        # logging só é carregado se algum assinante falhar
+                        import logging
+                        logging.getLogger(__name__).exception(
+                            "Assinante da conta %s falhou", mudanca.conta)
+        finally:
+            trava.release()
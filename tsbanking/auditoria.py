@@ -0,0 +1,171 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time
+from itertools import accumulate
+from operator import attrgetter
+from typing import NamedTuple
+
+from tsbanking.banco import banco_atual
+from tsbanking.eventos import CREDITOS, DEBITOS, particao
+from tsbanking.registros import (
+    anexar_folha, dias_auditados, dobrar, hash_evento, seqs_da_trilha
+)
+from tsbanking.transacao import trava_da_conta
+
+# Banco.conferidos: (conta, dia) -> (raiz de Merkle, saldo final) já
+# conferidos; um dia que não mudou desde a última reconciliação não é
+# conferido de novo
+
+
+class Divergencia(NamedTuple):
+    conta: str
+    dia: str
+    # Evento onde a divergência aparece; None quando é do dia ou da conta
+    seq: object
+    motivo: str
+    esperado: object
+    encontrado: object
+
+
+def _data(dia):
+    return date.fromordinal(dia).isoformat()
+
+
+def _fotografar(registro):
+    with trava_da_conta(registro.id):
+        return (dias_auditados(registro.trilha, registro.saldo), registro.extrato,
+                seqs_da_trilha(registro.trilha))
+
+
+_seq = attrgetter("seq")
+
+
+def _no_log(eventos, seq):
+    # O log sai em ordem de seq, a menos de escritas concorrentes de contas
+    # diferentes, que trocam de lugar por poucas posições: a busca binária
+    # cai perto do evento e a procura segue para os dois lados dali
+    i = bisect_left(eventos, seq, key=_seq)
+    for distancia in range(len(eventos) + 1):
+        fora = 0
+        for j in (i - distancia, i + distancia):
+            if 0 <= j < len(eventos):
+                if eventos[j].seq == seq:
+                    return eventos[j]
+            else:
+                fora += 1
+        if fora == 2:
+            break
+    return None
+
+
+def _linhas_dos_dias(extrato, dias, eventos):
+    # seq -> (op, valor, saldo) dos lançamentos que caem nos dias sujos.
+    # Os seqs de uma conta crescem com o tempo: cada dia é uma faixa.
+    faixas = [(do_dia[0].seq, do_dia[-1].seq) for do_dia in eventos if do_dia]
+    if extrato is None or not faixas:
+        return {}
+    desde = datetime.combine(date.fromordinal(dias[0].dia), time()).timestamp()
+    bloco = extrato.colunas(extrato.buscar_momento(desde), len(extrato))
+    inicios = [inicio for inicio, _ in faixas]
+    linhas = {}
+    for seq, op, valor, saldo in zip(bloco.seqs, bloco.ops, bloco.valores,
+                                     bloco.saldos):
+        i = bisect_right(inicios, seq) - 1
+        if i >= 0 and seq <= faixas[i][1]:
+            linhas[seq] = (op, valor, saldo)
+    return linhas
+
+
+def conferir_particao(trabalho):
+    """Refaz cadeia, raiz e saldos dos dias sujos de cada conta da
+    partição. Roda no processo filho; devolve (divergências, dias ok)."""
+    divergencias, conferidos = [], []
+    for conta, (dias, linhas, eventos) in trabalho.items():
+        for dia, do_dia in zip(dias, eventos):
+            data = _data(dia.dia)
+            antes = len(divergencias)
+            pilha = []
+            cabeca, saldo = dia.cabeca_inicial, dia.saldo_inicial
+            for n, evento in enumerate(do_dia):
+                cabeca = hash_evento(cabeca, evento)
+                anexar_folha(pilha, n, cabeca)
+                if evento.tipo in CREDITOS:
+                    saldo += evento.valor
+                elif evento.tipo in DEBITOS:
+                    saldo -= evento.valor
+                if not evento.op:
+                    continue
+                linha = linhas.pop(evento.seq, None)
+                if linha is None:
+                    divergencias.append(Divergencia(
+                        conta, data, evento.seq, "lancamento_ausente",
+                        saldo, None))
+                elif linha != (evento.op, evento.valor, saldo):
+                    divergencias.append(Divergencia(
+                        conta, data, evento.seq, "extrato", saldo, linha[2]))
+            raiz = dobrar(pilha)
+            if raiz != dia.raiz or len(do_dia) != dia.folhas:
+                divergencias.append(Divergencia(conta, data, None, "raiz",
+                                                raiz.hex(), dia.raiz.hex()))
+            if cabeca != dia.cabeca:
+                divergencias.append(Divergencia(conta, data, None, "cadeia",
+                                                cabeca.hex(), dia.cabeca.hex()))
+            if saldo != dia.saldo_final:
+                divergencias.append(Divergencia(conta, data, None, "saldo_do_dia",
+                                                saldo, dia.saldo_final))
+            if len(divergencias) == antes:
+                conferidos.append((conta, dia.dia, (dia.raiz, dia.saldo_final)))
+        for seq, linha in linhas.items():
+            divergencias.append(Divergencia(conta, None, seq, "lancamento_sem_evento",
+                                            None, linha[2]))
+    return divergencias, conferidos
+
+
+def reconciliar(processos=1, completa=False):
+    """Confere, para todas as contas, a cadeia de hashes, as raízes diárias
+    e o saldo de cada lançamento do extrato contra o log de eventos. Só os
+    dias cuja raiz (ou saldo final) mudou desde a última reconciliação são
+    refeitos, a não ser com ``completa``; as partições de contas rodam em
+    paralelo."""
+    particoes = [{} for _ in range(max(processos, 1))]
+    contas = pulados = 0
+    banco = banco_atual()
+    anteriores = banco.conferidos
+    log = banco.dados["eventos"]
+    for registro in list(banco.dados["contas"].values()):
+        dias, extrato, seqs = _fotografar(registro)
+        conta = registro.id
+        sujos = [i for i, dia in enumerate(dias) if completa
+                 or anteriores.get((conta, dia.dia)) != (dia.raiz, dia.saldo_final)]
+        pulados += len(dias) - len(sujos)
+        if not sujos:
+            continue
+        # As contagens de folhas dizem que faixa de seqs é de cada dia; só
+        # os eventos dos dias sujos são buscados no log. Eventos gravados
+        # depois da foto da conta ficam de fora
+        fins = list(accumulate(dia.folhas for dia in dias))
+        eventos = [[_no_log(log, seq) for seq in seqs[fins[i] - dias[i].folhas:fins[i]]]
+                   for i in sujos]
+        eventos = [[evento for evento in do_dia if evento is not None]
+                   for do_dia in eventos]
+        dias = [dias[i] for i in sujos]
+        linhas = _linhas_dos_dias(extrato, dias, eventos)
+        particoes[particao(conta, len(particoes))][conta] = (dias, linhas, eventos)
+        contas += 1
+
+    if processos <= 1:
+        resultados = [conferir_particao(particoes[0])]
+    else:
+        # O pool compartilhado do processo (ver tsbanking.tarefas)
+        from tsbanking.tarefas import processos as pool
+        resultados = list(pool().map(conferir_particao, particoes))
+
+    divergencias = []
+    conferidos = 0
+    for parcial, ok in resultados:
+        divergencias.extend(parcial)
+        for conta, dia, chave in ok:
+            anteriores[(conta, dia)] = chave
+        conferidos += len(ok)
+    return {"contas": contas, "dias_conferidos": conferidos,
+            "dias_pulados": pulados,
+            "divergencias": [d._asdict() for d in divergencias]}
@@ -0,0 +1,132 @@
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+NUM_TRAVAS = 64  # potência de 2
+# Contas criadas em todo banco novo
+CONTAS_INICIAIS = (("principal", 1000.0), ("destino", 500.0))
+
+
+class Banco:
+    """Tudo o que é de um banco: contas, log de eventos, caixas, travas,
+    assinaturas, perfis de risco, agenda e configuração. Vários convivem no
+    mesmo processo sem dividir nada.
+
+    As funções de ``tsbanking.services`` operam sobre o banco atual: dentro
+    de ``with banco.ativo():`` é ele; fora, o banco padrão do processo. Threads
+    novas começam no padrão, então quem roda em segundo plano guarda o
+    banco em que foi criado."""
+
+    def __init__(self, nome=None):
+        self.nome = nome
+        self.dados = {
+            # Índice hash: id da conta -> Conta (projeção dos eventos)
+            "contas": {},
+            # Log imutável de eventos; saldos, extratos e carteiras derivam dele
+            "eventos": [],
+            # Contas abertas sem saldo: não geram evento, só o nome fica aqui
+            # para a reconstrução (8 bytes por conta, o id já está na memória)
+            "aberturas": [],
+            "proximo_id": 1,
+            # Caixas eletrônicos: id -> Caixa, com o estoque de notas de cada um
+            "caixas": {},
+            # Catálogo de investimentos; as posições ficam na carteira de cada conta
+            "investimentos": {
+                "CDB": {"taxa": 0.015},
+                "POUPANCA": {"taxa": 0.005},
+                "TESOURO_DIRETO": {"taxa": 0.01}
+            }
+        }
+        # next() em itertools.count é atômico no CPython
+        self.sequencia = itertools.count(1)
+        # Travas listradas: contas diferentes raramente disputam a mesma
+        # trava e a memória não cresce com o número de contas
+        self.travas = [threading.Lock() for _ in range(NUM_TRAVAS)]
+        # conta -> tupla de callbacks (ver tsbanking.assinaturas)
+        self.assinantes = {}
+        self.trava_assinantes = threading.Lock()
+        # Mudanças a entregar, na ordem em que foram gravadas
+        # (ver assinaturas.publicar)
+        self.publicacoes = deque()
+        self.trava_publicacao = threading.Lock()
+        # Estado da triagem de risco e da reconciliação
+        self.perfis = {}
+        self.alertas = deque(maxlen=1000)
+        self.conferidos = {}
+        # Despachantes das saídas de eventos em execução
+        self.despachantes = []
+        # Trabalhos em segundo plano pedidos pela API (ver tsbanking.tarefas)
+        self.tarefas = {}
+        # Ganchos deste banco; o que faltar usa o padrão do módulo
+        # ("avaliador" em risco, "dispensador" em caixas)
+        self.config = {}
+        self._agenda = None
+
+    @property
+    def agenda(self):
+        if self._agenda is None:
+            from tsbanking.agendamento import Agendador
+            self._agenda = Agendador(banco=self)
+        return self._agenda
+
+    @contextmanager
+    def ativo(self):
+        token = _atual.set(self)
+        try:
+            yield self
+        finally:
+            _atual.reset(token)
+
+    def __repr__(self):
+        return f"Banco({self.nome!r})"
+
+
+_padrao = [Banco("padrao")]
+_atual = ContextVar("banco", default=None)
+# nome -> Banco, para a API escolher o banco de cada requisição
+_bancos = {}
+_trava = threading.Lock()
+
+
+def banco_atual():
+    return _atual.get() or _padrao[0]
+
+
+def banco_padrao():
+    return _padrao[0]
+
+
+def trocar_padrao(banco):
+    # Troca o banco padrão do processo (todas as threads); devolve o anterior
+    anterior = _padrao[0]
+    _padrao[0] = banco
+    return anterior
+
+
+def criar_banco(nome=None, contas=CONTAS_INICIAIS):
+    """Banco novo com as contas iniciais e os caixas padrão. Com ``nome``,
+    fica registrado para ``obter_banco``."""
+    from tsbanking.caixas import caixas_padrao
+    from tsbanking.database import criar_conta
+    banco = Banco(nome)
+    with banco.ativo():
+        for conta, saldo in contas:
+            criar_conta(conta, saldo)
+        caixas_padrao()
+    if nome is not None:
+        with _trava:
+            if nome in _bancos:
+                raise KeyError(nome)
+            _bancos[nome] = banco
+    return banco
+
+
+def obter_banco(nome):
+    return _bancos[nome]
+
+
+def remover_banco(nome):
+    with _trava:
+        return _bancos.pop(nome)
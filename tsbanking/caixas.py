@@ -0,0 +1,195 @@
+import threading
+from functools import lru_cache
+from typing import NamedTuple
+
+from tsbanking.banco import banco_atual
+from tsbanking.database import _db
+
+DENOMINACOES = (200, 100, 50, 20, 10, 5, 2)
+ESTOQUE_MINIMO = 20        # abaixo disso a nota aparece como estoque baixo
+NOTAS_POR_CASSETE = 500
+# Menor valor que cada tipo de caixa entrega
+MULTIPLOS = {"CAIXA_10": 10, "CAIXA_20": 20, "CAIXA_50": 50, "CAIXA_100": 100}
+
+
+class Reserva(NamedTuple):
+    caixa: "Caixa"
+    notas: tuple
+
+    @property
+    def valor(self):
+        return sum(nota * quantidade for nota, quantidade in self.notas)
+
+
+class Caixa:
+    # Terminal com um cassete por nota. A trava é só do caixa e nunca é
+    # tomada junto com a de uma conta: saques em caixas diferentes não
+    # disputam entre si, e um caixa lento não segura as contas.
+    __slots__ = ("id", "notas", "minimo", "trava", "reservado", "saques",
+                 "faltas", "travamentos", "esperas")
+
+    def __init__(self, id, notas, minimo=ESTOQUE_MINIMO):
+        self.id = id
+        self.notas = {}
+        self.minimo = minimo
+        self.trava = threading.Lock()
+        # Valor em notas já separadas para saques ainda não concluídos
+        self.reservado = 0
+        # Contadores para relatório: saques concluídos, pedidos sem notas e
+        # quantas vezes a trava foi tomada e quantas delas precisou esperar
+        self.saques = self.faltas = self.travamentos = self.esperas = 0
+        self.abastecer(notas)
+
+    def travar(self):
+        if not self.trava.acquire(blocking=False):
+            self.trava.acquire()
+            self.esperas += 1
+        self.travamentos += 1
+
+    def reservar(self, valor):
+        # Tira as notas do estoque; voltam com ``liberar`` se o saque falhar
+        self.travar()
+        try:
+            notas = compor(valor, self.estoque())
+            if notas is None:
+                self.faltas += 1
+                return None
+            self.retirar(notas)
+            self.reservado += valor
+            return Reserva(self, notas)
+        finally:
+            self.trava.release()
+
+    def liberar(self, reserva):
+        self.travar()
+        try:
+            self.devolver(reserva.notas)
+            self.reservado -= reserva.valor
+        finally:
+            self.trava.release()
+
+    def confirmar(self, reserva):
+        self.travar()
+        try:
+            self.reservado -= reserva.valor
+            self.saques += 1
+        finally:
+            self.trava.release()
+
+    def estoque(self):
+        # Assinatura imutável do estoque, notas da maior para a menor
+        return tuple(sorted(self.notas.items(), reverse=True))
+
+    def total(self):
+        return sum(nota * quantidade for nota, quantidade in self.notas.items())
+
+    def estoque_baixo(self):
+        return [nota for nota, quantidade in self.estoque()
+                if quantidade < self.minimo]
+
+    def abastecer(self, notas):
+        for nota, quantidade in notas.items():
+            if nota not in DENOMINACOES:
+                raise ValueError(f"Nota inválida: {nota}")
+            if quantidade < 0:
+                raise ValueError("Quantidade de notas negativa")
+        for nota, quantidade in notas.items():
+            self.notas[nota] = self.notas.get(nota, 0) + quantidade
+
+    def retirar(self, composicao):
+        for nota, quantidade in composicao:
+            self.notas[nota] -= quantidade
+
+    def devolver(self, composicao):
+        for nota, quantidade in composicao:
+            self.notas[nota] += quantidade
+
+
+def compor(valor, estoque):
+    """Menor quantidade de notas que soma ``valor`` sem passar do estoque.
+    Devolve ``((nota, quantidade), ...)`` ou None se não houver composição."""
+    # Quantidades acima de valor // nota nunca são usadas: cortá-las deixa
+    # a chave do cache igual enquanto o estoque ainda é folgado
+    relevante = tuple((nota, min(quantidade, valor // nota))
+                      for nota, quantidade in estoque
+                      if nota <= valor and quantidade)
+    return _compor(valor, relevante)
+
+
+@lru_cache(maxsize=8192)
+def _compor(valor, estoque):
+    # Mochila limitada por busca em profundidade, das notas maiores para as
+    # menores, podando pelo mínimo de notas que ainda faltam. ``visitados``
+    # guarda, por (nota, resto), o menor número de notas já explorado dali.
+    n = len(estoque)
+    melhor = [None, valor + 1]
+    escolha = [0] * n
+    visitados = {}
+
+    def buscar(i, resto, usadas):
+        if resto == 0:
+            if usadas < melhor[1]:
+                melhor[0] = tuple(escolha)
+                melhor[1] = usadas
+            return
+        if i == n:
+            return
+        nota, quantidade = estoque[i]
+        if usadas + -(-resto // nota) >= melhor[1]:
+            return
+        chave = (i, resto)
+        if visitados.get(chave, melhor[1]) <= usadas:
+            return
+        visitados[chave] = usadas
+        for k in range(min(quantidade, resto // nota), -1, -1):
+            escolha[i] = k
+            buscar(i + 1, resto - k * nota, usadas + k)
+        escolha[i] = 0
+
+    buscar(0, valor, 0)
+    if melhor[0] is None:
+        return None
+    return tuple((nota, k) for (nota, _), k in zip(estoque, melhor[0]) if k)
+
+
+def _sem_hardware(caixa, notas):
+    pass
+
+
+# Chamado com as notas reservadas para entregá-las; uma exceção aqui desfaz
+# o saque. Trocado por quem controla o hardware (ou pela simulação);
+# Banco.config["dispensador"], se houver, vale no lugar deste para aquele banco.
+_config = {"dispensador": _sem_hardware}
+
+
+def configurar_dispensador(dispensador):
+    _config["dispensador"] = dispensador or _sem_hardware
+
+
+def dispensar(reserva):
+    dispensador = banco_atual().config.get("dispensador", _config["dispensador"])
+    dispensador(reserva.caixa, reserva.notas)
+
+
+def registrar_caixa(id, notas, minimo=ESTOQUE_MINIMO):
+    caixa = Caixa(id, notas, minimo)
+    _db["caixas"][id] = caixa
+    return caixa
+
+
+def get_caixa(id):
+    return _db["caixas"][id]
+
+
+def listar_caixas():
+    return list(_db["caixas"].values())
+
+
+def caixas_padrao():
+    # Um caixa por tipo, com as notas múltiplas do menor valor que ele entrega
+    for tipo, multiplo in MULTIPLOS.items():
+        registrar_caixa(tipo, {nota: NOTAS_POR_CASSETE for nota in DENOMINACOES
+                               if nota % multiplo == 0})
+
+
+caixas_padrao()
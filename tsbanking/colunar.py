@@ -0,0 +1,59 @@
+import struct
+from array import array
+from typing import NamedTuple
+
+# Formato colunar próprio: assinatura e, por bloco, a quantidade de linhas,
+# a conta e as colunas em sequência (inteiros/floats crus e textos com
+# tamanhos prefixados)
+ASSINATURA = b"TSBC1\n"
+_CABECALHO_BLOCO = struct.Struct("<II")
+
+
+class Bloco(NamedTuple):
+    conta: str
+    seqs: array
+    momentos: array
+    ops: list
+    valores: array
+    saldos: array
+
+
+def bloco_vazio(conta=""):
+    return Bloco(conta, array("q"), array("d"), [], array("d"), array("d"))
+
+
+def codificar_bloco(bloco):
+    ops = [op.encode() for op in bloco.ops]
+    tamanhos = array("I", map(len, ops))
+    conta = bloco.conta.encode()
+    return b"".join((
+        _CABECALHO_BLOCO.pack(len(ops), len(conta)), conta,
+        bloco.seqs.tobytes(), bloco.momentos.tobytes(),
+        bloco.valores.tobytes(), bloco.saldos.tobytes(),
+        tamanhos.tobytes(), b"".join(ops)
+    ))
+
+
+def decodificar_blocos(dados):
+    if not dados.startswith(ASSINATURA):
+        raise ValueError("Arquivo colunar inválido")
+    visao = memoryview(dados)
+    pos = len(ASSINATURA)
+    while pos < len(dados):
+        linhas, tamanho_conta = _CABECALHO_BLOCO.unpack_from(visao, pos)
+        pos += _CABECALHO_BLOCO.size
+        conta = bytes(visao[pos:pos + tamanho_conta]).decode()
+        pos += tamanho_conta
+        colunas = []
+        for codigo in ("q", "d", "d", "d", "I"):
+            coluna = array(codigo)
+            fim = pos + linhas * coluna.itemsize
+            coluna.frombytes(visao[pos:fim])
+            colunas.append(coluna)
+            pos = fim
+        seqs, momentos, valores, saldos, tamanhos = colunas
+        ops = []
+        for tamanho in tamanhos:
+            ops.append(bytes(visao[pos:pos + tamanho]).decode())
+            pos += tamanho
+        yield Bloco(conta, seqs, momentos, ops, valores, saldos)
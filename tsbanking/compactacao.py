@@ -0,0 +1,69 @@
+import threading
+import time
+from bisect import bisect_left
+
+from tsbanking import segmentos
+from tsbanking.banco import banco_atual
+from tsbanking.transacao import trava_da_conta
+
+IDADE_MAXIMA = 90 * 24 * 3600   # linhas mais velhas que isso vão para disco
+LINHAS_QUENTES = 10_000         # máximo de linhas em memória por conta
+MINIMO_SEGMENTO = 1_000         # não sela segmentos menores que isso
+
+
+class Compactador:
+    def __init__(self, idade_maxima=IDADE_MAXIMA, linhas_quentes=LINHAS_QUENTES,
+                 minimo_segmento=MINIMO_SEGMENTO, intervalo=60.0):
+        self.idade_maxima = idade_maxima
+        self.linhas_quentes = linhas_quentes
+        self.minimo_segmento = minimo_segmento
+        self.intervalo = intervalo
+        self.banco = banco_atual()
+        self._parar = threading.Event()
+        self._trava = threading.Lock()
+        self._thread = None
+
+    def linhas_a_selar(self, extrato, agora):
+        quente = extrato.quente
+        excedentes = len(quente.ops) - self.linhas_quentes
+        velhas = bisect_left(quente.momentos, agora - self.idade_maxima)
+        n = max(excedentes, velhas)
+        return n if n >= self.minimo_segmento else 0
+
+    def compactar_conta(self, registro, agora=None):
+        extrato = registro.extrato
+        if extrato is None:
+            return 0
+        n = self.linhas_a_selar(extrato, agora if agora is not None else time.time())
+        if not n:
+            return 0
+        # Compressão e escrita acontecem fora da trava: as linhas antigas
+        # não mudam, só novas linhas chegam no fim
+        base = extrato.quente.base
+        segmento = segmentos.gravar(extrato.colunas(base, base + n), base)
+        with trava_da_conta(registro.id):
+            extrato.instalar_segmento(segmento)
+        return n
+
+    def compactar(self, agora=None):
+        with self._trava, self.banco.ativo():
+            seladas = 0
+            for registro in list(self.banco.dados["contas"].values()):
+                seladas += self.compactar_conta(registro, agora)
+            return seladas
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self.compactar()
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._executar, name="compactador", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -1,53 +1,144 @@
-_db = {
-    "contas": {
-        "principal": {
-            "saldo": 1000.0,
-            "extrato": []
-        },
-        "destino": {
-            "saldo": 500.0,
-            "extrato": []
-        }
-    },
-    "investimentos": {
-        "CDB": {"valor": 0.0, "taxa": 0.015, "data_aplicacao": None},
-        "POUPANCA": {"valor": 0.0, "taxa": 0.005, "data_aplicacao": None},
-        "TESOURO_DIRETO": {"valor": 0.0, "taxa": 0.01, "data_aplicacao": None}
-    }
-}
+import time
+from collections.abc import MutableMapping
+
+from tsbanking.banco import CONTAS_INICIAIS, banco_atual
+from tsbanking.eventos import (
+    Evento, projetar, reconstruir, ABERTURA, ENCERRAMENTO, AJUSTE, LIMPEZA,
+    REGISTRO
+)
+from tsbanking.registros import Conta, Extrato  # noqa: F401
+
+
+class _DadosDoBanco(MutableMapping):
+    # Os dados do banco atual (ver tsbanking.banco); cada acesso é repassado,
+    # então quem guardou uma referência a _db sempre vê o banco certo
+    __slots__ = ()
+
+    def __getitem__(self, chave):
+        return banco_atual().dados[chave]
+
+    def __setitem__(self, chave, valor):
+        banco_atual().dados[chave] = valor
+
+    def __delitem__(self, chave):
+        del banco_atual().dados[chave]
+
+    def __iter__(self):
+        return iter(banco_atual().dados)
+
+    def __len__(self):
+        return len(banco_atual().dados)
+
+
+_db = _DadosDoBanco()
+_relogio = time.time
+
+
+def gravar_evento(registro, tipo, valor, op="", dados=None):
+    banco = banco_atual()
+    evento = Evento(next(banco.sequencia), registro.id, tipo, valor, op,
+                    _relogio(), dados)
+    banco.dados["eventos"].append(evento)
+    projetar(registro, evento)
+    return evento
+
+
+def get_eventos(nome=None):
+    if nome is None:
+        return _db["eventos"]
+    return [evento for evento in _db["eventos"] if evento.conta == nome]
+
+
+def reconstruir_projecoes(processos=1):
+    contas = reconstruir(_db["eventos"], processos)
+    for nome in _db["aberturas"]:
+        if nome not in contas:
+            contas[nome] = Conta(nome)
+    _db["contas"] = contas
 
 
 def get_conta(nome="principal"):
-    return _db["contas"][nome]
+    conta = _db["contas"][nome]
+    if not conta.ativa:
+        raise KeyError(nome)
+    return conta
+
+
+def conta_existe(nome):
+    conta = _db["contas"].get(nome)
+    return conta is not None and conta.ativa
+
+
+def criar_conta(nome=None, saldo=0.0):
+    contas = _db["contas"]
+    if nome is None:
+        # Gera ids numéricos sequenciais, pulando os que já foram usados
+        while str(_db["proximo_id"]) in contas:
+            _db["proximo_id"] += 1
+        nome = str(_db["proximo_id"])
+        _db["proximo_id"] += 1
+    elif nome in contas:
+        raise KeyError(nome)
+    conta = Conta(nome)
+    contas[nome] = conta
+    if saldo:
+        gravar_evento(conta, ABERTURA, saldo)
+    else:
+        # Conta vazia não tem o que projetar; um evento por conta custaria
+        # ~300 bytes (evento, momento, seq e trilha) em milhões de contas
+        _db["aberturas"].append(nome)
+    return conta
+
+
+def fechar_conta(nome):
+    gravar_evento(get_conta(nome), ENCERRAMENTO, 0.0)
+
+
+def total_contas():
+    return len(_db["contas"])
 
 
 def get_saldo(nome="principal"):
-    return get_conta(nome)["saldo"]
+    return get_conta(nome).saldo
 
 
 def atualizar_saldo(novo_saldo, nome="principal"):
-    get_conta(nome)["saldo"] = novo_saldo
+    conta = get_conta(nome)
+    gravar_evento(conta, AJUSTE, novo_saldo - conta.saldo)
 
 
 def registrar_operacao(operacao: str, valor: float, nome="principal"):
-    get_conta(nome)["extrato"].append({"op": operacao, "valor": valor})
+    gravar_evento(get_conta(nome), REGISTRO, valor, operacao)
 
 
-def get_extrato(nome="principal"):
-    return get_conta(nome)["extrato"]
+def get_extrato(nome="principal", completo=False):
+    extrato = get_conta(nome).extrato
+    if extrato is None:
+        return []
+    return extrato.linhas(0 if completo else None)
 
 
 def limpar_extrato(nome="principal"):
-    get_conta(nome)["extrato"] = []
-
+    # Só esconde as linhas atuais da visão; os eventos continuam no log
+    gravar_evento(get_conta(nome), LIMPEZA, 0.0)
 
-def get_investimento(tipo):
-    return _db["investimentos"][tipo]
 
-
-def atualizar_investimento(tipo, valor):
-    _db["investimentos"][tipo]["valor"] = valor
+def get_investimento(tipo, nome="principal"):
+    if tipo not in _db["investimentos"]:
+        raise KeyError(tipo)
+    conta = get_conta(nome)
+    if conta.carteira is None:
+        conta.carteira = {}
+    posicao = conta.carteira.get(tipo)
+    if posicao is None:
+        posicao = conta.carteira[tipo] = {"valor": 0.0, "data_aplicacao": None}
+    return posicao
 
 
 def get_taxa_investimento(tipo):
     return _db["investimentos"][tipo]["taxa"]
+
+
+# Banco padrão do processo
+for _nome, _saldo in CONTAS_INICIAIS:
+    criar_conta(_nome, _saldo)
@@ -0,0 +1,235 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from functools import wraps
+from inspect import signature
+
+from tsbanking.banco import banco_atual
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+LIMITE = 65_536               # registros na fila antes da política agir
+TAMANHO_LOTE = 1_000          # registros que disparam uma escrita
+INTERVALO = 0.2               # espera máxima de um registro até o disco
+TAMANHO_ARQUIVO = 64 << 20    # bytes até rotacionar
+ARQUIVOS = 5                  # arquivos rotacionados mantidos
+
+BLOQUEAR = "bloquear"
+DESCARTAR = "descartar"
+
+# Diário que recebe as operações de services; None = nada é registrado
+_ativo = [None]
+
+
+def _linha(registro):
+    momento, banco, (operacao, parametros), args, kwargs, erro = registro
+    item = {"momento": momento, "banco": banco, "operacao": operacao,
+            "parametros": {**dict(zip(parametros, args)), **kwargs},
+            "erro": erro}
+    if orjson is not None:
+        return orjson.dumps(item, default=str) + b"\n"
+    return (json.dumps(item, ensure_ascii=False, default=str) + "\n").encode()
+
+
+class Diario:
+    """Diário de auditoria: uma linha JSON por operação, gravada fora da
+    requisição.
+
+    ``registrar`` só põe uma tupla numa deque (o append é atômico, sem
+    trava); a formatação, a escrita, a rotação e a compressão ficam com a
+    thread do diário, que escreve em lotes quando a fila junta
+    ``tamanho_lote`` registros ou a cada ``intervalo``. Com a fila em
+    ``limite``, a política decide: ``bloquear`` segura quem opera até o
+    diário esvaziar a fila; ``descartar`` conta o registro perdido e segue.
+
+    Ao passar de ``tamanho_arquivo`` bytes, o arquivo vira ``caminho.1``
+    (``.1.gz`` com ``comprimir``), os anteriores avançam um número e só
+    os ``arquivos`` mais recentes ficam."""
+
+    def __init__(self, caminho, politica=BLOQUEAR, limite=LIMITE,
+                 tamanho_lote=TAMANHO_LOTE, intervalo=INTERVALO,
+                 tamanho_arquivo=TAMANHO_ARQUIVO, arquivos=ARQUIVOS,
+                 comprimir=False, sincronizar=False):
+        if politica not in (BLOQUEAR, DESCARTAR):
+            raise ValueError(f"Política inválida: {politica}")
+        self.caminho = caminho
+        self.politica = politica
+        self.limite = limite
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.tamanho_arquivo = tamanho_arquivo
+        self.arquivos = arquivos
+        self.comprimir = comprimir
+        self.sincronizar = sincronizar
+        self.fila = deque()
+        self.escritos = self.descartados = self.bloqueios = self.rotacoes = 0
+        self.ultimo_erro = None
+        self._cheia = threading.Event()
+        self._espaco = threading.Condition()
+        self._contagem = threading.Lock()
+        self._parar = False
+        self._arquivo = None
+        self._thread = None
+
+    def registrar(self, operacao, args, kwargs, erro=None):
+        fila = self.fila
+        if len(fila) >= self.limite:
+            if self.politica == DESCARTAR:
+                with self._contagem:
+                    self.descartados += 1
+                return
+            self._esperar_espaco()
+        fila.append((time.time(), banco_atual().nome, operacao, args, kwargs, erro))
+        if len(fila) >= self.tamanho_lote and not self._cheia.is_set():
+            self._cheia.set()
+
+    def _esperar_espaco(self):
+        with self._espaco:
+            self.bloqueios += 1
+            self._cheia.set()
+            while len(self.fila) >= self.limite and self._thread is not None:
+                self._espaco.wait(self.intervalo)
+
+    def _abrir(self):
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, "ab")
+        return self._arquivo
+
+    def _rotacionar(self):
+        self._arquivo.close()
+        self._arquivo = None
+        sufixo = ".gz" if self.comprimir else ""
+        antigo = f"{self.caminho}.{self.arquivos}{sufixo}"
+        if os.path.exists(antigo):
+            os.remove(antigo)
+        for i in range(self.arquivos - 1, 0, -1):
+            nome = f"{self.caminho}.{i}{sufixo}"
+            if os.path.exists(nome):
+                os.replace(nome, f"{self.caminho}.{i + 1}{sufixo}")
+        if self.comprimir:
+            # Comprime fora do caminho final: um .gz pela metade nunca
+            # aparece com o nome de um arquivo pronto
+            with open(self.caminho, "rb") as origem, \
+                    gzip.open(f"{self.caminho}.1.gz.tmp", "wb") as destino:
+                shutil.copyfileobj(origem, destino)
+            os.replace(f"{self.caminho}.1.gz.tmp", f"{self.caminho}.1.gz")
+            os.remove(self.caminho)
+        else:
+            os.replace(self.caminho, f"{self.caminho}.1")
+        self.rotacoes += 1
+
+    def descarregar(self):
+        # Escreve tudo o que está na fila agora, um write por lote; devolve
+        # quantos registros foram escritos
+        fila = self.fila
+        escritos = 0
+        while fila:
+            lote = [fila.popleft() for _ in range(min(len(fila), self.tamanho_lote))]
+            with self._espaco:
+                self._espaco.notify_all()
+            dados = b"".join(map(_linha, lote))
+            try:
+                arquivo = self._abrir()
+                arquivo.write(dados)
+                arquivo.flush()
+                if self.sincronizar:
+                    os.fsync(arquivo.fileno())
+                if arquivo.tell() >= self.tamanho_arquivo:
+                    self._rotacionar()
+            except OSError as erro:
+                # Disco com problema: o lote se perde, mas quem opera não
+                # fica parado esperando o diário
+                self.ultimo_erro = repr(erro)
+                with self._contagem:
+                    self.descartados += len(lote)
+                continue
+            self.escritos += len(lote)
+            escritos += len(lote)
+        return escritos
+
+    def _executar(self):
+        while True:
+            self._cheia.wait(self.intervalo)
+            self._cheia.clear()
+            parar = self._parar
+            self.descarregar()
+            if parar:
+                break
+
+    def situacao(self):
+        return {"arquivo": self.caminho, "politica": self.politica,
+                "pendentes": len(self.fila), "escritos": self.escritos,
+                "descartados": self.descartados, "bloqueios": self.bloqueios,
+                "rotacoes": self.rotacoes, "ultimo_erro": self.ultimo_erro}
+
+    def iniciar(self):
+        if self._thread is None:
+            self._parar = False
+            self._thread = threading.Thread(
+                target=self._executar, name="diario de auditoria", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        # Escreve o que ainda estiver na fila antes de fechar o arquivo
+        self._parar = True
+        self._cheia.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Registros de quem pegou o diário antes de ele sair de _ativo
+        self.descarregar()
+        with self._espaco:
+            self._espaco.notify_all()
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+def auditado(funcao):
+    """Registra cada chamada de ``funcao`` no diário ativo, com os
+    argumentos e o erro (nome da classe) se ela falhar. Sem diário, custa
+    uma leitura de lista. Os nomes dos parâmetros são lidos aqui, uma vez,
+    e só juntados aos valores na thread do diário."""
+    operacao = (funcao.__name__, tuple(signature(funcao).parameters))
+
+    @wraps(funcao)
+    def chamada(*args, **kwargs):
+        diario = _ativo[0]
+        if diario is None:
+            return funcao(*args, **kwargs)
+        try:
+            resultado = funcao(*args, **kwargs)
+        except Exception as erro:
+            diario.registrar(operacao, args, kwargs, type(erro).__name__)
+            raise
+        diario.registrar(operacao, args, kwargs)
+        return resultado
+    return chamada
+
+
+def diario_ativo():
+    return _ativo[0]
+
+
+def iniciar_diario(caminho, **opcoes):
+    """Passa a registrar as operações de services em ``caminho``; as
+    ``opcoes`` são as de ``Diario``. Substitui (e fecha) um diário ativo."""
+    diario = Diario(caminho, **opcoes)
+    diario.iniciar()
+    anterior, _ativo[0] = _ativo[0], diario
+    if anterior is not None:
+        anterior.parar()
+    return diario
+
+
+def parar_diario():
+    diario, _ativo[0] = _ativo[0], None
+    if diario is not None:
+        diario.parar()
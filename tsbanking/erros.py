@@ -0,0 +1,45 @@
+class ErroBancario(Exception):
+    """Erro de regra de negócio. ``status_code`` é a resposta HTTP que a API
+    usa para ele; o núcleo não depende de nenhum framework web."""
+
+    status_code = 400
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class OperacaoInvalida(ErroBancario):
+    status_code = 400
+
+
+class ValorInvalido(OperacaoInvalida):
+    pass
+
+
+class SaldoInsuficiente(OperacaoInvalida):
+    pass
+
+
+class ContaNaoEncontrada(ErroBancario):
+    status_code = 404
+
+
+class ContaJaExiste(ErroBancario):
+    status_code = 409
+
+
+class NaoEncontrado(ErroBancario):
+    status_code = 404
+
+
+class NotasIndisponiveis(OperacaoInvalida):
+    pass
+
+
+class FalhaDispensa(ErroBancario):
+    status_code = 503
+
+
+class TransferenciaBloqueada(ErroBancario):
+    status_code = 403
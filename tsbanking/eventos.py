@@ -0,0 +1,157 @@
+import zlib
+from typing import NamedTuple, Optional
+
+from tsbanking.registros import Conta, Extrato, IndiceSaldos, encadear
+
+# Tipos de evento
+ABERTURA = "abertura"
+ENCERRAMENTO = "encerramento"
+DEPOSITO = "deposito"
+SAQUE = "saque"
+SAQUE_CAIXA = "saque_caixa"
+TRANSFERENCIA_ENVIADA = "transferencia_enviada"
+TRANSFERENCIA_RECEBIDA = "transferencia_recebida"
+APLICACAO = "aplicacao"
+RESGATE = "resgate"
+# Devolução de um saque em caixa cujas notas não saíram
+ESTORNO = "estorno"
+AJUSTE = "ajuste"
+LIMPEZA = "limpeza"
+REGISTRO = "registro"
+
+# Códigos de operação dos lançamentos exibidos no extrato
+OPERACOES = (DEPOSITO, SAQUE, SAQUE_CAIXA, TRANSFERENCIA_ENVIADA,
+             TRANSFERENCIA_RECEBIDA, APLICACAO, RESGATE, ESTORNO, REGISTRO)
+
+CREDITOS = frozenset({ABERTURA, DEPOSITO, TRANSFERENCIA_RECEBIDA, RESGATE,
+                      ESTORNO, AJUSTE})
+DEBITOS = frozenset({SAQUE, SAQUE_CAIXA, TRANSFERENCIA_ENVIADA, APLICACAO})
+
+
+class Evento(NamedTuple):
+    seq: int
+    conta: str
+    tipo: str
+    # Valor do lançamento; o sinal sobre o saldo vem do tipo (AJUSTE já
+    # carrega a diferença com sinal)
+    valor: float
+    # Descrição exibida no extrato; vazia para eventos fora do extrato
+    op: str
+    momento: float
+    dados: Optional[tuple] = None
+
+
+def codigo_operacao(op):
+    # Recupera o tipo do lançamento a partir da descrição gravada no extrato
+    if op == DEPOSITO or op == SAQUE:
+        return op
+    if op.startswith("saque_caixa_"):
+        return SAQUE_CAIXA
+    if op.startswith("transferencia para "):
+        return TRANSFERENCIA_ENVIADA
+    if op.startswith("transferencia de "):
+        return TRANSFERENCIA_RECEBIDA
+    if op.startswith("aplicacao_"):
+        return APLICACAO
+    if op.startswith("resgate_"):
+        return RESGATE
+    if op.startswith("estorno_"):
+        return ESTORNO
+    return REGISTRO
+
+
+def contraparte_operacao(op):
+    # A outra conta de uma transferência, também tirada da descrição
+    if op.startswith("transferencia para "):
+        return op[len("transferencia para "):]
+    if op.startswith("transferencia de "):
+        return op[len("transferencia de "):]
+    return None
+
+
+def filtro_extrato(tipo=None, busca=None):
+    busca = busca.lower() if busca else None
+
+    def casa(op):
+        if tipo and codigo_operacao(op) != tipo:
+            return False
+        return not busca or busca in op.lower()
+    return casa
+
+
+def projetar(registro, evento):
+    tipo = evento.tipo
+    anterior = registro.saldo
+    if tipo in CREDITOS:
+        registro.saldo += evento.valor
+    elif tipo in DEBITOS:
+        registro.saldo -= evento.valor
+
+    if registro.historico is None and registro.saldo != 0:
+        registro.historico = IndiceSaldos()
+    if registro.historico is not None:
+        registro.historico.registrar(evento.momento, anterior, registro.saldo)
+
+    registro.trilha = encadear(registro.trilha, evento, anterior)
+    registro.versao = evento.seq
+
+    if evento.op:
+        if registro.extrato is None:
+            registro.extrato = Extrato()
+        registro.extrato.anexar(evento, registro.saldo)
+
+    if tipo == APLICACAO or tipo == RESGATE:
+        _projetar_carteira(registro, evento)
+    elif tipo == LIMPEZA:
+        if registro.extrato is not None:
+            registro.extrato.inicio = len(registro.extrato)
+    elif tipo == ENCERRAMENTO:
+        registro.ativa = False
+
+
+def _projetar_carteira(registro, evento):
+    investimento = evento.dados[0]
+    if registro.carteira is None:
+        registro.carteira = {}
+    posicao = registro.carteira.get(investimento)
+    if posicao is None:
+        posicao = registro.carteira[investimento] = {
+            "valor": 0.0, "data_aplicacao": None}
+    if evento.tipo == APLICACAO:
+        posicao["valor"] += evento.valor
+        posicao["data_aplicacao"] = evento.dados[1]
+    else:
+        posicao["valor"] = 0.0
+
+
+def particao(conta, particoes):
+    # crc32 é estável entre processos, ao contrário de hash() de str
+    return zlib.crc32(conta.encode()) % particoes
+
+
+def reconstruir_particao(eventos):
+    contas = {}
+    for evento in eventos:
+        registro = contas.get(evento.conta)
+        if registro is None:
+            registro = contas[evento.conta] = Conta(evento.conta)
+        projetar(registro, evento)
+    return contas
+
+
+def reconstruir(eventos, processos=1):
+    if processos <= 1:
+        return reconstruir_particao(eventos)
+
+    # Cada conta cai inteira numa partição, então as projeções de partições
+    # diferentes são independentes e podem ser refeitas em paralelo
+    particoes = [[] for _ in range(processos)]
+    for evento in eventos:
+        particoes[particao(evento.conta, processos)].append(evento)
+
+    from concurrent.futures import ProcessPoolExecutor
+    contas = {}
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        for parcial in executor.map(reconstruir_particao, particoes):
+            contas.update(parcial)
+    return contas
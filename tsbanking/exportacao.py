@@ -0,0 +1,224 @@
+import argparse
+import csv
+import io
+import shutil
+import sys
+import zlib
+from datetime import date, datetime, time, timedelta
+
+from tsbanking.colunar import ASSINATURA, codificar_bloco
+from tsbanking.database import get_conta, _db
+
+TAMANHO_BLOCO = 4096
+FORMATOS = {
+    "csv": ("text/csv", "csv"),
+    "csv.gz": ("application/gzip", "csv.gz"),
+    "colunar": ("application/octet-stream", "tsbc"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+CABECALHO = ("conta", "seq", "data", "op", "valor", "saldo")
+
+
+def _limites(inicio, fim):
+    de = datetime.combine(inicio, time()).timestamp() if inicio else None
+    ate = datetime.combine(fim + timedelta(days=1), time()).timestamp() if fim else None
+    return de, ate
+
+
+def blocos_extrato(contas, inicio=None, fim=None, completo=True,
+                   tamanho_bloco=TAMANHO_BLOCO):
+    de, ate = _limites(inicio, fim)
+    for nome in contas:
+        extrato = get_conta(nome).extrato
+        if extrato is None:
+            continue
+        primeira = 0 if completo else extrato.inicio
+        ultima = len(extrato)
+        # Os lançamentos de uma conta estão em ordem de tempo
+        if de is not None:
+            primeira = max(primeira, extrato.buscar_momento(de))
+        if ate is not None:
+            ultima = max(primeira, extrato.buscar_momento(ate))
+        for i in range(primeira, ultima, tamanho_bloco):
+            bloco = extrato.colunas(i, min(i + tamanho_bloco, ultima))
+            yield bloco._replace(conta=nome)
+
+
+class _EscritorCsv:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.escritor = csv.writer(self.buffer, lineterminator="\n")
+        self.escritor.writerow(CABECALHO)
+
+    def _drenar(self):
+        dados = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return dados
+
+    def escrever(self, bloco):
+        datas = [datetime.fromtimestamp(m).isoformat(timespec="seconds")
+                 for m in bloco.momentos]
+        self.escritor.writerows(zip(
+            [bloco.conta] * len(datas), bloco.seqs, datas, bloco.ops,
+            bloco.valores, bloco.saldos))
+        return self._drenar()
+
+    def finalizar(self):
+        return self._drenar()
+
+
+class _EscritorCsvGz(_EscritorCsv):
+    def __init__(self):
+        super().__init__()
+        self.compressor = zlib.compressobj(wbits=31)  # contêiner gzip
+
+    def escrever(self, bloco):
+        return self.compressor.compress(super().escrever(bloco))
+
+    def finalizar(self):
+        return self.compressor.compress(super().finalizar()) + self.compressor.flush()
+
+
+class _EscritorColunar:
+    def __init__(self):
+        self.inicio = ASSINATURA
+
+    def escrever(self, bloco):
+        dados, self.inicio = self.inicio + codificar_bloco(bloco), b""
+        return dados
+
+    def finalizar(self):
+        return self.inicio
+
+
+class _EscritorParquet:
+    def __init__(self):
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.buffer = io.BytesIO()
+        self.esquema = pyarrow.schema([
+            ("conta", pyarrow.string()), ("seq", pyarrow.int64()),
+            ("data", pyarrow.timestamp("us")), ("op", pyarrow.string()),
+            ("valor", pyarrow.float64()), ("saldo", pyarrow.float64())])
+        self.escritor = pyarrow.parquet.ParquetWriter(self.buffer, self.esquema)
+
+    def _drenar(self):
+        dados = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return dados
+
+    def escrever(self, bloco):
+        pa = self.pa
+        tabela = pa.table([
+            pa.array([bloco.conta] * len(bloco.ops), pa.string()),
+            pa.array(bloco.seqs, pa.int64()),
+            pa.array([int(m * 1e6) for m in bloco.momentos],
+                     pa.int64()).cast(pa.timestamp("us")),
+            pa.array(bloco.ops, pa.string()),
+            pa.array(bloco.valores, pa.float64()),
+            pa.array(bloco.saldos, pa.float64())], schema=self.esquema)
+        self.escritor.write_table(tabela)
+        return self._drenar()
+
+    def finalizar(self):
+        self.escritor.close()
+        return self._drenar()
+
+
+def _escritor(formato):
+    if formato == "csv":
+        return _EscritorCsv()
+    if formato == "csv.gz":
+        return _EscritorCsvGz()
+    if formato == "parquet":
+        return _EscritorParquet()
+    if formato == "colunar":
+        return _EscritorColunar()
+    raise ValueError(f"Formato de exportação inválido: {formato}")
+
+
+def resolver_formato(formato):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+    if formato == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            # Sem pyarrow instalado, usa o formato colunar próprio
+            return "colunar"
+    return formato
+
+
+def gerar_exportacao(contas, formato="csv", inicio=None, fim=None,
+                     completo=True, tamanho_bloco=TAMANHO_BLOCO):
+    escritor = _escritor(formato)
+    for bloco in blocos_extrato(contas, inicio, fim, completo, tamanho_bloco):
+        dados = escritor.escrever(bloco)
+        if dados:
+            yield dados
+    dados = escritor.finalizar()
+    if dados:
+        yield dados
+
+
+def exportar(saida, contas, formato="csv", inicio=None, fim=None,
+             completo=True, tamanho_bloco=TAMANHO_BLOCO):
+    total = 0
+    for dados in gerar_exportacao(contas, formato, inicio, fim, completo,
+                                  tamanho_bloco):
+        saida.write(dados)
+        total += len(dados)
+    return total
+
+
+def _baixar(url, saida, contas, formato, inicio, fim):
+    from urllib.parse import urlencode
+    from urllib.request import urlopen
+    parametros = [("conta", conta) for conta in contas] + [("formato", formato)]
+    if inicio:
+        parametros.append(("inicio", inicio.isoformat()))
+    if fim:
+        parametros.append(("fim", fim.isoformat()))
+    with urlopen(f"{url.rstrip('/')}/extrato/exportar?{urlencode(parametros)}") as resposta:
+        shutil.copyfileobj(resposta, saida, TAMANHO_BLOCO * 16)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Exporta extratos em CSV, CSV gzip ou formato colunar")
+    parser.add_argument("--conta", action="append",
+                        help="conta a exportar (pode repetir)")
+    parser.add_argument("--todas", action="store_true",
+                        help="exporta todas as contas")
+    parser.add_argument("--formato", choices=sorted(FORMATOS), default="csv")
+    parser.add_argument("--inicio", type=date.fromisoformat)
+    parser.add_argument("--fim", type=date.fromisoformat)
+    parser.add_argument("--saida", help="arquivo de saída (padrão: stdout)")
+    parser.add_argument("--url", help="baixa da API em execução em vez do "
+                        "banco local, ex.: http://localhost:8000")
+    args = parser.parse_args(argv)
+    if args.todas and args.url:
+        parser.error("--todas só vale para o banco local")
+    formato = resolver_formato(args.formato)
+
+    if args.todas:
+        contas = [nome for nome, conta in _db["contas"].items() if conta.ativa]
+    else:
+        contas = args.conta or ["principal"]
+
+    saida = open(args.saida, "wb") if args.saida else sys.stdout.buffer
+    try:
+        if args.url:
+            _baixar(args.url, saida, contas, formato, args.inicio, args.fim)
+        else:
+            exportar(saida, contas, formato, args.inicio, args.fim)
+    finally:
+        if args.saida:
+            saida.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+import zlib
+from multiprocessing.connection import wait
+
+from tsbanking import risco, services
+from tsbanking.banco import CONTAS_INICIAIS, criar_banco, trocar_padrao
+from tsbanking.erros import (
+    ContaJaExiste, ErroBancario, OperacaoInvalida, SaldoInsuficiente,
+    TransferenciaBloqueada
+)
+from tsbanking.eventos import ESTORNO, TRANSFERENCIA_ENVIADA, TRANSFERENCIA_RECEBIDA
+from tsbanking.transacao import UnidadeDeTrabalho
+
+CONEXOES = 4   # pedidos simultâneos do roteador a um mesmo fragmento
+
+# Papéis de um fragmento numa transferência entre fragmentos
+ENVIO = "envio"
+RECEBIMENTO = "recebimento"
+
+# Operações de services que um fragmento atende (todas de uma conta só)
+OPERACOES = frozenset({
+    "conta_existe", "consultar_conta", "abrir_conta", "consultar_saldo",
+    "versao_da_conta", "consultar_extrato", "consultar_extrato_pagina",
+    "depositar", "sacar", "limpar", "transferir", "aplicar_investimento",
+    "resgatar_investimento", "saque_caixa",
+})
+# Atendidas pelo Participante: o protocolo e o que depende dele
+PROTOCOLO = frozenset({
+    "preparar_envio", "preparar_recebimento", "confirmar", "abortar",
+    "em_duvida", "encerrar_conta",
+})
+
+
+def fragmento_da_conta(conta, fragmentos):
+    # crc32, e não hash(): o hash de str muda de um processo para outro
+    return zlib.crc32(conta.encode()) % fragmentos
+
+
+class Participante:
+    """Lado de um fragmento numa transferência entre fragmentos.
+
+    Preparar o envio já debita a origem (com as mesmas regras de
+    ``services.transferir``): o dinheiro sai da conta e nenhuma operação
+    posterior o gasta. Preparar o recebimento só confere o destino.
+    ``confirmar`` credita o destino; ``abortar`` devolve o débito com um
+    estorno, como o saque em caixa faz quando as notas não saem. Os dois
+    são idempotentes: repetir um id já resolvido não faz nada."""
+
+    def __init__(self):
+        # id -> (papel, conta, valor, contraparte), até a decisão chegar
+        self.preparadas = {}
+
+    def preparar_recebimento(self, id, valor, conta_destino, conta_origem):
+        services.validar_conta(conta_destino)
+        self.preparadas[id] = (RECEBIMENTO, conta_destino, valor, conta_origem)
+
+    def preparar_envio(self, id, valor, conta_destino, conta_origem):
+        with UnidadeDeTrabalho(conta_origem) as uow:
+            services.validar_valor(valor)
+            origem = uow.conta(conta_origem)
+            if valor > origem.saldo:
+                raise SaldoInsuficiente("Saldo insuficiente para transferência")
+            parecer = risco.avaliar(conta_origem, conta_destino, valor)
+            if parecer is not None and parecer.acao == risco.BLOQUEAR:
+                raise TransferenciaBloqueada(f"Transferência bloqueada: {parecer.motivo}")
+            origem.debitar(valor, f"transferencia para {conta_destino}",
+                           TRANSFERENCIA_ENVIADA, (conta_destino,))
+            self.preparadas[id] = (ENVIO, conta_origem, valor, conta_destino)
+        return None if parecer is None else parecer.motivo
+
+    def confirmar(self, id):
+        preparada = self.preparadas.get(id)
+        if preparada is None:
+            return
+        papel, conta, valor, contraparte = preparada
+        if papel == RECEBIMENTO:
+            with UnidadeDeTrabalho(conta) as uow:
+                uow.conta(conta).creditar(
+                    valor, f"transferencia de {contraparte}",
+                    TRANSFERENCIA_RECEBIDA, (contraparte,))
+        else:
+            # O perfil de risco só conta transferências que aconteceram
+            risco.registrar(conta, contraparte, valor)
+        del self.preparadas[id]
+
+    def abortar(self, id):
+        preparada = self.preparadas.get(id)
+        if preparada is None:
+            return
+        papel, conta, valor, contraparte = preparada
+        if papel == ENVIO:
+            with UnidadeDeTrabalho(conta) as uow:
+                uow.conta(conta).creditar(
+                    valor, f"estorno_transferencia para {contraparte}",
+                    ESTORNO, (contraparte,))
+        del self.preparadas[id]
+
+    def em_duvida(self):
+        return list(self.preparadas)
+
+    def encerrar_conta(self, conta):
+        # Uma conta no meio de uma transferência precisa existir até a decisão
+        if any(preparada[1] == conta for preparada in self.preparadas.values()):
+            raise OperacaoInvalida("Conta com transferência em andamento")
+        return services.encerrar_conta(conta)
+
+
+def _atender(participante, pedido):
+    operacao, args, kwargs = pedido
+    try:
+        if operacao in PROTOCOLO:
+            funcao = getattr(participante, operacao)
+        elif operacao in OPERACOES:
+            funcao = getattr(services, operacao)
+        else:
+            raise OperacaoInvalida(f"Operação desconhecida: {operacao}")
+        return "ok", funcao(*args, **kwargs)
+    except ErroBancario as erro:
+        return "erro", erro
+    except Exception as erro:
+        # A exceção pode não ser serializável; vai a descrição
+        return "erro", RuntimeError(f"{operacao}: {erro!r}")
+
+
+def _servir(indice, fragmentos, conexoes):
+    # Processo de um fragmento: um banco só com as contas dele, atendendo
+    # um pedido por vez de qualquer uma das conexões do roteador
+    trocar_padrao(criar_banco(contas=[
+        (conta, saldo) for conta, saldo in CONTAS_INICIAIS
+        if fragmento_da_conta(conta, fragmentos) == indice]))
+    participante = Participante()
+    abertas = list(conexoes)
+    while abertas:
+        for conexao in wait(abertas):
+            try:
+                pedido = conexao.recv()
+            except EOFError:
+                abertas.remove(conexao)
+                continue
+            conexao.send(_atender(participante, pedido))
+
+
+class Fragmento:
+    """Um processo dono de parte das contas, visto do roteador: algumas
+    conexões (pipes) que threads diferentes usam ao mesmo tempo, uma por
+    pedido."""
+
+    def __init__(self, indice, fragmentos, conexoes=CONEXOES, contexto=None):
+        contexto = contexto or multiprocessing.get_context("spawn")
+        pontas = [contexto.Pipe() for _ in range(conexoes)]
+        self.indice = indice
+        self.processo = contexto.Process(
+            target=_servir, args=(indice, fragmentos, [b for _, b in pontas]),
+            name=f"fragmento {indice}", daemon=True)
+        self.processo.start()
+        self.conexoes = [a for a, _ in pontas]
+        for _, ponta in pontas:
+            ponta.close()
+        self.livres = queue.SimpleQueue()
+        for conexao in self.conexoes:
+            self.livres.put(conexao)
+
+    def chamar(self, operacao, *args, **kwargs):
+        conexao = self.livres.get()
+        try:
+            conexao.send((operacao, args, kwargs))
+            situacao, resultado = conexao.recv()
+        finally:
+            self.livres.put(conexao)
+        if situacao == "erro":
+            raise resultado
+        return resultado
+
+    def fechar(self):
+        for conexao in self.conexoes:
+            conexao.close()
+        self.processo.join(5)
+        if self.processo.is_alive():
+            self.processo.terminate()
+
+
+class Roteador:
+    """Mesma interface de ``tsbanking.services`` para as operações de uma
+    conta, com as contas repartidas por hash do id entre ``fragmentos``
+    processos. Cada operação vai direto ao fragmento da conta; uma
+    transferência entre contas de fragmentos diferentes usa duas fases.
+
+    O roteador coordena: prepara o destino, depois a origem (que já
+    debita), anota a decisão de confirmar e só então confirma nos dois.
+    Se algo falha antes da decisão, os preparados são abortados; depois
+    dela, a transferência fica em dúvida nos fragmentos até
+    ``recuperar()``, que confirma o que tem decisão anotada e aborta o
+    resto. Com ``diario``, as decisões vão para um arquivo (uma linha JSON
+    por decisão e por conclusão) e as não concluídas são relidas ao abrir."""
+
+    def __init__(self, fragmentos=2, conexoes=CONEXOES, diario=None):
+        contexto = multiprocessing.get_context("spawn")
+        self.fragmentos = [Fragmento(i, fragmentos, conexoes, contexto)
+                           for i in range(fragmentos)]
+        self._ids = itertools.count(1)
+        # id -> decisão anotada e ainda não concluída nos dois fragmentos
+        self.decisoes = {}
+        self._em_andamento = set()
+        self._trava = threading.Lock()
+        self._diario = None
+        if diario is not None:
+            if os.path.exists(diario):
+                with open(diario, encoding="utf-8") as arquivo:
+                    for linha in arquivo:
+                        acao, id = json.loads(linha)
+                        if acao == "confirmar":
+                            self.decisoes[id] = acao
+                        else:
+                            self.decisoes.pop(id, None)
+            self._diario = open(diario, "a", encoding="utf-8")
+
+    def fechar(self):
+        for fragmento in self.fragmentos:
+            fragmento.fechar()
+        if self._diario is not None:
+            self._diario.close()
+
+    def fragmento(self, conta):
+        return self.fragmentos[fragmento_da_conta(conta, len(self.fragmentos))]
+
+    def _na_conta(self, conta, operacao, *args, **kwargs):
+        return self.fragmento(conta).chamar(operacao, *args, **kwargs)
+
+    # Contas
+
+    def abrir_conta(self, conta=None):
+        if conta is not None:
+            return self._na_conta(conta, "abrir_conta", conta)
+        # Os ids numéricos saem daqui, não dos fragmentos, para não repetir
+        while True:
+            nome = str(next(self._ids))
+            try:
+                return self._na_conta(nome, "abrir_conta", nome)
+            except ContaJaExiste:
+                continue
+
+    def conta_existe(self, conta):
+        return self._na_conta(conta, "conta_existe", conta)
+
+    def consultar_conta(self, conta):
+        return self._na_conta(conta, "consultar_conta", conta)
+
+    def encerrar_conta(self, conta):
+        return self._na_conta(conta, "encerrar_conta", conta)
+
+    # Leituras
+
+    def consultar_saldo(self, conta="principal"):
+        return self._na_conta(conta, "consultar_saldo", conta)
+
+    def versao_da_conta(self, conta="principal"):
+        return self._na_conta(conta, "versao_da_conta", conta)
+
+    def consultar_extrato(self, conta="principal", **filtros):
+        return self._na_conta(conta, "consultar_extrato", conta, **filtros)
+
+    def consultar_extrato_pagina(self, conta="principal", **parametros):
+        return self._na_conta(conta, "consultar_extrato_pagina", conta, **parametros)
+
+    # Escritas
+
+    def depositar(self, valor, conta="principal"):
+        return self._na_conta(conta, "depositar", valor, conta)
+
+    def sacar(self, valor, conta="principal"):
+        return self._na_conta(conta, "sacar", valor, conta)
+
+    def limpar(self, conta="principal"):
+        return self._na_conta(conta, "limpar", conta)
+
+    def aplicar_investimento(self, valor, tipo, conta="principal", data_aplicacao=None):
+        return self._na_conta(conta, "aplicar_investimento", valor, tipo, conta,
+                              data_aplicacao)
+
+    def resgatar_investimento(self, tipo, conta="principal", data_resgate=None):
+        return self._na_conta(conta, "resgatar_investimento", tipo, conta, data_resgate)
+
+    def saque_caixa(self, valor, tipo_caixa, conta="principal", caixa=None):
+        return self._na_conta(conta, "saque_caixa", valor, tipo_caixa, conta, caixa)
+
+    def transferir(self, valor, conta_destino, conta_origem):
+        origem, destino = self.fragmento(conta_origem), self.fragmento(conta_destino)
+        if origem is destino:
+            return origem.chamar("transferir", valor, conta_destino, conta_origem)
+
+        services.validar_valor(valor)
+        id = uuid.uuid4().hex
+        with self._trava:
+            self._em_andamento.add(id)
+        try:
+            destino.chamar("preparar_recebimento", id, valor, conta_destino, conta_origem)
+            try:
+                alerta = origem.chamar("preparar_envio", id, valor, conta_destino,
+                                       conta_origem)
+            except BaseException:
+                # Sem decisão anotada: se este aborto não chegar, recuperar()
+                # aborta depois
+                destino.chamar("abortar", id)
+                raise
+            self._anotar("confirmar", id)
+            destino.chamar("confirmar", id)
+            origem.chamar("confirmar", id)
+            self._anotar("concluida", id)
+        finally:
+            with self._trava:
+                self._em_andamento.discard(id)
+
+        resultado = {"mensagem": f"Transferido R$ {valor:.2f} para {conta_destino}"}
+        if alerta is not None:
+            resultado["alerta"] = alerta
+        return resultado
+
+    def _anotar(self, acao, id):
+        with self._trava:
+            if acao == "confirmar":
+                self.decisoes[id] = acao
+            else:
+                self.decisoes.pop(id, None)
+            if self._diario is not None:
+                # A decisão precisa estar no disco antes de qualquer confirmação
+                self._diario.write(json.dumps([acao, id]) + "\n")
+                self._diario.flush()
+                os.fsync(self._diario.fileno())
+
+    def recuperar(self):
+        """Resolve as transferências em dúvida nos fragmentos: confirma as
+        que têm decisão anotada e aborta as outras (sem decisão, o
+        coordenador nunca confirmou). Ignora as que ainda estão em curso
+        neste roteador. Devolve quantas resolveu."""
+        resolvidas = 0
+        for fragmento in self.fragmentos:
+            for id in fragmento.chamar("em_duvida"):
+                # Um id só entra em _em_andamento antes de ser preparado;
+                # fora dele, o coordenador já desistiu
+                with self._trava:
+                    if id in self._em_andamento:
+                        continue
+                    acao = self.decisoes.get(id, "abortar")
+                fragmento.chamar(acao, id)
+                resolvidas += 1
+        with self._trava:
+            pendentes = [id for id in self.decisoes if id not in self._em_andamento]
+        for id in pendentes:
+            self._anotar("concluida", id)
+        return resolvidas
@@ -0,0 +1,144 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from tsbanking.eventos import codigo_operacao, contraparte_operacao
+from tsbanking.transacao import trava_da_conta
+
+CARGA = 512           # linhas por bloco do índice de valores (até o dobro)
+LOTE_CARGA = 4096     # linhas lidas por vez ao montar o índice
+
+
+class ValoresOrdenados:
+    """Posições das linhas ordenadas por valor, em blocos pequenos: inserir
+    é um bisect nos máximos e outro no bloco, e o deslocamento fica dentro
+    de um bloco de no máximo 2 * CARGA linhas, sem reordenações grandes."""
+
+    __slots__ = ("maximos", "valores", "posicoes")
+
+    def __init__(self):
+        self.maximos = []
+        self.valores = []
+        self.posicoes = []
+
+    def __len__(self):
+        return sum(len(bloco) for bloco in self.valores)
+
+    def inserir(self, valor, posicao):
+        if not self.valores:
+            self.maximos.append(valor)
+            self.valores.append(array("d", (valor,)))
+            self.posicoes.append(array("I", (posicao,)))
+            return
+        k = min(bisect_left(self.maximos, valor), len(self.maximos) - 1)
+        valores, posicoes = self.valores[k], self.posicoes[k]
+        i = bisect_right(valores, valor)
+        valores.insert(i, valor)
+        posicoes.insert(i, posicao)
+        self.maximos[k] = valores[-1]
+        if len(valores) > 2 * CARGA:
+            self.valores[k:k + 1] = [valores[:CARGA], valores[CARGA:]]
+            self.posicoes[k:k + 1] = [posicoes[:CARGA], posicoes[CARGA:]]
+            self.maximos[k:k + 1] = [valores[CARGA - 1], valores[-1]]
+
+    def entre(self, minimo=None, maximo=None):
+        # Posições com minimo <= valor <= maximo, na ordem dos valores
+        encontradas = array("I")
+        k = 0 if minimo is None else bisect_left(self.maximos, minimo)
+        while k < len(self.valores):
+            valores = self.valores[k]
+            i = 0 if minimo is None else bisect_left(valores, minimo)
+            j = len(valores) if maximo is None else bisect_right(valores, maximo)
+            encontradas.extend(self.posicoes[k][i:j])
+            if j < len(valores):
+                break
+            k += 1
+        return encontradas
+
+
+class IndiceExtrato:
+    """Índices secundários de um extrato, por posição de linha: código da
+    operação -> posições, contraparte -> posições e as posições ordenadas
+    por valor. As posições só crescem, então cada lista invertida já está
+    em ordem. ``Extrato.anexar`` mantém o índice a cada linha gravada."""
+
+    __slots__ = ("linhas", "por_codigo", "por_contraparte", "valores")
+
+    def __init__(self):
+        self.linhas = 0
+        self.por_codigo = {}
+        self.por_contraparte = {}
+        self.valores = ValoresOrdenados()
+
+    def anexar(self, posicao, op, valor):
+        codigo = codigo_operacao(op)
+        lista = self.por_codigo.get(codigo)
+        if lista is None:
+            lista = self.por_codigo[codigo] = array("I")
+        lista.append(posicao)
+        contraparte = contraparte_operacao(op)
+        if contraparte is not None:
+            lista = self.por_contraparte.get(contraparte)
+            if lista is None:
+                lista = self.por_contraparte[contraparte] = array("I")
+            lista.append(posicao)
+        self.valores.inserir(valor, posicao)
+        self.linhas = posicao + 1
+
+    def carregar(self, extrato, fim):
+        for inicio in range(self.linhas, fim, LOTE_CARGA):
+            bloco = extrato.colunas(inicio, min(inicio + LOTE_CARGA, fim))
+            for i, (op, valor) in enumerate(zip(bloco.ops, bloco.valores)):
+                self.anexar(inicio + i, op, valor)
+
+    def consultar(self, tipo=None, contraparte=None, minimo=None, maximo=None):
+        """Posições que passam em todos os filtros, em ordem. Cada filtro
+        dá uma lista ordenada de posições; a interseção percorre a menor e
+        procura cada posição nas outras por bisect, sem ler nenhuma linha
+        do extrato."""
+        listas = []
+        if tipo is not None:
+            listas.append(self.por_codigo.get(tipo, ()))
+        if contraparte is not None:
+            listas.append(self.por_contraparte.get(contraparte, ()))
+        if minimo is not None or maximo is not None:
+            listas.append(sorted(self.valores.entre(minimo, maximo)))
+        listas.sort(key=len)
+        menor, outras = listas[0], listas[1:]
+        if not outras:
+            return list(menor)
+        cursores = [0] * len(outras)
+        encontradas = []
+        for posicao in menor:
+            for k, outra in enumerate(outras):
+                i = cursores[k] = bisect_left(outra, posicao, cursores[k])
+                if i == len(outra) or outra[i] != posicao:
+                    break
+            else:
+                encontradas.append(posicao)
+        return encontradas
+
+
+def indice_do_extrato(conta, extrato):
+    """Índice do extrato, montado na primeira consulta. As linhas já
+    gravadas são lidas fora da trava da conta (podem estar em disco); só
+    as que chegaram durante a leitura são indexadas com a trava, junto com
+    a instalação do índice."""
+    indice = extrato.indice
+    if indice is not None:
+        return indice
+    novo = IndiceExtrato()
+    novo.carregar(extrato, len(extrato))
+    with trava_da_conta(conta):
+        if extrato.indice is None:
+            novo.carregar(extrato, len(extrato))
+            extrato.indice = novo
+        return extrato.indice
+
+
+def filtrar(conta, extrato, tipo=None, contraparte=None, minimo=None, maximo=None):
+    # Posições absolutas das linhas que passam nos filtros, com pelo menos
+    # um filtro. A consulta roda com a trava da conta: uma linha nova não
+    # muda o índice no meio dela
+    indice = indice_do_extrato(conta, extrato)
+    with trava_da_conta(conta):
+        return indice.consultar(tipo, contraparte, minimo, maximo)
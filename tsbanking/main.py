@@ -1,26 +1,150 @@
-from datetime import datetime, time
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+from contextlib import asynccontextmanager
+import os
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+from fastapi import (
+    Depends, FastAPI, Header, HTTPException, Query, Response, WebSocket
+)
+from fastapi.responses import StreamingResponse
+from tsbanking.banco import _atual, banco_atual, obter_banco
+from tsbanking.erros import ErroBancario, NaoEncontrado
 from tsbanking.models import (
-    Transacao, Transferencia, TipoTransferencia,
+    Transacao, Transferencia, TipoTransferencia, TransferenciaAgendada,
     TipoInvestimento, InvestimentoAplicacao, InvestimentoResgate,
-    TipoCaixa, SaqueCaixa
+    TipoCaixa, SaqueCaixa, Abastecimento, NovaConta, ADAPTADOR_EXTRATO,
+    ADAPTADOR_EXTRATO_COLUNAR, ADAPTADOR_PAGINA, ADAPTADOR_HISTORICO
 )
+from tsbanking.respostas import RespostaRapida, extrato_colunas, serializar
 from tsbanking.services import (
     depositar, sacar, consultar_saldo, consultar_extrato, limpar, transferir,
-    aplicar_investimento, resgatar_investimento, saque_caixa
+    consultar_saldo_em, consultar_historico_saldo, exportar_extrato,
+    consultar_extrato_pagina, consultar_extrato_colunas,
+    aplicar_investimento, resgatar_investimento, saque_caixa,
+    abrir_conta, consultar_conta, encerrar_conta, consultar_caixa,
+    abastecer_caixa, caixas_com_estoque_baixo, agendar_transferencia,
+    consultar_agendamento, listar_agendamentos, cancelar_agendamento,
+    iniciar_provisao, consultar_tarefa, reconciliar_contas, consultar_risco,
+    alertas_de_risco, situacao_saidas, situacao_diario, versao_da_conta, relatorio_memoria,
+    pedir_coleta_memoria, fotografar_memoria, comparar_memoria,
+    parar_rastreio_memoria
 )
+from tsbanking.compactacao import Compactador
+from tsbanking import memoria
+from tsbanking.diario import BLOQUEAR, iniciar_diario, parar_diario
+from tsbanking.saidas import iniciar_saidas, parar_saidas
+from tsbanking.tarefas import encerrar_processos
+from tsbanking.transmissao import BATIMENTO, Inscricao
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # O trabalho em segundo plano é do banco padrão; bancos criados com
+    # criar_banco iniciam o seu por conta própria
+    agenda = banco_atual().agenda
+    # Move extratos antigos para segmentos em disco em segundo plano
+    compactador = Compactador()
+    compactador.iniciar()
+    # Transferências agendadas; com TSBANKING_AGENDA elas sobrevivem a
+    # reinícios
+    if os.environ.get("TSBANKING_AGENDA"):
+        agenda.abrir_diario(os.environ["TSBANKING_AGENDA"])
+    agenda.iniciar()
+    # Eventos entregues em lotes aos sistemas em TSBANKING_SAIDAS
+    iniciar_saidas(os.environ.get("TSBANKING_SAIDAS", ""))
+    # Uma linha por operação em TSBANKING_AUDITORIA, escrita em lotes
+    if os.environ.get("TSBANKING_AUDITORIA"):
+        iniciar_diario(
+            os.environ["TSBANKING_AUDITORIA"],
+            politica=os.environ.get("TSBANKING_AUDITORIA_POLITICA", BLOQUEAR),
+            comprimir=os.environ.get("TSBANKING_AUDITORIA_COMPRIMIR") == "1")
+    # Medição de memória para /debug/memoria, fora das requisições
+    if memoria._config["habilitado"]:
+        memoria.coletor.iniciar()
+    yield
+    memoria.coletor.parar()
+    parar_diario()
+    parar_saidas()
+    agenda.parar()
+    compactador.parar()
+    encerrar_processos()
+
+
+async def banco_da_requisicao(x_banco: Optional[str] = Header(None)):
+    # Assíncrona de propósito: roda na tarefa da requisição, e o banco
+    # escolhido aqui vale para o endpoint e para a thread que o executa
+    if x_banco is not None:
+        try:
+            _atual.set(obter_banco(x_banco))
+        except KeyError:
+            raise NaoEncontrado(f"Banco '{x_banco}' não encontrado")
+
+
+app = FastAPI(lifespan=ciclo_de_vida, default_response_class=RespostaRapida,
+              dependencies=[Depends(banco_da_requisicao)])
+
+
+@app.exception_handler(ErroBancario)
+async def erro_bancario(request, erro: ErroBancario):
+    # Os serviços não conhecem HTTP: a tradução para resposta fica aqui
+    return RespostaRapida({"detail": erro.detail}, status_code=erro.status_code)
+
 
-app = FastAPI()
+@app.post("/contas", status_code=201)
+def criar_conta(nova: NovaConta):
+    return abrir_conta(nova.conta)
+
+
+@app.get("/contas/{conta}")
+def obter_conta(conta: str):
+    return consultar_conta(conta)
+
+
+@app.delete("/contas/{conta}")
+def fechar_conta(conta: str):
+    return encerrar_conta(conta)
+
+
+def _etag(conta, if_none_match):
+    # A versão é lida antes dos dados: se a conta mudar no meio, a resposta
+    # sai com a versão anterior e o próximo pedido simplesmente a refaz
+    etag = f'"{versao_da_conta(conta)}"'
+    if if_none_match is not None and any(
+            valor.strip().removeprefix("W/") in (etag, "*")
+            for valor in if_none_match.split(",")):
+        return etag, Response(status_code=304, headers={"ETag": etag})
+    return etag, None
 
 
 @app.get("/saldo")
-def saldo():
-    return {"saldo": consultar_saldo()}
+def saldo(
+    response: Response,
+    conta: str = Query("principal"),
+    em: Optional[date] = Query(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    etag, inalterado = _etag(conta, if_none_match)
+    if inalterado is not None:
+        return inalterado
+    response.headers["ETag"] = etag
+    if em is not None:
+        return {"saldo": consultar_saldo_em(em, conta), "em": em.isoformat()}
+    return {"saldo": consultar_saldo(conta)}
+
+
+@app.get("/saldo/historico", response_class=RespostaRapida)
+def historico_saldo(
+    conta: str = Query("principal"),
+    inicio: Optional[date] = Query(None),
+    fim: Optional[date] = Query(None)
+):
+    return RespostaRapida(consultar_historico_saldo(conta, inicio, fim),
+                          ADAPTADOR_HISTORICO)
 
 
 @app.post("/depositar")
 def depositar_valor(transacao: Transacao):
-    return depositar(transacao.valor)
+    return depositar(transacao.valor, transacao.conta)
 
 
 @app.post("/sacar")
@@ -30,14 +154,132 @@ def sacar_valor(transacao: Transacao):
     return sacar(transacao.valor, conta)
 
 
-@app.get("/extrato")
-def extrato(conta: str = Query("principal")):
-    return {"extrato": consultar_extrato(conta)}
+# Respostas grandes saem direto em RespostaRapida, sem jsonable_encoder
+
+@app.get("/extrato", response_class=RespostaRapida)
+def extrato(
+    conta: str = Query("principal"),
+    colunas: bool = Query(False),
+    tipo: Optional[str] = Query(None),
+    contraparte: Optional[str] = Query(None),
+    valor_min: Optional[float] = Query(None),
+    valor_max: Optional[float] = Query(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    etag, inalterado = _etag(conta, if_none_match)
+    if inalterado is not None:
+        return inalterado
+    if tipo is not None or contraparte is not None or valor_min is not None \
+            or valor_max is not None:
+        linhas = consultar_extrato(conta, tipo, contraparte, valor_min, valor_max)
+        return RespostaRapida({"extrato": linhas}, ADAPTADOR_EXTRATO,
+                              headers={"ETag": etag})
+    if colunas:
+        bloco = consultar_extrato_colunas(conta)
+        return RespostaRapida({"extrato": extrato_colunas(bloco)},
+                              ADAPTADOR_EXTRATO_COLUNAR, headers={"ETag": etag})
+    return RespostaRapida({"extrato": consultar_extrato(conta)}, ADAPTADOR_EXTRATO,
+                          headers={"ETag": etag})
+
+
+@app.get("/extrato/pagina", response_class=RespostaRapida)
+def extrato_paginado(
+    conta: str = Query("principal"),
+    inicio: int = Query(0),
+    limite: int = Query(100, le=1000),
+    tipo: Optional[str] = Query(None),
+    busca: Optional[str] = Query(None),
+    desde: Optional[int] = Query(None),
+    contraparte: Optional[str] = Query(None),
+    valor_min: Optional[float] = Query(None),
+    valor_max: Optional[float] = Query(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    # ``desde`` recebe a ``versao`` de uma página anterior: vêm só as
+    # linhas novas desde então
+    etag, inalterado = _etag(conta, if_none_match)
+    if inalterado is not None:
+        return inalterado
+    return RespostaRapida(consultar_extrato_pagina(conta, inicio, limite, tipo, busca,
+                                                   desde=desde, contraparte=contraparte,
+                                                   valor_min=valor_min,
+                                                   valor_max=valor_max),
+                          ADAPTADOR_PAGINA, headers={"ETag": etag})
+
+
+@app.get("/extrato/exportar")
+def exportar(
+    conta: List[str] = Query(["principal"]),
+    formato: str = Query("csv"),
+    inicio: Optional[date] = Query(None),
+    fim: Optional[date] = Query(None)
+):
+    # Gerado em blocos: a resposta sai com Transfer-Encoding chunked
+    blocos, tipo_midia, extensao = exportar_extrato(conta, formato, inicio, fim)
+    return StreamingResponse(blocos, media_type=tipo_midia, headers={
+        "Content-Disposition": f'attachment; filename="extrato.{extensao}"'})
+
+
+def _evento_sse(mensagem):
+    return b"event: " + mensagem["tipo"].encode() + b"\ndata: " + serializar(mensagem) + b"\n\n"
+
+
+@app.get("/eventos")
+async def eventos_sse(conta: List[str] = Query(["principal"])):
+    # Server-Sent Events: saldo e lançamentos novos das contas a cada
+    # operação, sem o cliente precisar consultar
+    inscricao = Inscricao(conta)
+
+    async def fluxo():
+        try:
+            yield _evento_sse(inscricao.abertura())
+            while True:
+                mensagem = await inscricao.proxima(BATIMENTO)
+                # Comentário SSE mantém a conexão viva nos proxies
+                yield b":\n\n" if mensagem is None else _evento_sse(mensagem)
+        finally:
+            inscricao.fechar()
+
+    return StreamingResponse(fluxo(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@app.websocket("/eventos/ws")
+async def eventos_ws(websocket: WebSocket, conta: List[str] = Query(["principal"])):
+    # As mesmas mensagens do /eventos, uma por mensagem de texto JSON
+    await websocket.accept()
+    try:
+        inscricao = Inscricao(conta)
+    except ErroBancario as erro:
+        await websocket.close(code=4000 + erro.status_code, reason=erro.detail)
+        return
+
+    async def ate_fechar():
+        # O cliente só fala para fechar; ler em paralelo percebe a saída dele
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    fechamento = asyncio.ensure_future(ate_fechar())
+    try:
+        await websocket.send_json(inscricao.abertura())
+        while True:
+            proxima = asyncio.ensure_future(inscricao.proxima(BATIMENTO))
+            await asyncio.wait((proxima, fechamento),
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not proxima.done():
+                proxima.cancel()
+                break
+            mensagem = proxima.result()
+            if mensagem is not None:
+                await websocket.send_json(mensagem)
+    finally:
+        fechamento.cancel()
+        inscricao.fechar()
 
 
 @app.post("/limpar")
-def limpar_historico():
-    return limpar()
+def limpar_historico(conta: str = Query("principal")):
+    return limpar(conta)
 
 
 @app.post("/transferir")
@@ -63,16 +305,24 @@ def transferir_endpoint(transfer: Transferencia):
 
     elif transfer.tipo_transferencia == TipoTransferencia.TED:
         # TED permitido apenas entre 6h e 17h
-        if not (time(6, 0) <= hora_atual <= time(17, 0)):
-            raise HTTPException(
-                status_code=400,
-                detail="TED só permitido entre 06:00 e 17:00"
-            )
         if transfer.valor > 50000:
             raise HTTPException(
                 status_code=400,
                 detail="Valor excede limite do TED (R$50.000)"
             )
+        if not (time(6, 0) <= hora_atual <= time(17, 0)):
+            if not transfer.agendar_fora_do_horario:
+                raise HTTPException(
+                    status_code=400,
+                    detail="TED só permitido entre 06:00 e 17:00"
+                )
+            # Fica para as 06:00 da próxima janela
+            abertura = datetime.combine(agora.date(), time(6, 0))
+            if hora_atual > time(17, 0):
+                abertura += timedelta(days=1)
+            return RespostaRapida(agendar_transferencia(
+                transfer.valor, transfer.conta_destino, transfer.conta_origem,
+                abertura), status_code=202)
 
     elif transfer.tipo_transferencia == TipoTransferencia.INTERNA:
         if transfer.valor > 100000:
@@ -96,16 +346,127 @@ def transferir_endpoint(transfer: Transferencia):
     )
 
 
+@app.post("/agendamentos", status_code=201)
+def agendar(agendamento: TransferenciaAgendada):
+    return agendar_transferencia(
+        agendamento.valor, agendamento.conta_destino, agendamento.conta_origem,
+        agendamento.executar_em, agendamento.recorrencia)
+
+
+@app.get("/agendamentos")
+def agendamentos(conta: str = Query("principal")):
+    return {"agendamentos": listar_agendamentos(conta)}
+
+
+@app.get("/agendamentos/{id}")
+def obter_agendamento(id: int):
+    return consultar_agendamento(id)
+
+
+@app.delete("/agendamentos/{id}")
+def cancelar(id: int):
+    return cancelar_agendamento(id)
+
+
+@app.get("/saidas")
+def saidas():
+    return {"saidas": situacao_saidas()}
+
+
+@app.get("/auditoria/diario")
+def diario():
+    return situacao_diario()
+
+
+# Diagnóstico de memória; só com TSBANKING_DEBUG=1
+
+@app.get("/debug/memoria")
+def memoria_relatorio():
+    relatorio = relatorio_memoria()
+    if relatorio is None:
+        return RespostaRapida({"mensagem": "Primeira coleta ainda não terminou"},
+                              status_code=202)
+    return relatorio
+
+
+@app.post("/debug/memoria/coletar", status_code=202)
+def memoria_coletar():
+    return pedir_coleta_memoria()
+
+
+@app.post("/debug/memoria/fotos", status_code=201)
+def memoria_fotografar():
+    return fotografar_memoria()
+
+
+@app.get("/debug/memoria/fotos/{de}/diferenca")
+def memoria_diferenca(
+    de: int,
+    ate: Optional[int] = Query(None),
+    top: int = Query(20, ge=1, le=500),
+    agrupar: str = Query("lineno")
+):
+    return comparar_memoria(de, ate, top, agrupar)
+
+
+@app.delete("/debug/memoria/fotos")
+def memoria_parar_rastreio():
+    return parar_rastreio_memoria()
+
+
+@app.get("/risco/alertas")
+def risco_alertas():
+    return {"alertas": alertas_de_risco()}
+
+
+@app.get("/risco/{conta}")
+def risco_da_conta(conta: str):
+    return consultar_risco(conta)
+
+
 @app.post("/investir")
 def investir(aplicacao: InvestimentoAplicacao):
-    return aplicar_investimento(aplicacao.valor, aplicacao.tipo_investimento)
+    return aplicar_investimento(aplicacao.valor, aplicacao.tipo_investimento,
+                                aplicacao.conta)
 
 
 @app.post("/resgatar_investimento")
 def resgatar(resgate: InvestimentoResgate):
-    return resgatar_investimento(resgate.tipo_investimento)
+    return resgatar_investimento(resgate.tipo_investimento, resgate.conta)
+
+
+@app.post("/investimentos/provisao", status_code=202)
+def provisao(data: Optional[date] = Query(None)):
+    # Disparado pela rotina noturna; a foto fica em TSBANKING_PROVISAO. A
+    # resposta sai na hora; a situação fica em /tarefas/{id}
+    return iniciar_provisao(data)
+
+
+@app.get("/tarefas/{id}")
+def tarefa(id: int):
+    return consultar_tarefa(id)
+
+
+@app.post("/auditoria/reconciliar")
+def reconciliar(completa: bool = Query(False)):
+    return reconciliar_contas(completa)
 
 
 @app.post("/saque_caixa")
 def saque_em_caixa(saida: SaqueCaixa):
-    return saque_caixa(saida.valor, saida.tipo_caixa)
+    return saque_caixa(saida.valor, saida.tipo_caixa, saida.conta, saida.caixa)
+
+
+@app.get("/caixas/estoque_baixo")
+def estoque_baixo():
+    return {"caixas": caixas_com_estoque_baixo()}
+
+
+@app.get("/caixas/{caixa}")
+def obter_caixa(caixa: str):
+    return consultar_caixa(caixa)
+
+
+@app.post("/caixas/{caixa}/abastecer")
+def abastecer(caixa: str, abastecimento: Abastecimento):
+    return abastecer_caixa(caixa, abastecimento.notas)
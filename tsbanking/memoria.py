@@ -0,0 +1,252 @@
+import gc
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from sys import getsizeof
+
+from tsbanking.banco import _bancos, banco_padrao
+
+INTERVALO = 60.0       # segundos entre coletas
+AMOSTRA = 256          # eventos e descrições medidos para estimar a média
+CONTAS_POR_PAUSA = 1000
+
+# /debug/memoria só responde com TSBANKING_DEBUG=1
+_config = {"habilitado": os.environ.get("TSBANKING_DEBUG") == "1"}
+
+
+def _arrays(*colunas):
+    return sum(getsizeof(coluna) for coluna in colunas)
+
+
+def _media(itens, medir):
+    # Tamanho médio de uma amostra espaçada pelos itens
+    if not itens:
+        return 0.0
+    passo = max(len(itens) // AMOSTRA, 1)
+    amostra = itens[::passo]
+    return sum(medir(item) for item in amostra) / len(amostra)
+
+
+def _evento(evento):
+    return (getsizeof(evento) + getsizeof(evento.op) + getsizeof(evento.valor)
+            + getsizeof(evento.momento) + getsizeof(evento.seq)
+            + (getsizeof(evento.dados) if evento.dados is not None else 0))
+
+
+def _extrato(extrato, parcial):
+    quente = extrato.quente
+    linhas = len(quente.ops)
+    parcial["linhas_em_memoria"] += linhas
+    parcial["linhas_em_disco"] += quente.base
+    parcial["segmentos"] += len(extrato.segmentos or ())
+    # As descrições são a maior parte: estimadas pela média das últimas
+    ops = quente.ops[-16:]
+    descricoes = sum(map(getsizeof, ops)) / len(ops) * linhas if ops else 0
+    parcial["bytes"] += (getsizeof(extrato) + getsizeof(quente) + getsizeof(quente.ops)
+                         + _arrays(quente.seqs, quente.valores, quente.momentos,
+                                   quente.saldos)
+                         + descricoes + getsizeof(extrato.segmentos or ()))
+
+
+def _indice(indice, parcial):
+    listas = list(indice.por_codigo.values()) + list(indice.por_contraparte.values())
+    valores = indice.valores
+    parcial["entradas"] += indice.linhas
+    parcial["bytes"] += (getsizeof(indice) + getsizeof(indice.por_codigo)
+                         + getsizeof(indice.por_contraparte) + _arrays(*listas)
+                         + getsizeof(valores.maximos) + _arrays(*valores.valores)
+                         + _arrays(*valores.posicoes))
+
+
+def _historico(historico):
+    arvore = historico.arvore
+    return (getsizeof(historico) + _arrays(historico.dias, historico.fechamentos)
+            + getsizeof(arvore) + _arrays(arvore.minimos, arvore.maximos))
+
+
+def _trilha(trilha):
+    if isinstance(trilha, bytes):
+        return getsizeof(trilha)
+    return (getsizeof(trilha) + getsizeof(trilha.pilha) + sum(map(getsizeof, trilha.pilha))
+            + _arrays(trilha.dias, trilha.contagens, trilha.saldos, trilha.elos,
+                      trilha.seqs))
+
+
+def medir_banco(banco):
+    """Memória de cada estrutura do banco, pelos tamanhos que elas já
+    mantêm (comprimento das colunas, das listas invertidas, dos dias...):
+    uma passada pelas contas, sem percorrer linha a linha. Descrições e
+    eventos entram pela média de uma amostra."""
+    contas = {"quantidade": 0, "bytes": 0}
+    extratos = {"linhas_em_memoria": 0, "linhas_em_disco": 0, "segmentos": 0,
+                "bytes": 0}
+    indices = {"entradas": 0, "bytes": 0}
+    historicos = {"bytes": 0}
+    trilhas = {"bytes": 0}
+    carteiras = {"posicoes": 0, "bytes": 0}
+    for n, registro in enumerate(list(banco.dados["contas"].values()), 1):
+        contas["quantidade"] += 1
+        contas["bytes"] += getsizeof(registro) + getsizeof(registro.id)
+        extrato = registro.extrato
+        if extrato is not None:
+            _extrato(extrato, extratos)
+            if extrato.indice is not None:
+                _indice(extrato.indice, indices)
+        if registro.historico is not None:
+            historicos["bytes"] += _historico(registro.historico)
+        if registro.trilha is not None:
+            trilhas["bytes"] += _trilha(registro.trilha)
+        if registro.carteira:
+            carteiras["posicoes"] += len(registro.carteira)
+            carteiras["bytes"] += getsizeof(registro.carteira) + sum(
+                getsizeof(posicao) for posicao in registro.carteira.values())
+        if n % CONTAS_POR_PAUSA == 0:
+            # Devolve o GIL às requisições durante a passada
+            time.sleep(0)
+    for parcial in (contas, extratos, indices, historicos, trilhas, carteiras):
+        parcial["bytes"] = int(parcial["bytes"])
+
+    eventos = banco.dados["eventos"]
+    perfis = list(banco.perfis.values())
+    return {
+        "contas": contas,
+        "extratos": extratos,
+        "indices": indices,
+        "historicos": historicos,
+        "trilhas": trilhas,
+        "carteiras": carteiras,
+        "eventos": {"quantidade": len(eventos), "bytes": int(
+            getsizeof(eventos) + len(eventos) * _media(eventos, _evento))},
+        "risco": {"perfis": len(perfis), "bytes": int(len(perfis) * _media(
+            perfis, lambda p: getsizeof(p) + getsizeof(p.destinos)
+            + getsizeof(p.contagens) + getsizeof(p.somas)))},
+        "assinaturas": {"contas": len(banco.assinantes)},
+        "agendamentos": {"quantidade": len(banco._agenda or ())},
+        "alertas": {"quantidade": len(banco.alertas)},
+    }
+
+
+def _rss():
+    # Linux: páginas residentes em /proc; em outros sistemas, None
+    try:
+        with open("/proc/self/statm") as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def medir_processo():
+    from tsbanking.caixas import _compor
+    from tsbanking.segmentos import _ler
+    segmentos, composicoes = _ler.cache_info(), _compor.cache_info()
+    return {
+        "rss": _rss(),
+        "objetos_rastreados_gc": len(gc.get_objects()),
+        "coletas_gc": [geracao["collections"] for geracao in gc.get_stats()],
+        "caches": {
+            "segmentos": {"itens": segmentos.currsize, "maximo": segmentos.maxsize,
+                          "acertos": segmentos.hits, "faltas": segmentos.misses},
+            "composicao_de_notas": {"itens": composicoes.currsize,
+                                    "maximo": composicoes.maxsize,
+                                    "acertos": composicoes.hits,
+                                    "faltas": composicoes.misses},
+        },
+    }
+
+
+class Coletor:
+    """Mede a memória de todos os bancos (o padrão e os registrados) numa
+    thread própria, a cada ``intervalo`` ou quando pedido. A API só lê a
+    última medição: nenhuma requisição paga pela passada nas contas."""
+
+    def __init__(self, intervalo=INTERVALO):
+        self.intervalo = intervalo
+        self.processo = None
+        self.coletado_em = None
+        self.duracao = None
+        self._por_banco = weakref.WeakKeyDictionary()
+        self._pedido = threading.Event()
+        self._parar = False
+        self._thread = None
+
+    def coletar(self):
+        inicio = time.perf_counter()
+        bancos = [banco_padrao()] + list(_bancos.values())
+        for banco in bancos:
+            self._por_banco[banco] = medir_banco(banco)
+        self.processo = medir_processo()
+        self.duracao = time.perf_counter() - inicio
+        self.coletado_em = time.time()
+
+    def relatorio(self, banco):
+        if self.coletado_em is None:
+            return None
+        return {"coletado_em": self.coletado_em, "duracao": self.duracao,
+                "banco": self._por_banco.get(banco), "processo": self.processo}
+
+    def pedir(self):
+        self._pedido.set()
+
+    def _executar(self):
+        while not self._parar:
+            self.coletar()
+            self._pedido.wait(self.intervalo)
+            self._pedido.clear()
+
+    def iniciar(self):
+        if self._thread is None:
+            self._parar = False
+            self._thread = threading.Thread(
+                target=self._executar, name="coletor de memoria", daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar = True
+        self._pedido.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+coletor = Coletor()
+
+
+# Fotos do tracemalloc, para comparar dois momentos. O rastreio começa na
+# primeira foto (e deixa as alocações mais lentas até ser desligado).
+_fotos = {}
+_trava = threading.Lock()
+
+
+def fotografar(quadros=1):
+    with _trava:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(quadros)
+        foto = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),))
+        numero = max(_fotos, default=0) + 1
+        _fotos[numero] = foto
+    atual, pico = tracemalloc.get_traced_memory()
+    return {"foto": numero, "rastreado": atual, "pico": pico}
+
+
+def comparar(de, ate=None, top=20, agrupar="lineno"):
+    """Maiores diferenças de alocação entre a foto ``de`` e a ``ate`` (ou
+    uma nova, se omitida), por linha, arquivo ou pilha."""
+    if ate is None:
+        ate = fotografar()["foto"]
+    antes, depois = _fotos[de], _fotos[ate]
+    diferencas = depois.compare_to(antes, agrupar)[:top]
+    return {"de": de, "ate": ate, "locais": [
+        {"local": [f"{quadro.filename}:{quadro.lineno}"
+                   for quadro in diferenca.traceback],
+         "bytes": diferenca.size, "diferenca_bytes": diferenca.size_diff,
+         "blocos": diferenca.count, "diferenca_blocos": diferenca.count_diff}
+        for diferenca in diferencas]}
+
+
+def parar_rastreio():
+    with _trava:
+        _fotos.clear()
+        tracemalloc.stop()
@@ -1,5 +1,8 @@
+from datetime import datetime
 from enum import Enum
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
 
 
 class Transacao(BaseModel):
@@ -7,6 +10,10 @@ class Transacao(BaseModel):
     conta: str = "principal"
 
 
+class NovaConta(BaseModel):
+    conta: Optional[str] = None
+
+
 class TipoTransferencia(str, Enum):
     PIX = "PIX"
     DOC = "DOC"
@@ -19,6 +26,23 @@ class Transferencia(BaseModel):
     conta_destino: str
     tipo_transferencia: TipoTransferencia
     conta_origem: str = "principal"
+    # TED fora do horário fica para a abertura da próxima janela em vez
+    # de ser recusada
+    agendar_fora_do_horario: bool = False
+
+
+class Recorrencia(str, Enum):
+    DIARIA = "diaria"
+    SEMANAL = "semanal"
+    MENSAL = "mensal"
+
+
+class TransferenciaAgendada(BaseModel):
+    valor: float
+    conta_destino: str
+    executar_em: datetime
+    conta_origem: str = "principal"
+    recorrencia: Optional[Recorrencia] = None
 
 
 class TipoInvestimento(str, Enum):
@@ -30,10 +54,12 @@ class TipoInvestimento(str, Enum):
 class InvestimentoAplicacao(BaseModel):
     valor: float
     tipo_investimento: TipoInvestimento
+    conta: str = "principal"
 
 
 class InvestimentoResgate(BaseModel):
     tipo_investimento: TipoInvestimento
+    conta: str = "principal"
 
 
 class TipoCaixa(str, Enum):
@@ -46,3 +72,65 @@ class TipoCaixa(str, Enum):
 class SaqueCaixa(BaseModel):
     valor: float
     tipo_caixa: TipoCaixa
+    conta: str = "principal"
+    # Terminal específico; sem ele, usa o caixa padrão do tipo
+    caixa: Optional[str] = None
+
+
+class Abastecimento(BaseModel):
+    # nota -> quantidade de notas colocadas no cassete
+    notas: Dict[int, int]
+
+
+# Formatos das respostas grandes. Os TypeAdapters são montados uma vez, na
+# importação, e serializam direto em bytes quando o orjson não está instalado.
+
+class LinhaExtrato(TypedDict):
+    op: str
+    valor: float
+    saldo: float
+
+
+class LinhaPaginada(LinhaExtrato):
+    indice: int
+
+
+class Extrato(TypedDict):
+    extrato: List[LinhaExtrato]
+
+
+class ColunasExtrato(TypedDict):
+    op: List[str]
+    valor: List[float]
+    saldo: List[float]
+
+
+class ExtratoColunar(TypedDict):
+    extrato: ColunasExtrato
+
+
+class PaginaExtrato(TypedDict):
+    total: int
+    linhas: List[LinhaPaginada]
+    proximo: Optional[int]
+    versao: int
+
+
+class Fechamento(TypedDict):
+    data: str
+    saldo: float
+
+
+class HistoricoSaldo(TypedDict):
+    conta: str
+    inicio: str
+    fim: str
+    minimo: float
+    maximo: float
+    fechamentos: List[Fechamento]
+
+
+ADAPTADOR_EXTRATO = TypeAdapter(Extrato)
+ADAPTADOR_EXTRATO_COLUNAR = TypeAdapter(ExtratoColunar)
+ADAPTADOR_PAGINA = TypeAdapter(PaginaExtrato)
+ADAPTADOR_HISTORICO = TypeAdapter(HistoricoSaldo)
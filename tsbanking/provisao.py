@@ -0,0 +1,128 @@
+import csv
+import json
+import os
+import threading
+from datetime import date, datetime
+
+from tsbanking.database import _db
+from tsbanking.eventos import particao
+from tsbanking.services import calcular_rendimento
+
+PARTICOES = 64
+CABECALHO = ("conta", "tipo", "valor", "data_aplicacao", "dias",
+             "rendimento", "valor_atualizado")
+
+_config = {"diretorio": os.environ.get("TSBANKING_PROVISAO")}
+_trava = threading.Lock()
+
+
+def configurar(diretorio):
+    _config["diretorio"] = diretorio
+
+
+def diretorio():
+    with _trava:
+        if _config["diretorio"] is None:
+            import tempfile
+            _config["diretorio"] = tempfile.mkdtemp(prefix="tsbanking-provisao-")
+        os.makedirs(_config["diretorio"], exist_ok=True)
+        return _config["diretorio"]
+
+
+def posicoes_por_particao(particoes):
+    # Lido no processo principal, que é quem tem as carteiras; cada conta
+    # cai inteira numa partição
+    grupos = [[] for _ in range(particoes)]
+    for registro in list(_db["contas"].values()):
+        if not registro.carteira:
+            continue
+        for tipo, posicao in list(registro.carteira.items()):
+            if posicao["valor"] > 0 and posicao["data_aplicacao"]:
+                grupos[particao(registro.id, particoes)].append(
+                    (registro.id, tipo, posicao["valor"], posicao["data_aplicacao"]))
+    return grupos
+
+
+def provisionar_particao(pasta, numero, posicoes, taxas, data):
+    """Calcula o rendimento de uma partição e grava ``particao-NNNN.csv``.
+    Roda no processo filho; devolve (numero, posições, rendimento)."""
+    caminho = os.path.join(pasta, f"particao-{numero:04d}.csv")
+    total = 0.0
+    with open(caminho + ".tmp", "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.writer(arquivo, lineterminator="\n")
+        escritor.writerow(CABECALHO)
+        for conta, tipo, valor, aplicacao in posicoes:
+            dias = max((data - datetime.fromisoformat(aplicacao).date()).days, 0)
+            rendimento = calcular_rendimento(tipo, valor, taxas[tipo], dias)
+            total += rendimento
+            escritor.writerow((conta, tipo, valor, aplicacao, dias,
+                               rendimento, valor + rendimento))
+    # A partição só conta como pronta quando o arquivo está completo
+    os.replace(caminho + ".tmp", caminho)
+    return numero, len(posicoes), total
+
+
+def _ler_concluidas(caminho):
+    concluidas = {}
+    if os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as arquivo:
+            for linha in arquivo:
+                try:
+                    numero, posicoes, rendimento = json.loads(linha)
+                except ValueError:
+                    break  # última linha pela metade
+                concluidas[numero] = (posicoes, rendimento)
+    return concluidas
+
+
+def provisionar(data, pasta=None, particoes=PARTICOES, processos=None):
+    """Foto do rendimento acumulado de todas as posições em ``data``, em
+    ``<pasta>/<data>/``. Cada partição terminada é anotada em
+    ``concluidas.jsonl``; uma execução interrompida, chamada de novo para a
+    mesma data, só refaz as partições que faltam."""
+    if isinstance(data, str):
+        data = date.fromisoformat(data)
+    pasta = os.path.join(pasta or diretorio(), data.isoformat())
+    os.makedirs(pasta, exist_ok=True)
+
+    # O número de partições fica fixo na primeira execução da data
+    manifesto = os.path.join(pasta, "manifesto.json")
+    if os.path.exists(manifesto):
+        with open(manifesto, encoding="utf-8") as arquivo:
+            particoes = json.load(arquivo)["particoes"]
+    else:
+        with open(manifesto + ".tmp", "w", encoding="utf-8") as arquivo:
+            json.dump({"data": data.isoformat(), "particoes": particoes}, arquivo)
+        os.replace(manifesto + ".tmp", manifesto)
+
+    caminho = os.path.join(pasta, "concluidas.jsonl")
+    concluidas = _ler_concluidas(caminho)
+    retomadas = len(concluidas)
+    grupos = posicoes_por_particao(particoes)
+    taxas = {tipo: dados["taxa"] for tipo, dados in _db["investimentos"].items()}
+    pendentes = [(pasta, numero, grupos[numero], taxas, data)
+                 for numero in range(particoes) if numero not in concluidas]
+
+    with open(caminho, "a", encoding="utf-8") as diario:
+        def anotar(numero, posicoes, rendimento):
+            diario.write(json.dumps([numero, posicoes, rendimento]) + "\n")
+            diario.flush()
+            concluidas[numero] = (posicoes, rendimento)
+
+        processos = processos or os.cpu_count() or 1
+        if processos <= 1 or len(pendentes) <= 1:
+            for argumentos in pendentes:
+                anotar(*provisionar_particao(*argumentos))
+        else:
+            # O pool compartilhado do processo, criado uma vez só
+            from concurrent.futures import as_completed
+            from tsbanking.tarefas import processos as pool
+            futuros = [pool().submit(provisionar_particao, *argumentos)
+                       for argumentos in pendentes]
+            for futuro in as_completed(futuros):
+                anotar(*futuro.result())
+
+    return {"data": data.isoformat(), "diretorio": pasta,
+            "particoes": particoes, "retomadas": retomadas,
+            "posicoes": sum(p for p, _ in concluidas.values()),
+            "rendimento": sum(r for _, r in concluidas.values())}
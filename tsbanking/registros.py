@@ -0,0 +1,404 @@
+import hashlib
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+
+from tsbanking import segmentos
+from tsbanking.colunar import Bloco, bloco_vazio
+
+
+class _ColunasQuentes:
+    # Linhas [base, base + len) do extrato que ainda estão em memória
+    __slots__ = ("base", "seqs", "ops", "valores", "momentos", "saldos")
+
+    def __init__(self, base=0, seqs=None, ops=None, valores=None,
+                 momentos=None, saldos=None):
+        self.base = base
+        self.seqs = seqs if seqs is not None else array("q")
+        self.ops = ops if ops is not None else []
+        self.valores = valores if valores is not None else array("d")
+        self.momentos = momentos if momentos is not None else array("d")
+        # Saldo da conta logo após cada lançamento
+        self.saldos = saldos if saldos is not None else array("d")
+
+
+class Extrato:
+    # Projeção colunar do extrato: uma linha por evento com descrição.
+    # "Limpar" apenas avança ``inicio``; as linhas antigas continuam aqui.
+    # As linhas mais antigas podem ser seladas em segmentos comprimidos em
+    # disco; a leitura atravessa as duas camadas sem o chamador perceber.
+    __slots__ = ("quente", "segmentos", "inicio", "indice")
+
+    def __init__(self):
+        self.quente = _ColunasQuentes()
+        self.segmentos = None
+        self.inicio = 0
+        # Índices secundários (ver tsbanking.indices), criados na primeira
+        # consulta filtrada e mantidos a cada linha nova
+        self.indice = None
+
+    def __len__(self):
+        quente = self.quente
+        return quente.base + len(quente.ops)
+
+    def anexar(self, evento, saldo):
+        quente = self.quente
+        quente.seqs.append(evento.seq)
+        quente.ops.append(evento.op)
+        quente.valores.append(evento.valor)
+        quente.momentos.append(evento.momento)
+        quente.saldos.append(saldo)
+        if self.indice is not None:
+            self.indice.anexar(len(self) - 1, evento.op, evento.valor)
+
+    def colunas(self, inicio, fim):
+        # Lê uma única vez a camada quente: a troca feita ao selar um
+        # segmento não afeta uma leitura já em andamento
+        quente = self.quente
+        base = quente.base
+        if inicio >= base:
+            i, j = inicio - base, fim - base
+            return Bloco("", quente.seqs[i:j], quente.momentos[i:j],
+                         quente.ops[i:j], quente.valores[i:j], quente.saldos[i:j])
+
+        bloco = bloco_vazio()
+        segs = self.segmentos
+        k = bisect_right(segs, inicio, key=lambda s: s.inicio) - 1
+        while inicio < fim and inicio < base:
+            seg = segs[k]
+            frio = segmentos.ler(seg)
+            i, j = inicio - seg.inicio, min(fim, seg.fim) - seg.inicio
+            _estender(bloco, frio, i, j)
+            inicio = seg.inicio + j
+            k += 1
+        if inicio < fim:
+            _estender(bloco, quente, inicio - base, fim - base)
+        return bloco
+
+    def linhas(self, inicio=None, fim=None):
+        if inicio is None:
+            inicio = self.inicio
+        if fim is None:
+            fim = len(self)
+        bloco = self.colunas(inicio, fim)
+        return [{"op": op, "valor": valor, "saldo": saldo}
+                for op, valor, saldo in zip(bloco.ops, bloco.valores, bloco.saldos)]
+
+    def linha(self, posicao):
+        # (op, valor, saldo) de uma linha, em memória ou num segmento
+        quente = self.quente
+        if posicao >= quente.base:
+            i = posicao - quente.base
+            return quente.ops[i], quente.valores[i], quente.saldos[i]
+        bloco = self.colunas(posicao, posicao + 1)
+        return bloco.ops[0], bloco.valores[0], bloco.saldos[0]
+
+    def buscar_momento(self, momento):
+        # Primeira linha com momento >= ``momento``
+        quente, segs = self.quente, self.segmentos
+        if segs and momento <= segs[-1].momento_max:
+            seg = segs[bisect_left(segs, momento, key=lambda s: s.momento_max)]
+            return seg.inicio + bisect_left(segmentos.ler(seg).momentos, momento)
+        return quente.base + bisect_left(quente.momentos, momento)
+
+    def buscar_seq(self, seq):
+        # Primeira linha gravada depois do evento ``seq``
+        quente, segs = self.quente, self.segmentos
+        if segs and (not quente.seqs or seq < quente.seqs[0]):
+            k = bisect_right(segs, seq, key=lambda s: segmentos.ler(s).seqs[-1])
+            if k < len(segs):
+                seg = segs[k]
+                return seg.inicio + bisect_right(segmentos.ler(seg).seqs, seq)
+        return quente.base + bisect_right(quente.seqs, seq)
+
+    def instalar_segmento(self, segmento):
+        # Chamado com a trava da conta: as linhas já gravadas no segmento
+        # saem da memória numa única troca de referência
+        quente = self.quente
+        n = segmento.fim - quente.base
+        if self.segmentos is None:
+            self.segmentos = []
+        self.segmentos.append(segmento)
+        self.quente = _ColunasQuentes(
+            segmento.fim, quente.seqs[n:], quente.ops[n:], quente.valores[n:],
+            quente.momentos[n:], quente.saldos[n:])
+
+
+def _estender(bloco, origem, i, j):
+    bloco.seqs.extend(origem.seqs[i:j])
+    bloco.momentos.extend(origem.momentos[i:j])
+    bloco.ops.extend(origem.ops[i:j])
+    bloco.valores.extend(origem.valores[i:j])
+    bloco.saldos.extend(origem.saldos[i:j])
+
+
+class _ArvoreMinMax:
+    # Árvore de segmentos só com inserção no fim: consulta de mínimo e
+    # máximo num intervalo em O(log n)
+    __slots__ = ("capacidade", "tamanho", "minimos", "maximos")
+
+    def __init__(self):
+        self.capacidade = 8
+        self.tamanho = 0
+        self.minimos = array("d", [float("inf")]) * 16
+        self.maximos = array("d", [float("-inf")]) * 16
+
+    def anexar(self, minimo, maximo):
+        if self.tamanho == self.capacidade:
+            self._crescer()
+        i = self.capacidade + self.tamanho
+        self.tamanho += 1
+        minimos, maximos = self.minimos, self.maximos
+        minimos[i] = minimo
+        maximos[i] = maximo
+        i >>= 1
+        while i:
+            minimos[i] = min(minimos[2 * i], minimos[2 * i + 1])
+            maximos[i] = max(maximos[2 * i], maximos[2 * i + 1])
+            i >>= 1
+
+    def _crescer(self):
+        capacidade = self.capacidade
+        folhas = zip(self.minimos[capacidade:], self.maximos[capacidade:])
+        self.__init__()
+        self.capacidade = capacidade * 2
+        self.minimos = array("d", [float("inf")]) * (4 * capacidade)
+        self.maximos = array("d", [float("-inf")]) * (4 * capacidade)
+        for minimo, maximo in folhas:
+            self.anexar(minimo, maximo)
+
+    def consultar(self, inicio, fim):
+        minimo, maximo = float("inf"), float("-inf")
+        inicio += self.capacidade
+        fim += self.capacidade
+        while inicio < fim:
+            if inicio & 1:
+                minimo = min(minimo, self.minimos[inicio])
+                maximo = max(maximo, self.maximos[inicio])
+                inicio += 1
+            if fim & 1:
+                fim -= 1
+                minimo = min(minimo, self.minimos[fim])
+                maximo = max(maximo, self.maximos[fim])
+            inicio >>= 1
+            fim >>= 1
+        return minimo, maximo
+
+
+class IndiceSaldos:
+    # Saldo de fechamento por dia, em ordem cronológica. O dia corrente
+    # fica fora da árvore e só entra nela quando o próximo dia começa.
+    __slots__ = ("dias", "fechamentos", "arvore", "minimo", "maximo", "limite")
+
+    def __init__(self):
+        self.dias = array("l")
+        self.fechamentos = array("d")
+        self.arvore = _ArvoreMinMax()
+        self.minimo = self.maximo = 0.0
+        self.limite = float("-inf")
+
+    def registrar(self, momento, saldo_anterior, saldo):
+        if momento >= self.limite:
+            dia = date.fromtimestamp(momento)
+            if not self.dias or dia.toordinal() > self.dias[-1]:
+                if self.dias:
+                    self.arvore.anexar(self.minimo, self.maximo)
+                self.dias.append(dia.toordinal())
+                self.fechamentos.append(saldo)
+                self.minimo = min(saldo_anterior, saldo)
+                self.maximo = max(saldo_anterior, saldo)
+                self.limite = datetime.combine(
+                    dia + timedelta(days=1), time()).timestamp()
+                return
+        self.fechamentos[-1] = saldo
+        if saldo < self.minimo:
+            self.minimo = saldo
+        elif saldo > self.maximo:
+            self.maximo = saldo
+
+    def saldo_em(self, dia):
+        i = bisect_right(self.dias, dia.toordinal()) - 1
+        return self.fechamentos[i] if i >= 0 else 0.0
+
+    def intervalo(self, inicio, fim):
+        return (bisect_left(self.dias, inicio.toordinal()),
+                bisect_right(self.dias, fim.toordinal()))
+
+    def extremos(self, inicio, fim):
+        a, b = self.intervalo(inicio, fim)
+        # Dias já fechados ficam na árvore; o corrente, nos escalares
+        fechados = len(self.dias) - 1
+        minimo, maximo = self.arvore.consultar(a, min(b, fechados))
+        if b > fechados >= a:
+            minimo = min(minimo, self.minimo)
+            maximo = max(maximo, self.maximo)
+        if a > 0:
+            # Saldo que vinha do dia anterior ao início do período
+            anterior = self.fechamentos[a - 1]
+            minimo = min(minimo, anterior)
+            maximo = max(maximo, anterior)
+        if minimo > maximo:
+            return None
+        return minimo, maximo
+
+    def fechamentos_entre(self, inicio, fim):
+        a, b = self.intervalo(inicio, fim)
+        return [(date.fromordinal(self.dias[i]), self.fechamentos[i])
+                for i in range(a, b)]
+
+
+CABECA_INICIAL = bytes(32)
+# Conta com um único evento: primeiro elo, dia, fim do dia e seq, empacotados
+_PRIMEIRO_ELO = struct.Struct("<32sldq")
+
+
+def hash_evento(anterior, evento):
+    # Elo da cadeia: o hash anterior mais a forma canônica do evento. repr
+    # de float é exato, então o mesmo evento sempre dá o mesmo hash.
+    return hashlib.sha256(anterior + (
+        f"{evento.seq}|{evento.conta}|{evento.tipo}|{evento.valor!r}|"
+        f"{evento.op}|{evento.momento!r}|{evento.dados!r}").encode()).digest()
+
+
+def _no(esquerda, direita):
+    return hashlib.sha256(b"\x01" + esquerda + direita).digest()
+
+
+def anexar_folha(pilha, folhas, elo):
+    # Árvore de Merkle guardada como a pilha de raízes das subárvores
+    # completas, como um contador binário: anexar custa O(log n)
+    while folhas & 1:
+        elo = _no(pilha.pop(), elo)
+        folhas >>= 1
+    pilha.append(elo)
+
+
+def dobrar(pilha):
+    if not pilha:
+        return CABECA_INICIAL
+    raiz = pilha[-1]
+    for no in reversed(pilha[:-1]):
+        raiz = _no(no, raiz)
+    return raiz
+
+
+def _fim_do_dia(dia):
+    return datetime.combine(dia + timedelta(days=1), time()).timestamp()
+
+
+class DiaAuditado(NamedTuple):
+    dia: int
+    folhas: int
+    raiz: bytes
+    cabeca_inicial: bytes
+    cabeca: bytes
+    saldo_inicial: float
+    saldo_final: float
+
+
+class Trilha:
+    # Cadeia de hashes dos eventos de uma conta e a raiz de Merkle dos elos
+    # de cada dia. Dias fechados ficam em colunas; o dia corrente guarda a
+    # pilha da árvore, que cresce com cada evento. ``seqs`` indexa os eventos
+    # da conta no log: com as contagens de cada dia, a reconciliação acha os
+    # eventos de um dia sem percorrer o log inteiro.
+    __slots__ = ("cabeca", "dia", "limite", "folhas", "pilha", "saldo_inicial",
+                 "dias", "contagens", "saldos", "elos", "seqs")
+
+    def __init__(self, cabeca, dia, limite, seq, saldo_inicial=0.0):
+        self.cabeca = cabeca
+        self.dia = dia
+        self.limite = limite
+        self.folhas = 1
+        self.pilha = [cabeca]
+        self.saldo_inicial = saldo_inicial
+        self.dias = array("l")
+        self.contagens = array("q")
+        self.saldos = array("d")
+        # raiz e último elo de cada dia fechado, 64 bytes por dia
+        self.elos = bytearray()
+        self.seqs = array("q", (seq,))
+
+    def anexar(self, evento, saldo_anterior):
+        if evento.momento >= self.limite:
+            dia = date.fromtimestamp(evento.momento)
+            if dia.toordinal() > self.dia:
+                self.dias.append(self.dia)
+                self.contagens.append(self.folhas)
+                self.saldos.append(saldo_anterior)
+                self.elos += dobrar(self.pilha) + self.cabeca
+                self.dia = dia.toordinal()
+                self.limite = _fim_do_dia(dia)
+                self.folhas = 0
+                self.pilha = []
+                self.saldo_inicial = saldo_anterior
+        self.cabeca = hash_evento(self.cabeca, evento)
+        anexar_folha(self.pilha, self.folhas, self.cabeca)
+        self.folhas += 1
+        self.seqs.append(evento.seq)
+
+    def auditados(self, saldo):
+        # Dias em ordem; o saldo final do dia corrente é o da conta
+        dias = []
+        cabeca, saldo_inicial = CABECA_INICIAL, 0.0
+        for i, dia in enumerate(self.dias):
+            raiz, fim = self.elos[64 * i:64 * i + 32], self.elos[64 * i + 32:64 * i + 64]
+            dias.append(DiaAuditado(dia, self.contagens[i], bytes(raiz), cabeca,
+                                    bytes(fim), saldo_inicial, self.saldos[i]))
+            cabeca, saldo_inicial = bytes(fim), self.saldos[i]
+        dias.append(DiaAuditado(self.dia, self.folhas, dobrar(self.pilha), cabeca,
+                                self.cabeca, saldo_inicial, saldo))
+        return dias
+
+
+def encadear(trilha, evento, saldo_anterior):
+    """Acrescenta ``evento`` à trilha da conta e devolve a trilha. Uma conta
+    com um só evento guarda apenas 52 bytes; a Trilha nasce no segundo."""
+    if trilha is None:
+        dia = date.fromtimestamp(evento.momento)
+        return _PRIMEIRO_ELO.pack(hash_evento(CABECA_INICIAL, evento),
+                                  dia.toordinal(), _fim_do_dia(dia), evento.seq)
+    if type(trilha) is bytes:
+        trilha = Trilha(*_PRIMEIRO_ELO.unpack(trilha))
+    trilha.anexar(evento, saldo_anterior)
+    return trilha
+
+
+def seqs_da_trilha(trilha):
+    # seq de cada evento da conta, na ordem da cadeia
+    if trilha is None:
+        return ()
+    if type(trilha) is bytes:
+        return (_PRIMEIRO_ELO.unpack(trilha)[3],)
+    return trilha.seqs
+
+
+def dias_auditados(trilha, saldo):
+    if trilha is None:
+        return []
+    if type(trilha) is bytes:
+        trilha = Trilha(*_PRIMEIRO_ELO.unpack(trilha))
+    return trilha.auditados(saldo)
+
+
+class Conta:
+    # Registro compacto: sem __dict__ e com extrato e carteira alocados só
+    # no primeiro uso, para caberem milhões de contas vazias em memória.
+    __slots__ = ("id", "saldo", "extrato", "carteira", "historico", "ativa",
+                 "trilha", "versao")
+
+    def __init__(self, id, saldo=0.0):
+        self.id = id
+        self.saldo = saldo
+        self.extrato = None
+        self.carteira = None
+        # IndiceSaldos; fica vazio enquanto o saldo nunca saiu de zero
+        self.historico = None
+        self.ativa = True
+        # Trilha de auditoria (ver ``encadear``)
+        self.trilha = None
+        # seq do último evento da conta: muda a cada operação, e as linhas
+        # do extrato gravadas depois de uma versão são as de seq maior
+        self.versao = 0
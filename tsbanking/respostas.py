@@ -0,0 +1,37 @@
+import json
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele usa o pydantic ou o json
+    orjson = None
+
+
+def serializar(conteudo, adaptador=None):
+    if orjson is not None:
+        return orjson.dumps(conteudo)
+    if adaptador is not None:
+        return adaptador.dump_json(conteudo)
+    return json.dumps(conteudo, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class RespostaRapida(Response):
+    """Resposta JSON que serializa o conteúdo como ele está, sem passar pelo
+    ``jsonable_encoder``. Só aceita tipos simples (dict, list, str, números,
+    None); ``adaptador`` é o TypeAdapter usado quando falta o orjson."""
+
+    media_type = "application/json"
+
+    def __init__(self, content, adaptador=None, **kwargs):
+        self.adaptador = adaptador
+        super().__init__(content, **kwargs)
+
+    def render(self, content):
+        return serializar(content, self.adaptador)
+
+
+def extrato_colunas(bloco):
+    # As colunas do extrato viram listas JSON direto, sem um dict por linha
+    return {"op": bloco.ops, "valor": bloco.valores.tolist(),
+            "saldo": bloco.saldos.tolist()}
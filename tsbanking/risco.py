@@ -0,0 +1,172 @@
+import threading
+from typing import NamedTuple
+
+from tsbanking import database
+from tsbanking.banco import banco_atual
+
+ALFA = 0.1               # peso do valor novo na média móvel exponencial
+JANELA_MINUTOS = 10      # velocidade: transferências nos últimos N minutos
+CONTRAPARTES = 16        # destinos contados por conta (os mais frequentes)
+BITS_VISTOS = 1024       # filtro de Bloom dos destinos já usados
+
+SINALIZAR = "sinalizar"
+BLOQUEAR = "bloquear"
+
+# Banco.perfis: origem -> PerfilRisco; só contas que já transferiram têm
+# perfil. Banco.alertas: últimas transferências sinalizadas ou bloqueadas.
+_trava = threading.Lock()
+
+
+class Sinais(NamedTuple):
+    # Foto do perfil antes da transferência avaliada
+    valor: float
+    media: float
+    desvio: float
+    transferencias: int
+    na_janela: int
+    valor_na_janela: float
+    para_destino: int
+    destino_novo: bool
+
+
+class Parecer(NamedTuple):
+    acao: str
+    motivo: str
+
+
+class PerfilRisco:
+    """Estatísticas de uma conta atualizadas a cada transferência, em O(1)
+    e memória fixa: média e variância exponenciais dos valores, contagem
+    por minuto numa janela circular, contagem dos destinos mais frequentes
+    (space-saving) e um filtro de Bloom dos destinos já vistos."""
+
+    __slots__ = ("media", "variancia", "total", "minuto", "contagens",
+                 "somas", "na_janela", "valor_na_janela", "destinos", "vistos")
+
+    def __init__(self):
+        self.media = self.variancia = 0.0
+        self.total = 0
+        self.minuto = 0
+        self.contagens = [0] * JANELA_MINUTOS
+        self.somas = [0.0] * JANELA_MINUTOS
+        self.na_janela = 0
+        self.valor_na_janela = 0.0
+        self.destinos = {}
+        self.vistos = 0
+
+    def _avancar(self, minuto):
+        # Tira da janela os minutos que ficaram para trás; no máximo
+        # JANELA_MINUTOS passos, por maior que tenha sido o intervalo
+        passados = minuto - self.minuto
+        if passados <= 0:
+            return
+        for m in range(self.minuto + 1, self.minuto + 1 + min(passados, JANELA_MINUTOS)):
+            i = m % JANELA_MINUTOS
+            self.na_janela -= self.contagens[i]
+            self.valor_na_janela -= self.somas[i]
+            self.contagens[i] = 0
+            self.somas[i] = 0.0
+        if not self.na_janela:
+            self.valor_na_janela = 0.0
+        self.minuto = minuto
+
+    def _bits(self, destino):
+        h = hash(destino)
+        return ((1 << (h % BITS_VISTOS)) | (1 << ((h >> 10) % BITS_VISTOS))
+                | (1 << ((h >> 20) % BITS_VISTOS)))
+
+    def sinais(self, destino, valor, momento):
+        self._avancar(int(momento // 60))
+        bits = self._bits(destino)
+        return Sinais(valor, self.media, self.variancia ** 0.5, self.total,
+                      self.na_janela, self.valor_na_janela,
+                      self.destinos.get(destino, 0), self.vistos & bits != bits)
+
+    def registrar(self, destino, valor, momento):
+        self._avancar(int(momento // 60))
+        if self.total:
+            diferenca = valor - self.media
+            incremento = ALFA * diferenca
+            self.media += incremento
+            self.variancia = (1 - ALFA) * (self.variancia + diferenca * incremento)
+        else:
+            self.media = valor
+        self.total += 1
+        i = self.minuto % JANELA_MINUTOS
+        self.contagens[i] += 1
+        self.somas[i] += valor
+        self.na_janela += 1
+        self.valor_na_janela += valor
+
+        destinos = self.destinos
+        if destino in destinos:
+            destinos[destino] += 1
+        elif len(destinos) < CONTRAPARTES:
+            destinos[destino] = 1
+        else:
+            # Space-saving: o novo herda a contagem do menos frequente
+            menor = min(destinos, key=destinos.get)
+            destinos[destino] = destinos.pop(menor) + 1
+        self.vistos |= self._bits(destino)
+
+
+def regras_basicas(sinais, origem, destino):
+    """Avaliador de exemplo: bloqueia valor muito fora do padrão para um
+    destino novo e sinaliza rajadas de transferências."""
+    if sinais.transferencias >= 10 and sinais.destino_novo:
+        if sinais.valor > sinais.media + 6 * max(sinais.desvio, 0.1 * sinais.media):
+            return Parecer(BLOQUEAR, "Valor fora do padrão para destino novo")
+    if sinais.na_janela >= 20:
+        return Parecer(SINALIZAR, f"{sinais.na_janela} transferências em "
+                                  f"{JANELA_MINUTOS} minutos")
+    return None
+
+
+# Chamado com (sinais, origem, destino) dentro de transferir, com a conta
+# de origem travada; devolve None ou um Parecer. Sem avaliador, só as
+# estatísticas são mantidas. Banco.config["avaliador"], se houver, vale
+# no lugar deste para aquele banco.
+_config = {"avaliador": None}
+
+
+def configurar_avaliador(avaliador):
+    _config["avaliador"] = avaliador
+
+
+def perfil(conta):
+    perfis = banco_atual().perfis
+    encontrado = perfis.get(conta)
+    if encontrado is None:
+        with _trava:
+            encontrado = perfis.setdefault(conta, PerfilRisco())
+    return encontrado
+
+
+def consultar(conta):
+    return banco_atual().perfis.get(conta)
+
+
+def alertas():
+    return list(banco_atual().alertas)
+
+
+def avaliar(origem, destino, valor):
+    banco = banco_atual()
+    avaliador = banco.config.get("avaliador", _config["avaliador"])
+    if avaliador is None:
+        return None
+    sinais = perfil(origem).sinais(destino, valor, database._relogio())
+    parecer = avaliador(sinais, origem, destino)
+    if parecer is not None:
+        banco.alertas.append({"conta_origem": origem, "conta_destino": destino,
+                              "valor": valor, "acao": parecer.acao,
+                              "motivo": parecer.motivo})
+    return parecer
+
+
+def registrar(origem, destino, valor):
+    # Chamado depois da transferência gravada: só a trava da origem, e só
+    # pelo tempo de atualizar o perfil
+    from tsbanking.transacao import trava_da_conta
+    with trava_da_conta(origem):
+        perfil(origem).registrar(destino, valor, database._relogio())
@@ -0,0 +1,208 @@
+import json
+import os
+import random
+import socket
+import threading
+
+from tsbanking.banco import banco_atual
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+TAMANHO_LOTE = 500
+INTERVALO = 0.05          # espera entre leituras do log quando não há nada
+ESPERA_INICIAL = 0.1      # primeira espera após uma falha de entrega
+ESPERA_MAXIMA = 30.0
+
+
+def evento_para_dict(evento):
+    return {"seq": evento.seq, "conta": evento.conta, "tipo": evento.tipo,
+            "valor": evento.valor, "op": evento.op, "momento": evento.momento,
+            "dados": evento.dados}
+
+
+def linhas_json(lote):
+    # Uma linha JSON por evento
+    if orjson is not None:
+        return b"".join(orjson.dumps(item) + b"\n" for item in lote)
+    return "".join(json.dumps(item, ensure_ascii=False) + "\n"
+                   for item in lote).encode()
+
+
+class SaidaArquivo:
+    def __init__(self, caminho, sincronizar=False):
+        self.nome = f"arquivo:{caminho}"
+        self.caminho = caminho
+        self.sincronizar = sincronizar
+
+    def enviar(self, lote):
+        with open(self.caminho, "ab") as arquivo:
+            arquivo.write(linhas_json(lote))
+            arquivo.flush()
+            if self.sincronizar:
+                os.fsync(arquivo.fileno())
+
+    def fechar(self):
+        pass
+
+
+class SaidaSocketUnix:
+    # Conexão mantida entre lotes e refeita depois de qualquer erro
+    def __init__(self, caminho, timeout=5.0):
+        self.nome = f"unix:{caminho}"
+        self.caminho = caminho
+        self.timeout = timeout
+        self.conexao = None
+
+    def enviar(self, lote):
+        try:
+            if self.conexao is None:
+                conexao = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                conexao.settimeout(self.timeout)
+                conexao.connect(self.caminho)
+                self.conexao = conexao
+            self.conexao.sendall(linhas_json(lote))
+        except OSError:
+            self.fechar()
+            raise
+
+    def fechar(self):
+        if self.conexao is not None:
+            self.conexao.close()
+            self.conexao = None
+
+
+class SaidaHttp:
+    # POST de um array JSON por lote; qualquer status >= 400 conta como falha
+    def __init__(self, url, cliente=None, timeout=5.0):
+        import httpx
+        self.nome = url
+        self.url = url
+        self.cliente = cliente or httpx.Client(timeout=timeout)
+
+    def enviar(self, lote):
+        self.cliente.post(self.url, json=lote).raise_for_status()
+
+    def fechar(self):
+        self.cliente.close()
+
+
+class Despachante:
+    """Entrega os eventos do log a uma saída, em lotes e na ordem do log.
+
+    O log de eventos é a caixa de saída: o evento entra nele na mesma
+    gravação que muda o saldo, e o despachante só o lê depois, na sua
+    própria thread. Uma saída lenta ou fora do ar atrasa só ela mesma;
+    as operações não esperam. Entrega pelo menos uma vez: quem recebe
+    descarta ``seq`` repetidos."""
+
+    def __init__(self, saida, inicio=0, tipos=None, tamanho_lote=TAMANHO_LOTE,
+                 intervalo=INTERVALO, espera_inicial=ESPERA_INICIAL,
+                 espera_maxima=ESPERA_MAXIMA):
+        self.saida = saida
+        # Lê sempre o log do banco em que foi criado, em qualquer thread
+        self.banco = banco_atual()
+        self.cursor = inicio
+        self.tipos = frozenset(tipos) if tipos else None
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.entregues = self.falhas = 0
+        self.ultimo_erro = None
+        self._parar = threading.Event()
+        self._thread = None
+
+    def pendentes(self):
+        return len(self.banco.dados["eventos"]) - self.cursor
+
+    def _proximo_lote(self):
+        eventos = self.banco.dados["eventos"][self.cursor:self.cursor + self.tamanho_lote]
+        tipos = self.tipos
+        return len(eventos), [evento_para_dict(evento) for evento in eventos
+                              if tipos is None or evento.tipo in tipos]
+
+    def entregar(self, lote):
+        # Repete o mesmo lote até ele passar: o próximo só sai depois, o que
+        # mantém a ordem. A espera dobra a cada falha, com um sorteio para
+        # várias instâncias não baterem juntas no receptor.
+        espera = self.espera_inicial
+        while not self._parar.is_set():
+            try:
+                self.saida.enviar(lote)
+                self.ultimo_erro = None
+                return True
+            except Exception as erro:
+                self.falhas += 1
+                self.ultimo_erro = repr(erro)
+            self._parar.wait(espera * random.uniform(0.5, 1.0))
+            espera = min(espera * 2, self.espera_maxima)
+        return False
+
+    def despachar(self):
+        # Entrega o que houver no log agora; devolve quantos eventos leu
+        lidos = 0
+        while not self._parar.is_set():
+            n, lote = self._proximo_lote()
+            if not n:
+                break
+            if lote and not self.entregar(lote):
+                break
+            self.cursor += n
+            self.entregues += len(lote)
+            lidos += n
+        return lidos
+
+    def _executar(self):
+        while not self._parar.is_set():
+            if not self.despachar():
+                self._parar.wait(self.intervalo)
+
+    def situacao(self):
+        return {"saida": self.saida.nome, "entregues": self.entregues,
+                "pendentes": self.pendentes(), "falhas": self.falhas,
+                "ultimo_erro": self.ultimo_erro}
+
+    def iniciar(self):
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(
+                target=self._executar, name=f"despachante {self.saida.nome}",
+                daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.saida.fechar()
+
+
+def saida_de_url(url):
+    if url.startswith("arquivo:"):
+        return SaidaArquivo(url[len("arquivo:"):])
+    if url.startswith("unix:"):
+        return SaidaSocketUnix(url[len("unix:"):])
+    if url.startswith(("http://", "https://")):
+        return SaidaHttp(url)
+    raise ValueError(f"Saída inválida: {url}")
+
+
+def iniciar_saidas(urls):
+    """Um despachante por saída em ``urls`` (separadas por vírgula), por
+    exemplo ``arquivo:/var/log/eventos.jsonl,http://localhost:9000/eventos``,
+    lendo o log do banco atual."""
+    despachantes = banco_atual().despachantes
+    for url in filter(None, (u.strip() for u in urls.split(","))):
+        despachante = Despachante(saida_de_url(url))
+        despachante.iniciar()
+        despachantes.append(despachante)
+
+
+def parar_saidas():
+    despachantes = banco_atual().despachantes
+    while despachantes:
+        despachantes.pop().parar()
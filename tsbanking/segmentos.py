@@ -0,0 +1,77 @@
+import os
+import threading
+import zlib
+from functools import lru_cache
+from typing import NamedTuple
+
+from tsbanking.colunar import ASSINATURA, codificar_bloco, decodificar_blocos
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional; sem ele os segmentos usam zlib
+    zstandard = None
+
+_config = {"diretorio": os.environ.get("TSBANKING_SEGMENTOS")}
+_trava = threading.Lock()
+
+
+class Segmento(NamedTuple):
+    # Linhas [inicio, fim) do extrato, seladas num arquivo imutável
+    inicio: int
+    fim: int
+    momento_min: float
+    momento_max: float
+    caminho: str
+    compressao: str
+
+
+def configurar(diretorio):
+    _config["diretorio"] = diretorio
+
+
+def diretorio():
+    with _trava:
+        if _config["diretorio"] is None:
+            import tempfile
+            _config["diretorio"] = tempfile.mkdtemp(prefix="tsbanking-segmentos-")
+        os.makedirs(_config["diretorio"], exist_ok=True)
+        return _config["diretorio"]
+
+
+def _comprimir(dados):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(dados)
+    return "zlib", zlib.compress(dados, 6)
+
+
+def _descomprimir(dados, compressao):
+    if compressao == "zstd":
+        return zstandard.ZstdDecompressor().decompress(dados)
+    return zlib.decompress(dados)
+
+
+def gravar(bloco, inicio):
+    compressao, dados = _comprimir(ASSINATURA + codificar_bloco(bloco))
+    caminho = os.path.join(diretorio(), f"{os.urandom(16).hex()}.seg")
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(dados)
+    # O segmento só aparece completo, nunca pela metade
+    os.replace(temporario, caminho)
+    return Segmento(inicio, inicio + len(bloco.ops), bloco.momentos[0],
+                    bloco.momentos[-1], caminho, compressao)
+
+
+@lru_cache(maxsize=32)
+def _ler(caminho, compressao):
+    with open(caminho, "rb") as arquivo:
+        dados = _descomprimir(arquivo.read(), compressao)
+    return next(decodificar_blocos(dados))
+
+
+def ler(segmento):
+    return _ler(segmento.caminho, segmento.compressao)
+
+
+def segmentos_em_cache():
+    return _ler.cache_info().currsize
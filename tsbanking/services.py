@@ -1,169 +1,580 @@
 from tsbanking.database import (
-    get_saldo, atualizar_saldo, registrar_operacao,
-    get_extrato, limpar_extrato, get_conta,
-    get_investimento, atualizar_investimento, get_taxa_investimento
+    get_conta, criar_conta, conta_existe as _conta_existe,
+    get_taxa_investimento
 )
-from fastapi import HTTPException
-from datetime import datetime
+from tsbanking.eventos import (
+    filtro_extrato, OPERACOES, SAQUE_CAIXA, TRANSFERENCIA_ENVIADA, TRANSFERENCIA_RECEBIDA, APLICACAO,
+    RESGATE, ESTORNO
+)
+from tsbanking.caixas import MULTIPLOS, dispensar, get_caixa, listar_caixas
+from tsbanking.colunar import bloco_vazio
+from tsbanking.indices import filtrar
+from tsbanking.transacao import UnidadeDeTrabalho
+from tsbanking.assinaturas import assinar
+from tsbanking.banco import banco_atual
+from tsbanking.diario import auditado, diario_ativo
+from tsbanking.tarefas import iniciar_tarefa, obter_tarefa
+from tsbanking import risco
+from tsbanking.erros import (
+    ContaJaExiste, ContaNaoEncontrada, FalhaDispensa, NaoEncontrado,
+    NotasIndisponiveis, OperacaoInvalida, SaldoInsuficiente,
+    TransferenciaBloqueada, ValorInvalido
+)
+import os
+from bisect import bisect_left
+from datetime import date, datetime
 
 
 def validar_conta(conta):
     try:
         return get_conta(conta)
     except KeyError:
-        raise HTTPException(
-            status_code=404, detail=f"Conta '{conta}' não encontrada")
+        raise ContaNaoEncontrada(f"Conta '{conta}' não encontrada")
+
+
+def conta_existe(conta):
+    return _conta_existe(conta)
+
+
+@auditado
+def abrir_conta(conta=None):
+    if conta is not None and not conta.strip():
+        raise OperacaoInvalida("Nome da conta inválido")
+    try:
+        nova = criar_conta(conta)
+    except KeyError:
+        raise ContaJaExiste(f"Conta '{conta}' já existe")
+    return {"mensagem": "Conta criada", "conta": nova.id, "saldo": nova.saldo}
+
+
+def consultar_conta(conta):
+    registro = validar_conta(conta)
+    return {"conta": registro.id, "saldo": registro.saldo}
+
+
+@auditado
+def encerrar_conta(conta):
+    with UnidadeDeTrabalho(conta) as uow:
+        registro = uow.conta(conta)
+        if registro.saldo != 0:
+            raise OperacaoInvalida("Conta com saldo não pode ser encerrada")
+        registro.encerrar()
+    return {"mensagem": f"Conta '{conta}' encerrada"}
 
 
 def validar_valor(valor):
     if valor <= 0:
-        raise HTTPException(status_code=400, detail="Valor deve ser positivo")
+        raise ValorInvalido("Valor deve ser positivo")
 
 
-def depositar(valor, conta="principal"):
-    validar_conta(conta)
-    validar_valor(valor)
+def _codigo(tipo):
+    # Enums str (TipoInvestimento, TipoCaixa) viram o valor puro, pois
+    # f"{tipo}" não dá o mesmo resultado em todas as versões do Python
+    return getattr(tipo, "value", tipo)
 
-    saldo = get_saldo(conta)
-    novo = saldo + valor
-    atualizar_saldo(novo, conta)
-    registrar_operacao("deposito", valor, conta)
-    return {"mensagem": "Depósito realizado", "novo_saldo": novo}
 
+@auditado
+def depositar(valor, conta="principal"):
+    with UnidadeDeTrabalho(conta) as uow:
+        validar_valor(valor)
+        registro = uow.conta(conta)
+        registro.creditar(valor, "deposito")
+    return {"mensagem": "Depósito realizado", "novo_saldo": registro.saldo}
 
-def sacar(valor, conta="principal"):
-    validar_conta(conta)
-    validar_valor(valor)
 
-    saldo = get_saldo(conta)
-    if valor > saldo:
-        raise HTTPException(status_code=400, detail="Saldo insuficiente")
-    novo = saldo - valor
-    atualizar_saldo(novo, conta)
-    registrar_operacao("saque", valor, conta)
-    return {"mensagem": "Saque realizado", "novo_saldo": novo}
+@auditado
+def sacar(valor, conta="principal"):
+    with UnidadeDeTrabalho(conta) as uow:
+        validar_valor(valor)
+        registro = uow.conta(conta)
+        if valor > registro.saldo:
+            raise SaldoInsuficiente("Saldo insuficiente")
+        registro.debitar(valor, "saque")
+    return {"mensagem": "Saque realizado", "novo_saldo": registro.saldo}
 
 
 def consultar_saldo(conta="principal"):
-    validar_conta(conta)
-    return get_saldo(conta)
+    return validar_conta(conta).saldo
+
+
+def versao_da_conta(conta="principal"):
+    # Muda a cada operação na conta; serve de ETag para saldo e extrato
+    return validar_conta(conta).versao
+
+
+def consultar_saldo_em(data, conta="principal"):
+    registro = validar_conta(conta)
+    if registro.historico is None:
+        # Saldo nunca saiu de zero
+        return registro.saldo
+    return registro.historico.saldo_em(data)
+
+
+def consultar_historico_saldo(conta="principal", inicio=None, fim=None):
+    registro = validar_conta(conta)
+    hoje = date.today()
+    inicio = inicio or hoje
+    fim = fim or hoje
+    if fim < inicio:
+        raise OperacaoInvalida("Data final anterior à data inicial")
+    historico = registro.historico
+    if historico is None:
+        minimo = maximo = registro.saldo
+        fechamentos = []
+    else:
+        extremos = historico.extremos(inicio, fim)
+        if extremos is None:
+            raise NaoEncontrado("Sem histórico de saldo no período")
+        minimo, maximo = extremos
+        fechamentos = historico.fechamentos_entre(inicio, fim)
+    return {
+        "conta": conta,
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "minimo": minimo,
+        "maximo": maximo,
+        "fechamentos": [{"data": dia.isoformat(), "saldo": saldo}
+                        for dia, saldo in fechamentos]
+    }
 
 
-def consultar_extrato(conta="principal"):
+def _validar_filtros(tipo, valor_min, valor_max):
+    if tipo is not None and tipo not in OPERACOES:
+        raise OperacaoInvalida(f"Tipo de operação inválido: {tipo}")
+    if valor_min is not None and valor_max is not None and valor_max < valor_min:
+        raise OperacaoInvalida("Valor máximo menor que o mínimo")
+
+
+def consultar_extrato(conta="principal", tipo=None, contraparte=None,
+                      valor_min=None, valor_max=None):
+    extrato = validar_conta(conta).extrato
+    _validar_filtros(tipo, valor_min, valor_max)
+    if extrato is None:
+        return []
+    if tipo is None and contraparte is None and valor_min is None and valor_max is None:
+        return extrato.linhas()
+    # Pelos índices do extrato, só as linhas da visão atual
+    posicoes = filtrar(conta, extrato, tipo, contraparte, valor_min, valor_max)
+    linhas = []
+    for posicao in posicoes[bisect_left(posicoes, extrato.inicio):]:
+        op, valor, saldo = extrato.linha(posicao)
+        linhas.append({"op": op, "valor": valor, "saldo": saldo})
+    return linhas
+
+
+def consultar_extrato_colunas(conta="principal"):
+    # Mesmo conteúdo de consultar_extrato, nas colunas do extrato
+    extrato = validar_conta(conta).extrato
+    if extrato is None:
+        return bloco_vazio()
+    return extrato.colunas(extrato.inicio, len(extrato))
+
+
+def assinar_conta(conta, callback):
+    # ``callback`` recebe uma Mudanca a cada operação confirmada na conta,
+    # na thread de quem operou. Devolve a função que cancela a assinatura.
     validar_conta(conta)
-    return get_extrato(conta)
+    return assinar(conta, callback)
+
+
+def consultar_extrato_pagina(conta="principal", inicio=0, limite=100,
+                             tipo=None, busca=None, max_varredura=20_000,
+                             desde=None, contraparte=None, valor_min=None,
+                             valor_max=None):
+    # ``inicio`` e ``proximo`` são posições na visão atual do extrato (após
+    # a última limpeza). Filtros de tipo, contraparte e valor vêm dos
+    # índices do extrato; a busca por texto varre no máximo
+    # ``max_varredura`` linhas por chamada e devolve onde parou, para a
+    # página nunca travar. Com ``desde`` (uma ``versao`` já vista), só as
+    # linhas gravadas depois.
+    registro = validar_conta(conta)
+    extrato = registro.extrato
+    versao = registro.versao
+    if inicio < 0 or limite <= 0 or (desde is not None and desde < 0):
+        raise OperacaoInvalida("Paginação inválida")
+    _validar_filtros(tipo, valor_min, valor_max)
+    if extrato is None:
+        return {"total": 0, "linhas": [], "proximo": None, "versao": versao}
 
+    deslocamento = extrato.inicio
+    total = len(extrato) - deslocamento
+    if desde is not None:
+        inicio = max(inicio, extrato.buscar_seq(desde) - deslocamento)
+    if tipo is not None or contraparte is not None or valor_min is not None \
+            or valor_max is not None:
+        return _pagina_indexada(conta, extrato, inicio, limite, tipo, busca,
+                                max_varredura, contraparte, valor_min,
+                                valor_max, total, versao)
+    casa = filtro_extrato(None, busca)
+    linhas = []
+    posicao = inicio
+    limite_varredura = min(total, inicio + (
+        max_varredura if tipo or busca else limite))
+    while posicao < limite_varredura and len(linhas) < limite:
+        fim = min(posicao + 1024, limite_varredura)
+        bloco = extrato.colunas(deslocamento + posicao, deslocamento + fim)
+        for i, op in enumerate(bloco.ops):
+            if not casa(op):
+                continue
+            linhas.append({"indice": posicao + i, "op": op,
+                           "valor": bloco.valores[i], "saldo": bloco.saldos[i]})
+            if len(linhas) == limite:
+                fim = posicao + i + 1
+                break
+        posicao = fim
+    return {"total": total, "linhas": linhas,
+            "proximo": posicao if posicao < total else None, "versao": versao}
 
+
+def _pagina_indexada(conta, extrato, inicio, limite, tipo, busca, max_varredura,
+                     contraparte, valor_min, valor_max, total, versao):
+    # Só as linhas que os índices apontam são lidas; a busca por texto, se
+    # houver, confere no máximo ``max_varredura`` delas
+    deslocamento = extrato.inicio
+    posicoes = filtrar(conta, extrato, tipo, contraparte, valor_min, valor_max)
+    k = bisect_left(posicoes, deslocamento + inicio)
+    casa = filtro_extrato(None, busca)
+    fim = min(len(posicoes), k + max_varredura)
+    linhas = []
+    while k < fim and len(linhas) < limite:
+        posicao = posicoes[k]
+        op, valor, saldo = extrato.linha(posicao)
+        if casa(op):
+            linhas.append({"indice": posicao - deslocamento, "op": op,
+                           "valor": valor, "saldo": saldo})
+        k += 1
+    return {"total": total, "linhas": linhas,
+            "proximo": posicoes[k] - deslocamento if k < len(posicoes) else None,
+            "versao": versao}
+
+
+def exportar_extrato(contas, formato="csv", inicio=None, fim=None):
+    from tsbanking.exportacao import FORMATOS, gerar_exportacao, resolver_formato
+    for conta in contas:
+        validar_conta(conta)
+    if inicio and fim and fim < inicio:
+        raise OperacaoInvalida("Data final anterior à data inicial")
+    try:
+        formato = resolver_formato(formato)
+    except ValueError as e:
+        raise OperacaoInvalida(str(e))
+    tipo_midia, extensao = FORMATOS[formato]
+    return gerar_exportacao(contas, formato, inicio, fim), tipo_midia, extensao
+
+
+@auditado
 def limpar(conta="principal"):
-    validar_conta(conta)
-    limpar_extrato(conta)
+    with UnidadeDeTrabalho(conta) as uow:
+        uow.conta(conta).limpar_extrato()
     return {"mensagem": "Extrato limpo"}
 
 
+@auditado
 def transferir(valor, conta_destino, conta_origem):
+    with UnidadeDeTrabalho(conta_origem, conta_destino) as uow:
+        validar_valor(valor)
+
+        if conta_origem == conta_destino:
+            raise OperacaoInvalida("Não é possível transferir para a mesma conta")
+
+        origem = uow.conta(conta_origem)
+        if valor > origem.saldo:
+            raise SaldoInsuficiente("Saldo insuficiente para transferência")
+
+        # Triagem pelo perfil da origem, sem olhar o histórico
+        parecer = risco.avaliar(conta_origem, conta_destino, valor)
+        if parecer is not None and parecer.acao == risco.BLOQUEAR:
+            raise TransferenciaBloqueada(f"Transferência bloqueada: {parecer.motivo}")
+
+        # Debita e credita (gravados juntos ao final do bloco)
+        origem.debitar(valor, f"transferencia para {conta_destino}",
+                       TRANSFERENCIA_ENVIADA, (conta_destino,))
+        uow.conta(conta_destino).creditar(
+            valor, f"transferencia de {conta_origem}",
+            TRANSFERENCIA_RECEBIDA, (conta_origem,))
+
+    # O perfil aprende com a transferência já gravada, fora da unidade
+    risco.registrar(conta_origem, conta_destino, valor)
+    resultado = {"mensagem": f"Transferido R$ {valor:.2f} para {conta_destino}"}
+    if parecer is not None:
+        resultado["alerta"] = parecer.motivo
+    return resultado
+
+
+def consultar_risco(conta):
+    validar_conta(conta)
+    perfil = risco.consultar(conta)
+    if perfil is None:
+        return {"conta": conta, "transferencias": 0}
+    return {"conta": conta, "transferencias": perfil.total,
+            "media": perfil.media, "desvio": perfil.variancia ** 0.5,
+            "na_janela": perfil.na_janela,
+            "valor_na_janela": perfil.valor_na_janela,
+            "destinos_frequentes": dict(sorted(
+                perfil.destinos.items(), key=lambda item: -item[1]))}
+
+
+def alertas_de_risco():
+    return risco.alertas()
+
+
+def situacao_saidas():
+    return [despachante.situacao()
+            for despachante in list(banco_atual().despachantes)]
+
+
+def situacao_diario():
+    diario = diario_ativo()
+    if diario is None:
+        raise NaoEncontrado("Diário de auditoria desligado")
+    return diario.situacao()
+
+
+def _memoria():
+    from tsbanking import memoria
+    if not memoria._config["habilitado"]:
+        raise NaoEncontrado("Diagnóstico de memória desabilitado")
+    return memoria
+
+
+def relatorio_memoria():
+    # Última coleta do coletor em segundo plano; None antes da primeira
+    return _memoria().coletor.relatorio(banco_atual())
+
+
+def pedir_coleta_memoria():
+    _memoria().coletor.pedir()
+    return {"mensagem": "Coleta de memória pedida"}
+
+
+def fotografar_memoria():
+    return _memoria().fotografar()
+
+
+def comparar_memoria(de, ate=None, top=20, agrupar="lineno"):
+    memoria = _memoria()
+    if agrupar not in ("lineno", "filename", "traceback"):
+        raise OperacaoInvalida(f"Agrupamento inválido: {agrupar}")
+    for foto in (de, ate):
+        if foto is not None and foto not in memoria._fotos:
+            raise NaoEncontrado(f"Foto {foto} não encontrada")
+    return memoria.comparar(de, ate, top, agrupar)
+
+
+def parar_rastreio_memoria():
+    _memoria().parar_rastreio()
+    return {"mensagem": "Rastreio de memória desligado"}
+
+
+@auditado
+def agendar_transferencia(valor, conta_destino, conta_origem="principal",
+                          momento=None, recorrencia=None):
+    # ``momento`` é um datetime (sem fuso = horário local); as regras de
+    # saldo só valem na execução, pela própria transferir
+    validar_valor(valor)
+    if not isinstance(momento, datetime):
+        raise OperacaoInvalida("Informe a data e hora da transferência")
+    if conta_origem == conta_destino:
+        raise OperacaoInvalida("Não é possível transferir para a mesma conta")
     validar_conta(conta_origem)
     validar_conta(conta_destino)
-    validar_valor(valor)
+    recorrencia = _codigo(recorrencia)
+    try:
+        item = banco_atual().agenda.agendar(conta_origem, conta_destino, valor,
+                                            momento.timestamp(), recorrencia)
+    except ValueError as e:
+        raise OperacaoInvalida(str(e))
+    return {"mensagem": f"Transferência de R$ {valor:.2f} agendada para "
+                        f"{momento:%d/%m/%Y %H:%M}",
+            "agendamento": item.situacao()}
 
-    if conta_origem == conta_destino:
-        raise HTTPException(
-            status_code=400, detail="Não é possível transferir para a mesma conta")
 
-    origem_saldo = get_saldo(conta_origem)
-    if valor > origem_saldo:
-        raise HTTPException(
-            status_code=400, detail="Saldo insuficiente para transferência")
+def consultar_agendamento(id):
+    item = banco_atual().agenda.obter(id)
+    if item is None:
+        raise NaoEncontrado(f"Agendamento {id} não encontrado")
+    return item.situacao()
 
-    # Debita e credita
-    atualizar_saldo(origem_saldo - valor, conta_origem)
-    registrar_operacao(
-        f"transferencia para {conta_destino}", valor, conta_origem)
 
-    atualizar_saldo(consultar_saldo(conta_destino) + valor, conta_destino)
-    registrar_operacao(
-        f"transferencia de {conta_origem}", valor, conta_destino)
+def listar_agendamentos(conta="principal"):
+    validar_conta(conta)
+    return [item.situacao() for item in banco_atual().agenda.listar(conta)]
+
 
-    return {"mensagem": f"Transferido R$ {valor:.2f} para {conta_destino}"}
+@auditado
+def cancelar_agendamento(id):
+    if banco_atual().agenda.cancelar(id) is None:
+        raise NaoEncontrado(f"Agendamento {id} não encontrado")
+    return {"mensagem": f"Agendamento {id} cancelado"}
 
 
+@auditado
 def aplicar_investimento(valor, tipo, conta="principal", data_aplicacao=None):
-    validar_conta(conta)
-    validar_valor(valor)
-    saldo = get_saldo(conta)
-    if valor > saldo:
-        raise HTTPException(
-            status_code=400, detail="Saldo insuficiente para investir")
-    atualizar_saldo(saldo - valor, conta)
-    investimento = get_investimento(tipo)
-    novo_valor = investimento["valor"] + valor
-    # Salva data da aplicação
-    if data_aplicacao is None:
-        data_aplicacao = datetime.now().isoformat()
-    investimento["data_aplicacao"] = data_aplicacao
-    atualizar_investimento(tipo, novo_valor)
-    registrar_operacao(f"aplicacao_{tipo}", valor, conta)
+    tipo = _codigo(tipo)
+    with UnidadeDeTrabalho(conta) as uow:
+        validar_valor(valor)
+        registro = uow.conta(conta)
+        if valor > registro.saldo:
+            raise SaldoInsuficiente("Saldo insuficiente para investir")
+        novo_valor = registro.investimento(tipo)["valor"] + valor
+        # Salva data da aplicação
+        if data_aplicacao is None:
+            data_aplicacao = datetime.now().isoformat()
+        registro.debitar(valor, f"aplicacao_{tipo}",
+                         APLICACAO, (tipo, data_aplicacao))
     return {"mensagem": f"Aplicado R$ {valor:.2f} em {tipo}", "valor_aplicado": novo_valor, "data_aplicacao": data_aplicacao}
 
 
-def resgatar_investimento(tipo, conta="principal", data_resgate=None):
-    validar_conta(conta)
-    investimento = get_investimento(tipo)
-    valor = investimento["valor"]
-    if valor <= 0:
-        raise HTTPException(
-            status_code=400, detail="Nenhum valor aplicado neste investimento")
-    taxa = get_taxa_investimento(tipo)
-    data_aplicacao = investimento.get("data_aplicacao")
-    if not data_aplicacao:
-        raise HTTPException(
-            status_code=400, detail="Data de aplicação não encontrada")
-    if data_resgate is None:
-        data_resgate = datetime.now().isoformat()
-    # Calcula tempo em dias
-    dt_aplic = datetime.fromisoformat(data_aplicacao)
-    dt_resg = datetime.fromisoformat(data_resgate)
-    dias = (dt_resg - dt_aplic).days
-    if dias < 0:
-        raise HTTPException(
-            status_code=400, detail="Data de resgate anterior à aplicação")
+def calcular_rendimento(tipo, valor, taxa, dias):
     # Métricas de rendimento
     if tipo == "CDB":
-        rendimento = valor * ((1 + taxa) ** dias - 1)
-    elif tipo == "POUPANCA":
-        rendimento = valor * taxa * dias
-    elif tipo == "TESOURO_DIRETO":
-        rendimento = valor * ((1 + taxa) ** (dias/30) - 1)
-    else:
-        rendimento = valor * taxa * dias
-    total = valor + rendimento
-    atualizar_investimento(tipo, 0.0)
-    saldo = get_saldo(conta)
-    atualizar_saldo(saldo + total, conta)
-    registrar_operacao(f"resgate_{tipo}", total, conta)
+        return valor * ((1 + taxa) ** dias - 1)
+    if tipo == "POUPANCA":
+        return valor * taxa * dias
+    if tipo == "TESOURO_DIRETO":
+        return valor * ((1 + taxa) ** (dias/30) - 1)
+    return valor * taxa * dias
+
+
+@auditado
+def resgatar_investimento(tipo, conta="principal", data_resgate=None):
+    tipo = _codigo(tipo)
+    with UnidadeDeTrabalho(conta) as uow:
+        registro = uow.conta(conta)
+        investimento = registro.investimento(tipo)
+        valor = investimento["valor"]
+        if valor <= 0:
+            raise OperacaoInvalida("Nenhum valor aplicado neste investimento")
+        taxa = get_taxa_investimento(tipo)
+        data_aplicacao = investimento.get("data_aplicacao")
+        if not data_aplicacao:
+            raise OperacaoInvalida("Data de aplicação não encontrada")
+        if data_resgate is None:
+            data_resgate = datetime.now().isoformat()
+        # Calcula tempo em dias
+        dt_aplic = datetime.fromisoformat(data_aplicacao)
+        dt_resg = datetime.fromisoformat(data_resgate)
+        dias = (dt_resg - dt_aplic).days
+        if dias < 0:
+            raise OperacaoInvalida("Data de resgate anterior à aplicação")
+        rendimento = calcular_rendimento(tipo, valor, taxa, dias)
+        total = valor + rendimento
+        registro.creditar(total, f"resgate_{tipo}", RESGATE, (tipo,))
     return {"mensagem": f"Resgatado R$ {total:.2f} de {tipo} (juros: R$ {rendimento:.2f})", "valor_resgatado": total, "juros": rendimento, "dias": dias}
 
 
-def saque_caixa(valor, tipo_caixa, conta="principal"):
-    validar_conta(conta)
+@auditado
+def provisionar_rendimentos(data=None, processos=None):
+    # Rendimento acumulado de todas as posições até ``data``, gravado por
+    # partição; repetir a mesma data retoma de onde uma execução parou
+    from tsbanking.provisao import provisionar
+    return provisionar(data or date.today(), processos=processos)
+
+
+def iniciar_provisao(data=None):
+    # A provisão de todas as carteiras leva minutos: roda em segundo plano
+    return iniciar_tarefa("provisao", provisionar_rendimentos, data).resumo()
+
+
+def consultar_tarefa(id):
+    tarefa = obter_tarefa(id)
+    if tarefa is None:
+        raise NaoEncontrado(f"Tarefa {id} não encontrada")
+    return tarefa.resumo()
+
+
+@auditado
+def reconciliar_contas(completa=False, processos=None):
+    # Confere saldos e extratos contra a trilha de hashes; só refaz os dias
+    # que mudaram desde a última vez, a menos que ``completa``
+    from tsbanking.auditoria import reconciliar
+    return reconciliar(processos or os.cpu_count() or 1, completa)
+
+
+def validar_caixa(caixa):
+    try:
+        return get_caixa(caixa)
+    except KeyError:
+        raise NaoEncontrado(f"Caixa '{caixa}' não encontrado")
+
+
+@auditado
+def saque_caixa(valor, tipo_caixa, conta="principal", caixa=None):
+    # Reserva as notas no caixa, debita a conta e só então entrega as notas.
+    # Cada passo usa uma trava só (do caixa ou da conta); se um passo
+    # posterior falhar, os anteriores são compensados.
+    tipo_caixa = _codigo(tipo_caixa)
+    saldo = validar_conta(conta).saldo
     validar_valor(valor)
-    saldo = get_saldo(conta)
     # Corrige: saldo deve ser verificado ANTES de calcular múltiplo
     if valor > saldo:
-        raise HTTPException(status_code=400, detail="Saldo insuficiente")
-    if tipo_caixa == "CAIXA_10":
-        multiplo = 10
-    elif tipo_caixa == "CAIXA_20":
-        multiplo = 20
-    elif tipo_caixa == "CAIXA_50":
-        multiplo = 50
-    elif tipo_caixa == "CAIXA_100":
-        multiplo = 100
-    else:
-        raise HTTPException(status_code=400, detail="Tipo de caixa inválido")
+        raise SaldoInsuficiente("Saldo insuficiente")
+    multiplo = MULTIPLOS.get(tipo_caixa)
+    if multiplo is None:
+        raise OperacaoInvalida("Tipo de caixa inválido")
     if valor % multiplo != 0:
-        raise HTTPException(
-            status_code=400, detail=f"Valor deve ser múltiplo de {multiplo} para este caixa")
-    novo = saldo - valor
-    atualizar_saldo(novo, conta)
-    registrar_operacao(f"saque_caixa_{multiplo}", valor, conta)
-    return {"mensagem": f"Saque de R$ {valor:.2f} realizado no caixa {multiplo}", "novo_saldo": novo}
+        raise OperacaoInvalida(f"Valor deve ser múltiplo de {multiplo} para este caixa")
+    # Sem caixa informado, usa o caixa padrão do tipo
+    terminal = validar_caixa(caixa or tipo_caixa)
+
+    reserva = terminal.reservar(int(valor))
+    if reserva is None:
+        raise NotasIndisponiveis(f"Caixa sem notas para compor R$ {valor:.2f}")
+    try:
+        with UnidadeDeTrabalho(conta) as uow:
+            registro = uow.conta(conta)
+            if valor > registro.saldo:
+                raise SaldoInsuficiente("Saldo insuficiente")
+            registro.debitar(valor, f"saque_caixa_{multiplo}",
+                             SAQUE_CAIXA, (tipo_caixa, terminal.id, reserva.notas))
+    except BaseException:
+        terminal.liberar(reserva)
+        raise
+
+    try:
+        dispensar(reserva)
+    except Exception:
+        terminal.liberar(reserva)
+        with UnidadeDeTrabalho(conta) as uow:
+            uow.conta(conta).creditar(valor, f"estorno_saque_caixa_{multiplo}",
+                                      ESTORNO, (terminal.id,))
+        raise FalhaDispensa("Falha ao entregar as notas; o saque foi estornado")
+    terminal.confirmar(reserva)
+    return {"mensagem": f"Saque de R$ {valor:.2f} realizado no caixa {multiplo}",
+            "novo_saldo": registro.saldo, "caixa": terminal.id,
+            "notas": [{"nota": nota, "quantidade": quantidade}
+                      for nota, quantidade in reserva.notas]}
+
+
+def _situacao_caixa(terminal):
+    return {"caixa": terminal.id, "total": terminal.total(),
+            "reservado": terminal.reservado,
+            "notas": [{"nota": nota, "quantidade": quantidade}
+                      for nota, quantidade in terminal.estoque()],
+            "estoque_baixo": terminal.estoque_baixo()}
+
+
+def consultar_caixa(caixa):
+    terminal = validar_caixa(caixa)
+    with terminal.trava:
+        return _situacao_caixa(terminal)
+
+
+@auditado
+def abastecer_caixa(caixa, notas):
+    terminal = validar_caixa(caixa)
+    with terminal.trava:
+        try:
+            terminal.abastecer(notas)
+        except ValueError as e:
+            raise OperacaoInvalida(str(e))
+        return _situacao_caixa(terminal)
+
+
+def caixas_com_estoque_baixo():
+    relatorio = []
+    for terminal in listar_caixas():
+        with terminal.trava:
+            if terminal.estoque_baixo():
+                relatorio.append(_situacao_caixa(terminal))
+    return relatorio
@@ -0,0 +1,116 @@
+import argparse
+import itertools
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from tsbanking.caixas import configurar_dispensador, registrar_caixa
+from tsbanking.erros import FalhaDispensa, NotasIndisponiveis, SaldoInsuficiente
+from tsbanking.services import abrir_conta, consultar_saldo, depositar, saque_caixa
+
+NOTAS = (100, 50, 20, 10)
+_rodadas = itertools.count(1)
+
+
+def simular(caixas=200, contas=1000, saques=20_000, threads=16,
+            saldo_inicial=10_000.0, notas_por_cassete=400, taxa_falha=0.01,
+            semente=1):
+    """Dispara ``saques`` saques concorrentes, de contas e caixas sorteados,
+    e devolve um relatório de vazão, disputa das travas dos caixas e falta
+    de notas. ``taxa_falha`` é a fração de entregas que o hardware simulado
+    recusa, exercitando o estorno."""
+    aleatorio = random.Random(semente)
+    rodada = next(_rodadas)
+    terminais = [registrar_caixa(f"sim{rodada}-{i}", {
+        nota: aleatorio.randrange(notas_por_cassete // 2, notas_por_cassete + 1)
+        for nota in NOTAS}) for i in range(caixas)]
+    estoque_inicial = {t.id: t.total() for t in terminais}
+    nomes = [abrir_conta()["conta"] for _ in range(contas)]
+    for nome in nomes:
+        depositar(saldo_inicial, nome)
+    pedidos = [(aleatorio.choice(nomes), aleatorio.choice(terminais).id,
+                aleatorio.randrange(20, 610, 10), aleatorio.random() < taxa_falha)
+               for _ in range(saques)]
+
+    local = threading.local()
+
+    def dispensador(caixa, notas):
+        if local.falhar:
+            raise IOError(f"Cassete travado no caixa {caixa.id}")
+
+    def executar(lote):
+        contagem = Counter()
+        for conta, caixa, valor, falhar in lote:
+            local.falhar = falhar
+            try:
+                saque_caixa(valor, "CAIXA_10", conta, caixa)
+                contagem["ok"] += 1
+                contagem["valor_sacado"] += valor
+            except NotasIndisponiveis:
+                contagem["sem_notas"] += 1
+            except SaldoInsuficiente:
+                contagem["saldo_insuficiente"] += 1
+            except FalhaDispensa:
+                contagem["falha_dispensa"] += 1
+        return contagem
+
+    lotes = [pedidos[i::threads] for i in range(threads)]
+    configurar_dispensador(dispensador)
+    try:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            resultados = sum(executor.map(executar, lotes), Counter())
+        segundos = time.perf_counter() - inicio
+    finally:
+        configurar_dispensador(None)
+
+    travamentos = sum(t.travamentos for t in terminais)
+    esperas = sum(t.esperas for t in terminais)
+    entregue = sum(estoque_inicial[t.id] - t.total() for t in terminais)
+    debitado = sum(saldo_inicial - consultar_saldo(nome) for nome in nomes)
+    return {
+        "saques": saques,
+        "segundos": segundos,
+        "saques_por_segundo": saques / segundos,
+        "resultados": {chave: resultados[chave] for chave in (
+            "ok", "sem_notas", "saldo_insuficiente", "falha_dispensa")},
+        "taxa_sem_notas": resultados["sem_notas"] / saques,
+        "caixas_esgotados": sum(1 for t in terminais if 0 in t.notas.values()),
+        "disputa_travas_caixa": esperas / travamentos if travamentos else 0.0,
+        # Notas que saíram dos caixas, dinheiro que saiu das contas e o que
+        # ficou preso em reservas: tem que fechar
+        "valor_sacado": resultados["valor_sacado"],
+        "valor_entregue": entregue,
+        "valor_debitado": debitado,
+        "reservado": sum(t.reservado for t in terminais),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simula saques concorrentes numa rede de caixas eletrônicos")
+    parser.add_argument("--caixas", type=int, default=200)
+    parser.add_argument("--contas", type=int, default=1000)
+    parser.add_argument("--saques", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--taxa-falha", type=float, default=0.01)
+    parser.add_argument("--semente", type=int, default=1)
+    args = parser.parse_args(argv)
+    relatorio = simular(args.caixas, args.contas, args.saques, args.threads,
+                        taxa_falha=args.taxa_falha, semente=args.semente)
+    print(f"{relatorio['saques']} saques em {relatorio['segundos']:.2f} s "
+          f"({relatorio['saques_por_segundo']:,.0f}/s)")
+    for resultado, quantidade in relatorio["resultados"].items():
+        print(f"  {resultado}: {quantidade}")
+    print(f"falta de notas: {relatorio['taxa_sem_notas']:.1%} dos saques, "
+          f"{relatorio['caixas_esgotados']} caixas com cassete vazio")
+    print(f"disputa nas travas dos caixas: {relatorio['disputa_travas_caixa']:.1%}")
+    print(f"entregue R$ {relatorio['valor_entregue']:,.2f}, debitado "
+          f"R$ {relatorio['valor_debitado']:,.2f}, reservado "
+          f"R$ {relatorio['reservado']:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import itertools
+import os
+import threading
+import time
+
+from tsbanking.banco import banco_atual
+
+EM_ANDAMENTO = "em_andamento"
+CONCLUIDA = "concluida"
+FALHOU = "falhou"
+
+# Um pool de processos para o processo inteiro, criado no primeiro uso.
+# spawn, e não fork: o servidor tem threads vivas (agenda, saídas, requisições)
+# e um filho de fork herdaria travas presas por elas
+_pool = [None]
+_trava = threading.Lock()
+_ids = itertools.count(1)
+
+
+def processos():
+    with _trava:
+        if _pool[0] is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            _pool[0] = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"))
+        return _pool[0]
+
+
+def encerrar_processos():
+    with _trava:
+        pool, _pool[0] = _pool[0], None
+    if pool is not None:
+        pool.shutdown()
+
+
+class Tarefa:
+    """Trabalho longo disparado pela API (provisão, ...), rodando numa
+    thread própria no banco em que foi pedido. A resposta sai na hora com
+    o id; a situação se consulta depois."""
+
+    __slots__ = ("id", "nome", "situacao", "resultado", "erro", "inicio", "fim")
+
+    def __init__(self, nome):
+        self.id = next(_ids)
+        self.nome = nome
+        self.situacao = EM_ANDAMENTO
+        self.resultado = self.erro = self.fim = None
+        self.inicio = time.time()
+
+    def resumo(self):
+        return {"tarefa": self.id, "nome": self.nome, "situacao": self.situacao,
+                "inicio": self.inicio, "fim": self.fim,
+                "resultado": self.resultado, "erro": self.erro}
+
+
+def iniciar_tarefa(nome, funcao, *args, **kwargs):
+    banco = banco_atual()
+    tarefa = Tarefa(nome)
+    banco.tarefas[tarefa.id] = tarefa
+
+    def rodar():
+        with banco.ativo():
+            try:
+                tarefa.resultado = funcao(*args, **kwargs)
+                tarefa.situacao = CONCLUIDA
+            except Exception as erro:
+                tarefa.erro = getattr(erro, "detail", None) or repr(erro)
+                tarefa.situacao = FALHOU
+            finally:
+                tarefa.fim = time.time()
+
+    threading.Thread(target=rodar, name=f"tarefa {nome}", daemon=True).start()
+    return tarefa
+
+
+def obter_tarefa(id):
+    return banco_atual().tarefas.get(id)
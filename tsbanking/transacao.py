@@ -0,0 +1,115 @@
+from tsbanking import assinaturas
+from tsbanking.banco import NUM_TRAVAS, banco_atual
+from tsbanking.erros import ContaNaoEncontrada
+from tsbanking.database import get_conta, gravar_evento
+from tsbanking.eventos import DEPOSITO, SAQUE, LIMPEZA, ENCERRAMENTO
+
+
+def trava_da_conta(nome):
+    # Travas listradas do banco atual (ver Banco.travas)
+    return banco_atual().travas[hash(nome) & (NUM_TRAVAS - 1)]
+
+
+class ContaEmTransacao:
+    __slots__ = ("registro", "saldo", "pendentes")
+
+    def __init__(self, registro):
+        self.registro = registro
+        self.saldo = registro.saldo
+        self.pendentes = []
+
+    @property
+    def id(self):
+        return self.registro.id
+
+    def creditar(self, valor, operacao, tipo=DEPOSITO, dados=None):
+        self.saldo += valor
+        self.pendentes.append((tipo, valor, operacao, dados))
+
+    def debitar(self, valor, operacao, tipo=SAQUE, dados=None):
+        self.saldo -= valor
+        self.pendentes.append((tipo, valor, operacao, dados))
+
+    def limpar_extrato(self):
+        self.pendentes.append((LIMPEZA, 0.0, "", None))
+
+    def encerrar(self):
+        self.pendentes.append((ENCERRAMENTO, 0.0, "", None))
+
+    def investimento(self, tipo):
+        # Cópia somente leitura da posição; alterações entram como eventos
+        carteira = self.registro.carteira or {}
+        atual = carteira.get(tipo)
+        return dict(atual) if atual else {"valor": 0.0, "data_aplicacao": None}
+
+
+class UnidadeDeTrabalho:
+    """Resolve cada conta uma única vez e acumula os eventos da operação,
+    gravando todos de uma vez ao sair do bloco ``with``. Se o bloco lançar
+    exceção, nada é gravado."""
+
+    def __init__(self, *contas):
+        self.nomes = contas
+        self.contas = {}
+        travas = banco_atual().travas
+        indices = {hash(nome) & (NUM_TRAVAS - 1) for nome in contas}
+        self._travas = [travas[i] for i in sorted(indices)]
+
+    def __enter__(self):
+        # Ordem fixa de aquisição evita deadlock entre transferências cruzadas
+        for trava in self._travas:
+            trava.acquire()
+        try:
+            contas = self.contas
+            for nome in self.nomes:
+                if nome not in contas:
+                    contas[nome] = ContaEmTransacao(_resolver(nome))
+        except BaseException:
+            self._liberar()
+            raise
+        return self
+
+    def __exit__(self, tipo_erro, erro, traceback):
+        mudancas = None
+        try:
+            if tipo_erro is None:
+                mudancas = self._confirmar()
+                if mudancas:
+                    # Ainda com as travas: a fila segue a ordem dos commits
+                    assinaturas.enfileirar(mudancas)
+        finally:
+            self._liberar()
+        if mudancas:
+            assinaturas.publicar()
+        return False
+
+    def conta(self, nome):
+        return self.contas[nome]
+
+    def _confirmar(self):
+        mudancas = []
+        for handle in self.contas.values():
+            if not handle.pendentes:
+                continue
+            registro = handle.registro
+            # Só monta o aviso de mudança se alguém estiver assinando a conta
+            assinada = assinaturas.tem_assinantes(registro.id)
+            if assinada:
+                extrato = registro.extrato
+                antes = (len(extrato), extrato.inicio) if extrato else (0, 0)
+            for tipo, valor, operacao, dados in handle.pendentes:
+                gravar_evento(registro, tipo, valor, operacao, dados)
+            if assinada:
+                mudancas.append(assinaturas.mudanca(registro, *antes))
+        return mudancas
+
+    def _liberar(self):
+        for trava in reversed(self._travas):
+            trava.release()
+
+
+def _resolver(nome):
+    try:
+        return get_conta(nome)
+    except KeyError:
+        raise ContaNaoEncontrada(f"Conta '{nome}' não encontrada")
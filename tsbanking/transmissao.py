@@ -0,0 +1,107 @@
+import asyncio
+from collections import deque
+
+from tsbanking.services import assinar_conta, versao_da_conta
+
+LIMITE_FILA = 256     # mudanças pendentes por inscrito antes de ressincronizar
+BATIMENTO = 15.0      # segundos sem mudança até mandar um sinal de vida
+
+# Marca, na fila, que mudanças foram descartadas
+_RESSINCRONIZAR = object()
+
+
+def _acordar(futuro):
+    if not futuro.done():
+        futuro.set_result(None)
+
+
+def mudanca_para_dict(mudanca):
+    return {"tipo": "mudanca", "conta": mudanca.conta, "versao": mudanca.versao,
+            "saldo": mudanca.saldo, "inicio": mudanca.inicio,
+            "lancamentos": mudanca.lancamentos, "limpo": mudanca.limpo}
+
+
+class Inscricao:
+    """Mudanças de algumas contas a caminho de um cliente conectado (SSE ou
+    WebSocket), numa fila limitada no event loop.
+
+    As mudanças chegam na thread de quem operou e só atravessam para o
+    loop; nada aqui segura a operação. Um cliente que não acompanha não
+    acumula memória: quando a fila enche, as mudanças pendentes são
+    descartadas e o cliente recebe um ``ressincronizar`` com a última
+    versão entregue de cada conta, para buscar o que perdeu em
+    ``/extrato/pagina?desde=``. Parado, um inscrito custa uma fila vazia,
+    um future e um callback por conta."""
+
+    __slots__ = ("loop", "limite", "fila", "versoes", "entregues",
+                 "descartadas", "_espera", "_cancelar")
+
+    def __init__(self, contas, limite=LIMITE_FILA):
+        self.loop = asyncio.get_running_loop()
+        self.limite = limite
+        self.fila = deque()
+        # Future de quem espera em proxima(); sem Event nem tarefa extra
+        self._espera = None
+        self.entregues = self.descartadas = 0
+        self._cancelar = []
+        try:
+            # Assina antes de ler a versão: uma operação no meio chega
+            # repetida, nunca perdida
+            for conta in contas:
+                self._cancelar.append(assinar_conta(conta, self._publicar))
+            # conta -> versão da última mudança entregue
+            self.versoes = {conta: versao_da_conta(conta) for conta in contas}
+        except BaseException:
+            self.fechar()
+            raise
+
+    def _publicar(self, mudanca):
+        # Thread de quem operou
+        self.loop.call_soon_threadsafe(self._enfileirar, mudanca)
+
+    def _enfileirar(self, mudanca):
+        fila = self.fila
+        if fila and fila[-1] is _RESSINCRONIZAR:
+            # Ainda não avisou do descarte anterior; o aviso cobre esta também
+            self.descartadas += 1
+            return
+        if len(fila) >= self.limite:
+            self.descartadas += len(fila) + 1
+            fila.clear()
+            fila.append(_RESSINCRONIZAR)
+        else:
+            fila.append(mudanca)
+        espera = self._espera
+        if espera is not None and not espera.done():
+            espera.set_result(None)
+
+    def abertura(self):
+        return {"tipo": "inscrito", "versoes": dict(self.versoes)}
+
+    async def proxima(self, espera=None):
+        # Próxima mensagem; None se nada chegou em ``espera`` segundos
+        while True:
+            if not self.fila:
+                futuro = self._espera = self.loop.create_future()
+                prazo = (None if espera is None else
+                         self.loop.call_later(espera, _acordar, futuro))
+                try:
+                    await futuro
+                finally:
+                    self._espera = None
+                    if prazo is not None:
+                        prazo.cancel()
+                if not self.fila:
+                    return None
+            item = self.fila.popleft()
+            if item is _RESSINCRONIZAR:
+                return {"tipo": "ressincronizar", "versoes": dict(self.versoes)}
+            # Repetida (da assinatura) ou já coberta pela versão conhecida
+            if item.versao > self.versoes[item.conta]:
+                self.versoes[item.conta] = item.versao
+                self.entregues += 1
+                return mudanca_para_dict(item)
+
+    def fechar(self):
+        while self._cancelar:
+            self._cancelar.pop()()